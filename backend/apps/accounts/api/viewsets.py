@@ -14,6 +14,7 @@ from apps.accounts.models import Usuario
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.contrib.auth import authenticate, login
+from core.profiling import span
 
 
 class RegisterAPIView(APIView):
@@ -185,9 +186,10 @@ class UserListAPIView(APIView):
         operation_description="Retorna a lista de usuários cadastrados.",
     )
     def get(self, request, *args, **kwargs):
-        users = Usuario.objects.all().order_by("id")
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        users = list(Usuario.objects.all().order_by("id"))
+        with span("serialize"):
+            data = UserSerializer(users, many=True).data
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class UserDeleteAPIView(APIView):
@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import WeatherLog, WeatherInsight
+from .models import (
+    GeocodedCity,
+    TrackedCity,
+    WeatherExport,
+    WeatherInsight,
+    WeatherLog,
+    WeatherRollup,
+)
 
 
 @admin.register(WeatherLog)
@@ -18,6 +25,7 @@ class WeatherLogAdmin(admin.ModelAdmin):
     search_fields = ("city", "condition")
     ordering = ("-timestamp",)
     readonly_fields = ("created_at",)
+    raw_id_fields = ("raw_payload",)
 
 
 @admin.register(WeatherInsight)
@@ -29,3 +37,33 @@ class WeatherInsightAdmin(admin.ModelAdmin):
         return (obj.text[:60] + "...") if len(obj.text) > 60 else obj.text
 
     short_text.short_description = "Texto"
+
+
+@admin.register(WeatherExport)
+class WeatherExportAdmin(admin.ModelAdmin):
+    list_display = ("id", "format", "status", "requested_by", "created_at", "finished_at") # noqa E501
+    list_filter = ("format", "status")
+    ordering = ("-created_at",)
+    readonly_fields = ("created_at", "finished_at")
+
+
+@admin.register(WeatherRollup)
+class WeatherRollupAdmin(admin.ModelAdmin):
+    list_display = ("bucket_start", "granularity", "city", "count", "temperature_min", "temperature_max") # noqa E501
+    list_filter = ("granularity", "city")
+    ordering = ("-bucket_start",)
+
+
+@admin.register(TrackedCity)
+class TrackedCityAdmin(admin.ModelAdmin):
+    list_display = ("name", "country", "lat", "lon", "active", "created_at")
+    list_filter = ("active", "country")
+    search_fields = ("name",)
+    ordering = ("name",)
+
+
+@admin.register(GeocodedCity)
+class GeocodedCityAdmin(admin.ModelAdmin):
+    list_display = ("city_key", "country", "name", "lat", "lon", "found", "expires_at") # noqa E501
+    list_filter = ("found", "country")
+    search_fields = ("city_key", "name")
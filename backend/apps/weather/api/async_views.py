@@ -0,0 +1,94 @@
+import json
+import httpx
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import UnsupportedMediaType
+from apps.weather.services.openweather_async import astore_weather_for_city
+from .serializers import WeatherLogSerializer
+
+
+async def _authenticate(request):
+    """TokenAuthentication do DRF, com o ORM assíncrono."""
+    header = request.headers.get("Authorization", "").split()
+    if len(header) != 2 or header[0].lower() != "token":
+        return None
+    token = await Token.objects.select_related("user").filter(
+        key=header[1]
+    ).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+# mesmos formatos dos parsers padrão do DRF no endpoint síncrono
+FORM_CONTENT_TYPES = ("application/x-www-form-urlencoded", "multipart/form-data") # noqa E501
+
+
+def _request_data(request):
+    """
+    Corpo da requisição: JSON, formulário ou multipart (`request.POST`).
+    `None` se o JSON for inválido; levanta `UnsupportedMediaType` para
+    outros formatos.
+    """
+    if request.content_type in FORM_CONTENT_TYPES:
+        return request.POST
+    if request.body and request.content_type != "application/json":
+        raise UnsupportedMediaType(request.content_type)
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@csrf_exempt
+@require_POST
+async def fetch_city_async(request):
+    """
+    Versão assíncrona de `POST /weather/logs/fetch-city/` para rodar sob
+    ASGI: enquanto a OpenWeather responde, o worker atende outras
+    requisições. Mesmo contrato (entrada em JSON ou formulário,
+    respostas e permissão).
+    """
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "As credenciais de autenticação não foram fornecidas."}, # noqa E501
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    if not await user.ahas_perm("weather.add_weatherlog"):
+        return JsonResponse(
+            {"detail": "Você não tem permissão para executar essa ação."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    try:
+        data = _request_data(request)
+    except UnsupportedMediaType as e:
+        return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+    if data is None or not data.get("city"):
+        return JsonResponse(
+            {"detail": "Campo 'city' é obrigatório."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        log = await astore_weather_for_city(
+            city_name=data["city"], country_code=data.get("country", "BR")
+        )
+    except ValueError as e:
+        return JsonResponse(
+            {"detail": str(e)}, status=status.HTTP_404_NOT_FOUND
+        )
+    except httpx.HTTPError:
+        return JsonResponse(
+            {"detail": "Erro ao consultar a API de geocoding/clima."},
+            status=status.HTTP_502_BAD_GATEWAY,
+        )
+
+    return JsonResponse(
+        WeatherLogSerializer(log).data, status=status.HTTP_201_CREATED
+    )
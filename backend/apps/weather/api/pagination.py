@@ -0,0 +1,144 @@
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    LimitOffsetPagination,
+)
+from rest_framework.utils.urls import replace_query_param
+
+
+def _skip_count(request) -> bool:
+    return request.query_params.get("count") in ("0", "false")
+
+
+class WeatherLogLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffset padrão, com `?count=false` para pular o COUNT(*): busca
+    uma linha a mais só para saber se existe próxima página.
+    """
+
+    # False: nunca faz COUNT(*), mesmo sem `?count=false`
+    count_rows = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.count_rows and not _skip_count(request):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.count = None
+        self.display_page_controls = False
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_more = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if self.count is not None:
+            return super().get_next_link()
+        if not self.has_more:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+
+class WeatherRollupPagination(WeatherLogLimitOffsetPagination):
+    """
+    Rollups alimentam gráficos: páginas grandes (padrão 1000, máx. 5000)
+    e sem COUNT(*), em vez das 10 linhas do `PAGE_SIZE` global.
+    """
+
+    default_limit = 1000
+    max_limit = 5000
+    count_rows = False
+
+
+class WeatherLogCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) em (timestamp, id): o custo de uma
+    página profunda é o mesmo da primeira e não há COUNT(*).
+
+    O CursorPagination do DRF só guarda o primeiro campo da ordenação e
+    resolve empates de `timestamp` com OFFSET; aqui a posição é o par
+    `timestamp|id` e a próxima página é filtrada por
+    `(timestamp, id) < (t, i)`, então empates (comuns: o seed e a coleta
+    em lote gravam várias cidades no mesmo instante) não custam nada.
+    """
+
+    ordering = ("-timestamp", "-id")
+    page_size_query_param = "limit"
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        # página anterior: percorre em ordem crescente e inverte no fim
+        op = "gt" if reverse else "lt"
+        if reverse:
+            queryset = queryset.order_by("timestamp", "id")
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None and self.cursor.position:
+            ts, pk = self._parse_position(self.cursor.position)
+            # `timestamp <= t` primeiro: faixa no índice (timestamp, id)
+            queryset = queryset.filter(
+                Q(**{f"timestamp__{op}e": ts}),
+                Q(**{f"timestamp__{op}": ts}) | Q(**{f"id__{op}": pk}),
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self._position(self.page[-1])) # noqa E501
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=self._position(self.page[0])) # noqa E501
+        )
+
+    @staticmethod
+    def _position(row) -> str:
+        # linhas de `values()` (fast path) ou instâncias (`include=raw`)
+        if isinstance(row, dict):
+            return f"{row['timestamp'].isoformat()}|{row['id']}"
+        return f"{row.timestamp.isoformat()}|{row.id}"
+
+    def _parse_position(self, position: str):
+        try:
+            ts, pk = position.rsplit("|", 1)
+            return datetime.fromisoformat(ts), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,31 @@
+import codecs
+import json
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline-delimited JSON: devolve um gerador com um objeto por linha,
+    lido sob demanda do corpo da requisição. Linhas com JSON inválido
+    são entregues como texto para a validação reportar o erro.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        reader = codecs.getreader(encoding)(stream)
+        return self._iter_lines(reader)
+
+    @staticmethod
+    def _iter_lines(reader):
+        for line in reader:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
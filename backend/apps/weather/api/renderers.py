@@ -0,0 +1,24 @@
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Aceita `Accept: text/event-stream` na negociação de conteúdo; o corpo
+    é escrito pela própria view (StreamingHttpResponse).
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None): # noqa E501
+        if isinstance(data, (bytes, str)):
+            return data
+        return sse_event("error", data)
+
+
+def sse_event(event: str, data) -> str:
+    """Uma mensagem Server-Sent Events (`event:` + `data:` em JSON)."""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
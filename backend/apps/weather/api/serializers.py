@@ -1,14 +1,14 @@
 from rest_framework import serializers
-from ..models import WeatherLog, WeatherInsight
+from ..models import WeatherLog, WeatherInsight, WeatherRollup
 
 
 class WeatherLogSerializer(serializers.ModelSerializer):
+    # gravado em RawPayload (comprimido e deduplicado) pelo model
+    raw = serializers.JSONField()
+
     class Meta:
         model = WeatherLog
-        fields = "__all__"
-        extra_kwargs = {
-            "raw": {"required": True},
-        }
+        exclude = ("city_key", "raw_payload")
 
     def validate_raw(self, value):
         if not isinstance(value, dict) or not value:
@@ -18,7 +18,60 @@ class WeatherLogSerializer(serializers.ModelSerializer):
         return value
 
 
+# instância única: converte datetimes no fast path sem criar fields por linha
+_datetime_field = serializers.DateTimeField()
+
+
+class WeatherLogListSerializer(serializers.ModelSerializer):
+    """
+    Representação compacta da listagem: sem o JSON `raw` da OpenWeather.
+    """
+
+    class Meta:
+        model = WeatherLog
+        fields = (
+            "id",
+            "timestamp",
+            "city",
+            "temperature",
+            "humidity",
+            "pressure",
+            "wind_speed",
+            "condition",
+            "created_at",
+        )
+
+    @staticmethod
+    def from_values(rows):
+        """
+        Fast path: monta a resposta direto das linhas de `values()`,
+        sem instanciar models nem passar pela maquinaria de fields do DRF.
+        Devolve dicts novos: as linhas originais são a página do paginator,
+        que ainda lê os datetimes para montar o cursor.
+        """
+        to_datetime = _datetime_field.to_representation
+        return [
+            {
+                **row,
+                "timestamp": to_datetime(row["timestamp"]),
+                "created_at": to_datetime(row["created_at"]),
+            }
+            for row in rows
+        ]
+
+
 class WeatherInsightSerializer(serializers.ModelSerializer):
     class Meta:
         model = WeatherInsight
-        fields = "__all__"
+        exclude = ("city_key", "fingerprint")
+
+
+class WeatherRollupSerializer(serializers.ModelSerializer):
+    temperature_avg = serializers.FloatField(read_only=True)
+    humidity_avg = serializers.FloatField(read_only=True)
+    pressure_avg = serializers.FloatField(read_only=True)
+    wind_speed_avg = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = WeatherRollup
+        exclude = ("id", "city_key", "updated_at")
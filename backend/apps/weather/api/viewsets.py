@@ -1,20 +1,158 @@
+import time
+import uuid
 import requests
+from types import GeneratorType
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from django.http import HttpResponse
-import csv
-from openpyxl import Workbook
+from django.urls import reverse
+from django.http import FileResponse, StreamingHttpResponse
+from core.profiling import span
+from apps.weather.services.exports import (
+    ARROW_STREAM_CONTENT_TYPE,
+    PARQUET_CONTENT_TYPE,
+    XLSX_CONTENT_TYPE,
+    build_xlsx_file,
+    iter_arrow_stream,
+    iter_csv,
+    iter_parquet,
+)
+from apps.weather.services.ingest import ingest_rows
+from apps.weather.services.insight_jobs import (
+    FINAL_EVENTS,
+    acquire_run,
+    finish_run,
+    fresh_insight,
+    insight_key,
+    lock_timeout,
+    progress_events,
+    publish_progress,
+    request_insight,
+    running_task,
+)
+from apps.weather.services.insights import stream_insight
+from apps.weather.services.latest import latest_for_cities, record_latest
 from apps.weather.services.openweather import store_weather_for_city
-from apps.weather.tasks import generate_insights_task
-from ..models import WeatherLog, WeatherInsight
-from .serializers import WeatherLogSerializer, WeatherInsightSerializer
+from apps.weather.services.queries import filter_weather_logs
+from apps.weather.services.rollups import filter_rollups, record_rollups
+from apps.weather.services.series import DEFAULT_POINTS, build_series
+from apps.weather.tasks import export_xlsx_task, generate_insights_task
+from ..models import (
+    TrackedCity,
+    WeatherExport,
+    WeatherInsight,
+    WeatherLog,
+    WeatherRollup,
+    normalize_city,
+)
+from .pagination import (
+    WeatherLogCursorPagination,
+    WeatherLogLimitOffsetPagination,
+    WeatherRollupPagination,
+)
+from .parsers import NDJSONParser
+from .renderers import EventStreamRenderer, sse_event
+from .serializers import (
+    WeatherInsightSerializer,
+    WeatherLogListSerializer,
+    WeatherLogSerializer,
+    WeatherRollupSerializer,
+)
+
+# cidades por requisição em `latest-by-city` (cache frio: 1 consulta cada)
+LATEST_MAX_CITIES = 100
 
 
 class WeatherLogViewSet(viewsets.ModelViewSet):
-    queryset = WeatherLog.objects.all()
+    # `raw` vem do RawPayload: um JOIN em vez de uma consulta por log
+    queryset = WeatherLog.objects.select_related("raw_payload")
     serializer_class = WeatherLogSerializer
 
+    @property
+    def paginator(self):
+        """
+        `?pagination=cursor` ativa a paginação keyset em (timestamp, id);
+        sem ele vale o limit/offset padrão (com `?count=false` opcional).
+        """
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get("pagination") == "cursor":
+                self._paginator = WeatherLogCursorPagination()
+            else:
+                self._paginator = WeatherLogLimitOffsetPagination()
+        return self._paginator
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params
+        try:
+            return filter_weather_logs(
+                qs,
+                city=params.get("city"),
+                start=params.get("start"),
+                end=params.get("end"),
+            )
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+    def list(self, request, *args, **kwargs):
+        """
+        Sem `?include=raw` a listagem usa o fast path: lê só as colunas
+        enxutas via `values()` (o JSON `raw` nem sai do banco).
+        """
+        includes = request.query_params.get("include", "").split(",")
+        if "raw" in includes:
+            return super().list(request, *args, **kwargs)
+
+        qs = self.filter_queryset(self.get_queryset()).values(
+            *WeatherLogListSerializer.Meta.fields
+        )
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            with span("serialize"):
+                data = WeatherLogListSerializer.from_values(page)
+            return self.get_paginated_response(data)
+        rows = list(qs)
+        with span("serialize"):
+            data = WeatherLogListSerializer.from_values(rows)
+        return Response(data)
+
+    def perform_create(self, serializer):
+        log = serializer.save()
+        record_rollups([log])
+        record_latest([log])
+
+    def get_parsers(self):
+        # as rotas são declaradas à mão em core/urls.py, então os kwargs
+        # do @action não chegam à view: o parser do bulk é escolhido aqui
+        request = getattr(self, "request", None)
+        method = request.method.lower() if request else None
+        if getattr(self, "action_map", {}).get(method) == "bulk":
+            return [JSONParser(), NDJSONParser()]
+        return super().get_parsers()
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Ingestão em lote: array JSON ou NDJSON (`application/x-ndjson`).
+        Linhas inválidas são listadas em `errors` sem abortar o lote.
+        """
+        rows = request.data
+        if not isinstance(rows, (list, GeneratorType)):
+            return Response(
+                {"detail": "Envie um array JSON ou NDJSON de leituras."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = ingest_rows(rows)
+        if result["errors"]:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(result, status=response_status)
+
     @action(detail=False, methods=["post"], url_path="fetch-city")
     def fetch_city(self, request):
         city = request.data.get("city")
@@ -42,66 +180,199 @@ class WeatherLogViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(log)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["get"], url_path="series")
+    def series(self, request):
+        """
+        Série de uma métrica para gráficos, reduzida a no máximo `points`
+        pontos (ver `services.series.build_series`).
+        """
+        params = request.query_params
+        try:
+            points = int(params.get("points", DEFAULT_POINTS))
+        except ValueError:
+            raise ValidationError({"points": "Informe um número inteiro."})
+        try:
+            data = build_series(
+                metric=params.get("metric", "temperature"),
+                city=params.get("city"),
+                start=params.get("start"),
+                end=params.get("end"),
+                points=points,
+            )
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+        return Response(data)
+
+    @action(detail=False, methods=["get"], url_path="latest-by-city")
+    def latest_by_city(self, request):
+        """
+        Última medição de cada cidade: as de `?city=` (separadas por
+        vírgula) ou, sem o parâmetro, todas as TrackedCity ativas. Vem do
+        cache mantido na gravação (`services.latest`), sem varrer a tabela.
+        """
+        cities = [
+            c for c in request.query_params.get("city", "").split(",")
+            if c.strip()
+        ]
+        if len(cities) > LATEST_MAX_CITIES:
+            raise ValidationError(
+                {"city": f"Informe no máximo {LATEST_MAX_CITIES} cidades."}
+            )
+        if cities:
+            city_keys = [normalize_city(c) for c in cities]
+        else:
+            city_keys = TrackedCity.objects.filter(active=True).values_list(
+                "city_key", flat=True
+            )
+        city_keys = list(dict.fromkeys(city_keys))
+
+        latest = latest_for_cities(city_keys)
+        # cópias: os dicts do cache não podem ser alterados
+        rows = [dict(row) for row in latest.values()]
+        data = WeatherLogListSerializer.from_values(rows)
+        return Response(
+            {
+                "count": len(data),
+                "results": data,
+                "missing": [k for k in city_keys if k not in latest],
+            }
+        )
+
     @action(detail=False, methods=["get"], url_path="export-csv")
     def export_csv(self, request):
-        logs = self.get_queryset().order_by("timestamp")
-
-        response = HttpResponse(content_type="text/csv")
+        # streaming: o primeiro byte sai logo e a memória fica constante
+        response = StreamingHttpResponse(
+            iter_csv(self.get_queryset()), content_type="text/csv"
+        )
         response["Content-Disposition"] = 'attachment; filename="weather_logs.csv"' # noqa E501
+        return response
 
-        writer = csv.writer(response)
-        writer.writerow(
-            ["timestamp", "city", "temperature", "humidity", "pressure", "wind_speed", "condition"] # noqa E501
-        )
-        for log in logs:
-            writer.writerow(
-                [
-                    log.timestamp.isoformat(),
-                    log.city,
-                    log.temperature,
-                    log.humidity,
-                    log.pressure,
-                    log.wind_speed,
-                    log.condition,
-                ]
-            )
+    def _columnar_response(self, chunks, content_type: str, filename: str):
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"' # noqa E501
         return response
 
+    @action(detail=False, methods=["get"], url_path="export-parquet")
+    def export_parquet(self, request):
+        # colunas tipadas e comprimidas (zstd), um row group por lote lido
+        return self._columnar_response(
+            iter_parquet(self.get_queryset()),
+            PARQUET_CONTENT_TYPE,
+            "weather_logs.parquet",
+        )
+
+    @action(detail=False, methods=["get"], url_path="export-arrow")
+    def export_arrow(self, request):
+        return self._columnar_response(
+            iter_arrow_stream(self.get_queryset()),
+            ARROW_STREAM_CONTENT_TYPE,
+            "weather_logs.arrows",
+        )
+
     @action(detail=False, methods=["get"], url_path="export-xlsx")
     def export_xlsx(self, request):
-        logs = self.get_queryset().order_by("timestamp")
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Weather Logs"
-        ws.append(["timestamp", "city", "temperature", "humidity", "pressure", "wind_speed", "condition"]) # noqa E501
-
-        for log in logs:
-            ws.append(
-                [
-                    log.timestamp.isoformat(),
-                    log.city,
-                    log.temperature,
-                    log.humidity,
-                    log.pressure,
-                    log.wind_speed,
-                    log.condition,
-                ]
-            )
-
-        from io import BytesIO
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type=(
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" # noqa E501
-            ),
+        if request.query_params.get("async") in ("1", "true"):
+            return self._enqueue_xlsx_export(request)
+
+        xlsx_file = build_xlsx_file(self.get_queryset())
+        return FileResponse(
+            xlsx_file,
+            as_attachment=True,
+            filename="weather_logs.xlsx",
+            content_type=XLSX_CONTENT_TYPE,
         )
-        response["Content-Disposition"] = 'attachment; filename="weather_logs.xlsx"' # noqa E501
-        return response
+
+    def _enqueue_xlsx_export(self, request):
+        params = request.query_params
+        filters = {
+            key: params[key] for key in ("city", "start", "end") if params.get(key) # noqa E501
+        }
+        # valida os filtros antes de enfileirar
+        self.get_queryset()
+
+        export = WeatherExport.objects.create(
+            format="xlsx",
+            filters=filters,
+            requested_by=request.user,
+        )
+        export_xlsx_task.delay(str(export.id))
+
+        return Response(
+            {
+                "detail": "Exportação XLSX enviada para processamento.",
+                "export_id": str(export.id),
+                "status": export.status,
+                "download_url": reverse(
+                    "weather-logs-export-download",
+                    kwargs={"export_id": export.id},
+                ),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"exports/(?P<export_id>[0-9a-f-]+)",
+    )
+    def export_download(self, request, export_id=None):
+        export = WeatherExport.objects.filter(
+            pk=export_id, requested_by=request.user
+        ).first()
+        if not export:
+            return Response(
+                {"detail": "Exportação não encontrada."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if export.status == WeatherExport.Status.FAILED:
+            return Response(
+                {"detail": "Falha ao gerar a exportação.", "error": export.error}, # noqa E501
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        if export.status != WeatherExport.Status.DONE:
+            return Response(
+                {"detail": "Exportação em processamento.", "status": export.status}, # noqa E501
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        return FileResponse(
+            export.file.open("rb"),
+            as_attachment=True,
+            filename=f"weather_logs.{export.format}",
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
+
+class WeatherRollupViewSet(viewsets.ReadOnlyModelViewSet):
+    # `id` desempata buckets de cidades diferentes no mesmo instante
+    queryset = WeatherRollup.objects.all().order_by("bucket_start", "id")
+    serializer_class = WeatherRollupSerializer
+    pagination_class = WeatherRollupPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params
+        try:
+            return filter_rollups(
+                qs,
+                city=params.get("city"),
+                granularity=params.get("granularity"),
+                start=params.get("start"),
+                end=params.get("end"),
+            )
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+
+# ações do WeatherInsightViewSet que respondem com Server-Sent Events
+SSE_ACTIONS = {"stream", "task_events"}
+# intervalo de leitura do progresso e de keep-alive do stream (s)
+SSE_POLL_SECONDS = 0.25
+SSE_KEEPALIVE_SECONDS = 15
+# espera máxima de um stream que acompanha outra execução (s)
+SSE_MAX_WAIT_SECONDS = 60
 
 
 class WeatherInsightViewSet(viewsets.ReadOnlyModelViewSet):
@@ -110,7 +381,23 @@ class WeatherInsightViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=["get"], url_path="latest")
     def latest(self, request):
-        insight = self.get_queryset().first()
+        """
+        Insight mais recente (opcional `?hours=`) pelo índice
+        (city_key, generated_at): o da cidade de `?city=` ou, sem o
+        parâmetro, o geral (todas as cidades, `city_key` vazio), e não o
+        de qualquer cidade gerado por último.
+        """
+        qs = self.get_queryset()
+        city = request.query_params.get("city", "")
+        qs = qs.filter(city_key=normalize_city(city))
+        hours = request.query_params.get("hours")
+        if hours:
+            try:
+                qs = qs.filter(hours=int(hours))
+            except ValueError:
+                raise ValidationError({"hours": "Informe um número inteiro."}) # noqa E501
+
+        insight = qs.first()
         if not insight:
             return Response(
                 {"detail": "Nenhum insight disponível ainda."},
@@ -119,24 +406,245 @@ class WeatherInsightViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(insight)
         return Response(serializer.data)
 
+    def get_renderers(self):
+        # rotas declaradas à mão: o renderer SSE é escolhido aqui (ver
+        # WeatherLogViewSet.get_parsers)
+        request = getattr(self, "request", None)
+        method = request.method.lower() if request else None
+        if getattr(self, "action_map", {}).get(method) in SSE_ACTIONS:
+            return [JSONRenderer(), EventStreamRenderer()]
+        return super().get_renderers()
+
+    def _insight_params(self, request):
+        try:
+            hours = int(request.data.get("hours", 24))
+        except (TypeError, ValueError):
+            raise ValidationError({"hours": "Informe um número inteiro."})
+        return hours, request.data.get("city") or None
+
+    @staticmethod
+    def _event_stream(events):
+        response = StreamingHttpResponse(
+            events, content_type="text/event-stream; charset=utf-8"
+        )
+        response["Cache-Control"] = "no-cache"
+        # nginx: não bufferizar, cada evento sai assim que é gerado
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def _follow_progress(self, task_id: str, since: int = 0):
+        """
+        Acompanha os eventos de progresso de `task_id` (polling no cache)
+        até um evento final, gerando `(evento, dados)`; evento `None` é
+        um keep-alive. Cada conexão ocupa uma thread do worker, então a
+        espera é limitada a `SSE_MAX_WAIT_SECONDS`: depois disso sai um
+        `timeout` com `since`, para o cliente reconectar de onde parou.
+        """
+        sent = since
+        started = last_write = time.monotonic()
+        max_wait = min(lock_timeout(), SSE_MAX_WAIT_SECONDS)
+        while True:
+            items = progress_events(task_id, since=sent)
+            sent += len(items)
+            for item in items:
+                data = dict(item["data"])
+                if item["event"] == "done":
+                    insight = WeatherInsight.objects.filter(
+                        pk=data.get("insight_id")
+                    ).first()
+                    if insight is not None:
+                        data["insight"] = self.get_serializer(insight).data
+                yield item["event"], data
+                if item["event"] in FINAL_EVENTS:
+                    return
+
+            now = time.monotonic()
+            if items:
+                last_write = now
+            elif now - started > max_wait:
+                yield "timeout", {"since": sent}
+                return
+            elif now - last_write > SSE_KEEPALIVE_SECONDS:
+                last_write = now
+                yield None, None
+            time.sleep(SSE_POLL_SECONDS)
+
+    def _generate_stream(self, key: str, hours: int, city: str | None, run_id: str): # noqa E501
+        """
+        Geração em streaming de quem obteve o registro de execução: os
+        tokens vão para este cliente e o resultado é publicado nos
+        eventos de `run_id`, acompanhados pelos demais pedidos.
+        """
+        publish_progress(run_id, "generating", {"hours": hours, "city": city}) # noqa E501
+        insight_id = None
+        try:
+            result = {}
+            for event, data in stream_insight(hours=hours, city=city):
+                if event == "result":
+                    result = data
+                else:
+                    yield sse_event(event, {"text": data})
+
+            insight = WeatherInsight.objects.create(
+                text=result["text"],
+                city=city or "",
+                hours=hours,
+                fingerprint=result["fingerprint"],
+            )
+            insight_id = insight.id
+            publish_progress(run_id, "done", {"insight_id": insight.id, "cached": False}) # noqa E501
+        finally:
+            # erro ou cliente desconectado: libera quem está acompanhando
+            if insight_id is None:
+                publish_progress(run_id, "failed", {"detail": "Geração interrompida."}) # noqa E501
+            finish_run(key, run_id, insight_id)
+
+        yield sse_event(
+            "done",
+            {"cached": False, "insight": self.get_serializer(insight).data},
+        )
+
+    @action(detail=False, methods=["post"], url_path="stream")
+    def stream(self, request):
+        """
+        Gera o insight em streaming (Server-Sent Events): eventos `start`,
+        `token` (trechos do texto conforme a OpenAI responde), `fallback`
+        (texto numérico, se a IA falhar) e `done` com o insight salvo.
+        Um insight recente para o mesmo `(hours, city)` sai direto no
+        `done`.
+
+        Mesmo single-flight das tasks (`acquire_run`): se já há uma
+        geração igual em andamento (task ou outro stream), o pedido envia
+        `following` e aguarda o `done` dela (`shared=True`), sem chamar a
+        OpenAI de novo.
+        """
+        hours, city = self._insight_params(request)
+        key = insight_key(hours, city)
+
+        def events():
+            yield sse_event("start", {"hours": hours, "city": city})
+
+            # poucas tentativas: a execução seguida pode terminar entre o
+            # acquire e a leitura do registro
+            for _ in range(3):
+                insight = fresh_insight(key)
+                if insight is not None:
+                    yield sse_event(
+                        "done",
+                        {
+                            "cached": True,
+                            "insight": self.get_serializer(insight).data,
+                        },
+                    )
+                    return
+
+                run_id = str(uuid.uuid4())
+                if acquire_run(key, run_id):
+                    yield from self._generate_stream(key, hours, city, run_id) # noqa E501
+                    return
+
+                running = running_task(key)
+                if running is None:
+                    continue
+
+                yield sse_event("following", {"task_id": running})
+                for event, data in self._follow_progress(running):
+                    if event is None:
+                        yield ": keep-alive\n\n"
+                    elif event == "done" and "insight" in data:
+                        yield sse_event(
+                            "done",
+                            {
+                                "cached": True,
+                                "shared": True,
+                                "insight": data["insight"],
+                            },
+                        )
+                        return
+                    elif event in FINAL_EVENTS or event == "timeout":
+                        yield sse_event(
+                            "error",
+                            {"detail": "A geração em andamento não terminou."}, # noqa E501
+                        )
+                        return
+                return
+
+            yield sse_event(
+                "error", {"detail": "Não foi possível gerar o insight."}
+            )
+
+        return self._event_stream(events())
+
+    @action(detail=False, methods=["get"], url_path="tasks/(?P<task_id>[^/.]+)/events") # noqa E501
+    def task_events(self, request, task_id=None):
+        """
+        Progresso de uma task de insight via SSE (`queued`, `started`,
+        `collecting`, `generating` e por fim `done`, `skipped` ou
+        `failed`), em vez de o cliente consultar `/latest/` em loop.
+        Após `SSE_MAX_WAIT_SECONDS` sem fim sai `timeout` com `since`;
+        `?since=<n>` retoma a partir desse evento.
+        """
+        try:
+            since = max(int(request.query_params.get("since", 0)), 0)
+        except ValueError:
+            raise ValidationError({"since": "Informe um número inteiro."})
+        if not progress_events(task_id):
+            return Response(
+                {"detail": "Task não encontrada."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        def events():
+            for event, data in self._follow_progress(task_id, since=since):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield sse_event(event, data)
+
+        return self._event_stream(events())
+
     @action(detail=False, methods=["post"], url_path="generate")
     def generate(self, request):
-        hours = int(request.data.get("hours", 24))
-        city = request.data.get("city") or None
+        """
+        Pedidos repetidos para o mesmo `(hours, city)` não geram tasks
+        duplicadas: devolve o insight recente (200) ou a task já
+        enfileirada (202).
+        """
+        hours, city = self._insight_params(request)
 
         # se city vier preenchida, não forço coleta automática
         force_collect = not bool(city)
 
-        task = generate_insights_task.delay(
-            hours=hours,
-            force_collect=force_collect,
-            city=city,
+        result = request_insight(
+            hours,
+            city,
+            lambda task_id: generate_insights_task.apply_async(
+                kwargs={
+                    "hours": hours,
+                    "force_collect": force_collect,
+                    "city": city,
+                },
+                task_id=task_id,
+            ),
         )
 
+        if result["status"] == "fresh":
+            return Response(
+                {
+                    "detail": "Insight recente reaproveitado.",
+                    "cached": True,
+                    "city": city,
+                    "hours": hours,
+                    "insight": self.get_serializer(result["insight"]).data,
+                },
+                status=status.HTTP_200_OK,
+            )
+
         return Response(
             {
                 "detail": "Tarefa de geração de insight enviada.",
-                "task_id": str(task.id),
+                "task_id": result["task_id"],
+                "deduplicated": result["deduplicated"],
                 "city": city,
                 "hours": hours,
             },
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class WeatherConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.weather'
+
+    def ready(self):
+        from core.profiling import registry
+        from .services.openweather import geocode_metrics
+
+        registry.register_collector(geocode_metrics)
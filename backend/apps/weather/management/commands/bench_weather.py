@@ -0,0 +1,356 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from apps.weather.api.pagination import WeatherLogCursorPagination
+from apps.weather.models import WeatherLog
+from apps.weather.services import insights, llm, openweather
+
+
+class _StubResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class _StubWeatherSession:
+    """OpenWeather local: geocoding e clima atual respondidos em memória."""
+
+    def get(self, url, params=None, timeout=None):
+        if "geo" in url:
+            name = params["q"].split(",")[0]
+            return _StubResponse([{"lat": -15.8, "lon": -47.9, "name": name}]) # noqa E501
+        return _StubResponse(
+            {
+                "name": "Bench",
+                "main": {"temp": 25.0, "humidity": 60, "pressure": 1013},
+                "wind": {"speed": 2.0},
+                "weather": [{"description": "céu limpo"}],
+            }
+        )
+
+
+class _StubOpenAI:
+    """Cliente OpenAI local: devolve um texto fixo sem rede."""
+
+    def __init__(self):
+        message = mock.Mock(content="Insight de benchmark.")
+        completion = mock.Mock(choices=[mock.Mock(message=message)])
+        self.chat = mock.Mock()
+        self.chat.completions.create.return_value = completion
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(samples: list[float], rows: int | None = None) -> dict:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))] # noqa E501
+    result = {
+        "iterations": len(samples),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+    if rows:
+        result["rows"] = rows
+        result["rows_per_s"] = round(rows / statistics.median(ordered), 1)
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark da API de clima e do pipeline de insights: cria um banco "
+        "de benchmark, gera dados e mede latência/throughput (saída JSON)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--cities", type=int, default=5)
+        parser.add_argument("--iterations", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--ingest-batch",
+            type=int,
+            default=1000,
+            help="Linhas por requisição no benchmark de ingestão.",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Arquivo JSON de saída (default: stdout).",
+        )
+        parser.add_argument(
+            "--in-place",
+            action="store_true",
+            help=(
+                "Usa o banco atual em vez de criar um banco de benchmark "
+                "(os dados gerados permanecem nele)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        old_name = None
+        if not options["in_place"]:
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(override_settings(DEBUG=False))
+                stack.enter_context(
+                    override_settings(
+                        OPENAI_CONFIG={"api_key": "bench", "model": "bench"}
+                    )
+                )
+                stack.enter_context(
+                    mock.patch.object(
+                        openweather,
+                        "get_session",
+                        return_value=_StubWeatherSession(),
+                    )
+                )
+                stack.enter_context(
+                    mock.patch.object(
+                        llm, "get_openai_client", return_value=_StubOpenAI()
+                    )
+                )
+                report = self._run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                fh.write(output + "\n")
+            self.stdout.write(
+                self.style.SUCCESS(f"Resultados salvos em {options['output']}") # noqa E501
+            )
+        else:
+            self.stdout.write(output)
+
+    def _measure(self, fn, iterations: int, rows: int | None = None) -> dict: # noqa E501
+        fn()  # aquecimento (conexão, caches de query, imports)
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        return _summary(samples, rows=rows)
+
+    @staticmethod
+    def _cursor_at(url: str, offset: int) -> str | None:
+        """Token de cursor da página que começa após a linha `offset`."""
+        row = (
+            WeatherLog.objects.order_by(*WeatherLogCursorPagination.ordering)
+            .values("timestamp", "id")[offset:offset + 1]
+            .first()
+        )
+        if row is None:
+            return None
+        pagination = WeatherLogCursorPagination()
+        pagination.base_url = f"http://testserver{url}"
+        link = pagination.encode_cursor(
+            Cursor(
+                offset=0,
+                reverse=False,
+                position=WeatherLogCursorPagination._position(row),
+            )
+        )
+        return parse_qs(urlparse(link).query)["cursor"][0]
+
+    def _run(self, options) -> dict:
+        iterations = options["iterations"]
+
+        started = time.perf_counter()
+        call_command(
+            "seed_weather_logs",
+            cities=str(options["cities"]),
+            rows=options["rows"],
+            step=1,
+            seed=options["seed"],
+            stdout=StringIO(),
+        )
+        seed_seconds = time.perf_counter() - started
+
+        user, _ = get_user_model().objects.get_or_create(
+            username="bench",
+            defaults={"email": "bench@example.com", "is_superuser": True},
+        )
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        total = WeatherLog.objects.count()
+        city = WeatherLog.objects.values_list("city", flat=True).first()
+        list_url = reverse("weather-logs-list")
+
+        def get(url, params=None):
+            def call():
+                response = client.get(url, params)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                assert response.status_code == 200, response.status_code
+            return call
+
+        results = {}
+
+        deep = max(total - 10, 0)
+        for label, offset in (("first", 0), ("middle", total // 2), ("deep", deep)): # noqa E501
+            results[f"list_offset_{label}"] = self._measure(
+                get(list_url, {"limit": 10, "offset": offset}), iterations
+            )
+        results["list_offset_deep_no_count"] = self._measure(
+            get(list_url, {"limit": 10, "offset": deep, "count": "false"}),
+            iterations,
+        )
+        results["list_cursor_first"] = self._measure(
+            get(list_url, {"limit": 10, "pagination": "cursor"}), iterations
+        )
+        # cursor profundo: posição (timestamp, id) perto do registro mais
+        # antigo, codificada como o `next` de uma página nessa altura
+        results["list_cursor_deep"] = self._measure(
+            get(
+                list_url,
+                {
+                    "limit": 10,
+                    "pagination": "cursor",
+                    "cursor": self._cursor_at(list_url, deep),
+                },
+            ),
+            iterations,
+        )
+
+        results["series_city"] = self._measure(
+            get(reverse("weather-logs-series"), {"city": city, "points": 500}),
+            iterations,
+        )
+
+        # latest-by-city: primeira chamada aquece o cache, as demais medem
+        latest_url = reverse("weather-logs-latest-by-city")
+        latest_params = {
+            "city": ",".join(
+                WeatherLog.objects.order_by()
+                .values_list("city", flat=True)
+                .distinct()[:50]
+            )
+        }
+        get(latest_url, latest_params)()
+        results["latest_by_city"] = self._measure(
+            get(latest_url, latest_params), iterations
+        )
+
+        month_ago = (timezone.now() - timedelta(days=30)).isoformat()
+        export_params = {"city": city, "start": month_ago}
+        export_rows = WeatherLog.objects.filter(
+            city=city, timestamp__gte=month_ago
+        ).count()
+        results["export_csv"] = self._measure(
+            get(reverse("weather-logs-export-csv"), export_params),
+            iterations,
+            rows=export_rows,
+        )
+        results["export_parquet"] = self._measure(
+            get(reverse("weather-logs-export-parquet"), export_params),
+            iterations,
+            rows=export_rows,
+        )
+        results["export_xlsx"] = self._measure(
+            get(reverse("weather-logs-export-xlsx"), export_params),
+            iterations,
+            rows=export_rows,
+        )
+
+        for hours in (24, 168, 720):
+            for label, target in (("all", None), ("city", city)):
+                results[f"insights_{hours}h_{label}"] = self._measure(
+                    lambda h=hours, c=target: insights.generate_insights_for_last_hours( # noqa E501
+                        hours=h, city=c
+                    ),
+                    iterations,
+                )
+
+        # OpenWeather local: após o aquecimento, geocoding e clima vêm do cache
+        fetch_url = reverse("weather-logs-fetch-city")
+
+        def fetch_city():
+            response = client.post(fetch_url, {"city": city}, format="json")
+            assert response.status_code in (200, 201), response.status_code
+
+        results["fetch_city"] = self._measure(fetch_city, iterations)
+
+        batch = options["ingest_batch"]
+        now = timezone.now()
+        ingest_rows = [
+            {
+                "timestamp": (now - timedelta(minutes=i)).isoformat(),
+                "city": "Bench",
+                "temperature": 25.0,
+                "humidity": 60,
+                "pressure": 1013,
+                "wind_speed": 2.0,
+                "condition": "céu limpo",
+                "raw": {"source": "bench"},
+            }
+            for i in range(batch)
+        ]
+        bulk_url = reverse("weather-logs-bulk")
+
+        def ingest():
+            response = client.post(bulk_url, ingest_rows, format="json")
+            assert response.status_code == 201, response.status_code
+
+        results["ingest_bulk"] = self._measure(ingest, iterations, rows=batch) # noqa E501
+
+        return {
+            "meta": {
+                "generated_at": datetime.now().astimezone().isoformat(),
+                "git_commit": _git_commit(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "rows": total,
+                "cities": options["cities"],
+                "iterations": iterations,
+                "seed": options["seed"],
+                "seed_seconds": round(seed_seconds, 3),
+            },
+            "results": results,
+        }
@@ -0,0 +1,93 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from core.profiling import QueryCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa requisições contra um endpoint da API (no banco atual) e "
+        "mostra queries, tempo de SQL, Server-Timing e queries repetidas "
+        "(N+1)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Ex.: /api/v1/weather/logs/?limit=50") # noqa E501
+        parser.add_argument("--method", default="GET")
+        parser.add_argument(
+            "--data",
+            default=None,
+            help="Corpo JSON da requisição (POST/PUT/PATCH).",
+        )
+        parser.add_argument(
+            "--user",
+            default=None,
+            help="Username autenticado (default: primeiro superusuário).",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=5,
+            help="Quantidade de queries mais lentas exibidas.",
+        )
+
+    def _client(self, username):
+        User = get_user_model()
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"Usuário '{username}' não encontrado.")
+        else:
+            user = User.objects.filter(is_superuser=True).order_by("id").first() # noqa E501
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user=user)
+        return client
+
+    def handle(self, *args, **options):
+        client = self._client(options["user"])
+        method = getattr(client, options["method"].lower(), None)
+        if method is None:
+            raise CommandError(f"Método inválido: {options['method']}")
+        data = json.loads(options["data"]) if options["data"] else None
+
+        samples = []
+        with override_settings(PROFILING_ENABLED=True):
+            for _ in range(max(options["repeat"], 1)):
+                started = time.perf_counter()
+                with QueryCounter() as queries:
+                    response = method(options["path"], data, format="json")
+                    if response.streaming:
+                        for _ in response.streaming_content:
+                            pass
+                samples.append(time.perf_counter() - started)
+
+        self.stdout.write(f"{options['method'].upper()} {options['path']} -> {response.status_code}") # noqa E501
+        self.stdout.write(
+            f"tempo total: mediana {statistics.median(samples) * 1000:.1f} ms, " # noqa E501
+            f"mín {min(samples) * 1000:.1f} ms ({len(samples)} execuções)"
+        )
+        self.stdout.write(
+            f"queries: {queries.count} ({queries.duration * 1000:.1f} ms em SQL)" # noqa E501
+        )
+        if response.has_header("Server-Timing"):
+            self.stdout.write(f"Server-Timing: {response['Server-Timing']}")
+
+        slowest = sorted(queries.queries, key=lambda q: q[1], reverse=True)
+        if slowest:
+            self.stdout.write(self.style.NOTICE("queries mais lentas:"))
+            for sql, elapsed in slowest[: options["top"]]:
+                self.stdout.write(f"  {elapsed * 1000:8.2f} ms  {sql[:200]}")
+
+        duplicates = queries.duplicates()
+        if duplicates:
+            self.stdout.write(self.style.WARNING("queries repetidas (possível N+1):")) # noqa E501
+            for sql, n in duplicates.items():
+                self.stdout.write(f"  {n}x  {sql[:200]}")
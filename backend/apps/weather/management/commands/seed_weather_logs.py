@@ -1,70 +1,269 @@
-import random
-from datetime import timedelta
+import time
+from datetime import datetime, timezone as dt_timezone
 
-from django.core.management.base import BaseCommand
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from django.utils import timezone
 
-from apps.weather.models import WeatherLog
+from apps.weather.models import WeatherLog, normalize_city
+from apps.weather.services.latest import forget_latest
+from apps.weather.services.rollups import rebuild_rollups
+
+BRAZIL_CAPITALS = [
+    "Rio Branco", "Maceió", "Macapá", "Manaus", "Salvador", "Fortaleza",
+    "Brasília", "Vitória", "Goiânia", "São Luís", "Cuiabá", "Campo Grande",
+    "Belo Horizonte", "Belém", "João Pessoa", "Curitiba", "Recife",
+    "Teresina", "Rio de Janeiro", "Natal", "Porto Alegre", "Porto Velho",
+    "Boa Vista", "Florianópolis", "São Paulo", "Aracaju", "Palmas",
+]
+
+CONDITIONS = np.array(
+    ["céu limpo", "poucas nuvens", "nublado", "garoa", "chuva leve", "chuva forte"] # noqa E501
+)
+
+# horário de Brasília (UTC-3), usado para a curva diária de temperatura
+LOCAL_UTC_OFFSET_HOURS = -3
+
+# colunas gravadas direto (sem instâncias do ORM); raw_payload fica NULL
+INSERT_COLUMNS = (
+    "timestamp",
+    "city",
+    "city_key",
+    "temperature",
+    "humidity",
+    "pressure",
+    "wind_speed",
+    "condition",
+    "created_at",
+)
 
 
 class Command(BaseCommand):
-    help = "Gera dados fictícios de WeatherLog para testes de dashboard/insights." # noqa E501
+    help = (
+        "Gera dados fictícios de WeatherLog (curva diária de temperatura, "
+        "inserção em lote) para testes de dashboard, insights e performance." # noqa E501
+    )
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            "--cities",
+            default="1",
+            help=(
+                "Número de cidades (usa as capitais do Brasil, depois "
+                "'Cidade N') ou lista separada por vírgula (default: 1)."
+            ),
+        )
         parser.add_argument(
             "--days",
-            type=int,
+            type=float,
             default=7,
-            help="Quantidade de dias para trás a partir de hoje (default: 7).",
+            help="Quantidade de dias para trás a partir de agora (default: 7).", # noqa E501
         )
         parser.add_argument(
             "--step",
-            type=int,
+            type=float,
             default=3,
             help="Intervalo em horas entre leituras (default: 3h).",
         )
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=None,
+            help="Total de registros; se informado, ajusta --days.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Semente do gerador aleatório (dados reprodutíveis).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Registros gerados e inseridos por lote (default: 10000).",
+        )
+        parser.add_argument(
+            "--skip-rollups",
+            action="store_true",
+            help="Não recalcula os rollups ao final.",
+        )
+
+    def _parse_cities(self, value: str) -> list[str]:
+        if value.strip().isdigit():
+            count = int(value)
+            if count < 1:
+                raise CommandError("--cities deve ser maior que zero.")
+            extra = [
+                f"Cidade {i}" for i in range(len(BRAZIL_CAPITALS) + 1, count + 1) # noqa E501
+            ]
+            return (BRAZIL_CAPITALS + extra)[:count]
+        cities = [c.strip() for c in value.split(",") if c.strip()]
+        if not cities:
+            raise CommandError("Informe ao menos uma cidade em --cities.")
+        return cities
+
+    def _generate_chunk(self, rng, city_params, epoch_hours):
+        """
+        Gera as métricas de um lote de forma vetorizada: temperatura com
+        ciclo diário (mín. ~5h, máx. ~15h) e umidade inversa a ela.
+        """
+        base_temp, amplitude, base_humidity = city_params
+        n = epoch_hours.size
+        local_hour = (epoch_hours + LOCAL_UTC_OFFSET_HOURS) % 24
+        day_of_year = (epoch_hours / 24) % 365.25
+
+        daily = np.sin(2 * np.pi * (local_hour - 9) / 24)
+        seasonal = 2.5 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+        temperature = (
+            base_temp + amplitude * daily + seasonal + rng.normal(0, 1.2, n)
+        )
+        humidity = np.clip(
+            base_humidity - 3.0 * amplitude * daily + rng.normal(0, 6, n),
+            15,
+            100,
+        )
+        pressure = 1013 + rng.normal(0, 3, n) - 0.4 * (temperature - base_temp) # noqa E501
+        wind_speed = rng.gamma(2.0, 1.6, n)
+
+        rain_score = (humidity - 60) / 10 + rng.normal(0, 1, n)
+        condition_idx = np.clip(np.floor(rain_score + 2), 0, len(CONDITIONS) - 1) # noqa E501
+        condition = CONDITIONS[condition_idx.astype(int)]
+
+        return (
+            np.round(temperature, 1),
+            np.round(humidity, 0),
+            np.round(pressure, 1),
+            np.round(wind_speed, 1),
+            condition,
+        )
+
+    def _insert_rows(self, epoch, columns, city, city_key, created_at):
+        """
+        Grava um lote a partir dos arrays, sem criar instâncias de
+        WeatherLog: `COPY FROM STDIN` no PostgreSQL (psycopg 3),
+        `executemany` no SQLite e `bulk_create` nos demais bancos.
+        """
+        if connection.vendor not in ("postgresql", "sqlite"):
+            WeatherLog.objects.bulk_create(
+                [
+                    WeatherLog(
+                        timestamp=datetime.fromtimestamp(ts, tz=dt_timezone.utc), # noqa E501
+                        city=city,
+                        city_key=city_key,
+                        temperature=t,
+                        humidity=h,
+                        pressure=p,
+                        wind_speed=w,
+                        condition=c,
+                    )
+                    for ts, t, h, p, w, c in zip(epoch.tolist(), *columns)
+                ],
+                batch_size=len(epoch),
+            )
+            return
+
+        # mesmo texto que o Django grava/compara (UTC, "AAAA-MM-DD HH:MM:SS")
+        timestamps = np.char.replace(
+            np.datetime_as_string(epoch.astype("datetime64[s]"), unit="s"),
+            "T",
+            " ",
+        )
+        suffix = "+00:00" if connection.vendor == "postgresql" else ""
+        rows = [
+            (ts + suffix, city, city_key, t, h, p, w, c, created_at)
+            for ts, t, h, p, w, c in zip(timestamps.tolist(), *columns)
+        ]
+        table = WeatherLog._meta.db_table
+        names = ", ".join(f'"{column}"' for column in INSERT_COLUMNS)
+        with transaction.atomic(), connection.cursor() as cursor:
+            raw = cursor.cursor
+            if connection.vendor == "postgresql" and hasattr(raw, "copy"):
+                with raw.copy(f'COPY "{table}" ({names}) FROM STDIN') as copy: # noqa E501
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                placeholders = ", ".join(["%s"] * len(INSERT_COLUMNS))
+                cursor.executemany(
+                    f'INSERT INTO "{table}" ({names}) VALUES ({placeholders})', # noqa E501
+                    rows,
+                )
 
     def handle(self, *args, **options):
-        days = options["days"]
+        cities = self._parse_cities(options["cities"])
         step = options["step"]
+        chunk_size = options["chunk_size"]
+        if step <= 0 or chunk_size <= 0:
+            raise CommandError("--step e --chunk-size devem ser positivos.")
 
-        now = timezone.now()
-        total = 0
+        step_seconds = int(step * 3600)
+        if options["rows"]:
+            per_city = -(-options["rows"] // len(cities))
+        else:
+            per_city = int(options["days"] * 86400 // step_seconds)
+        total_target = options["rows"] or per_city * len(cities)
+
+        rng = np.random.default_rng(options["seed"])
+        now = int(timezone.now().timestamp())
+        end = now - now % step_seconds
+        start = end - (per_city - 1) * step_seconds
 
         self.stdout.write(
             self.style.NOTICE(
-                f"Gerando dados de {days} dia(s), a cada {step}h..."
+                f"Gerando {total_target} registros para {len(cities)} "
+                f"cidade(s), a cada {step}h..."
             )
         )
 
-        for day_offset in range(days, 0, -1):
-            base = (now - timedelta(days=day_offset)).replace(
-                hour=0, minute=0, second=0, microsecond=0
+        started = time.monotonic()
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        total = 0
+        for city in cities:
+            city_key = normalize_city(city)
+            city_params = (
+                rng.uniform(18, 28),
+                rng.uniform(3, 7),
+                rng.uniform(55, 80),
             )
+            remaining = min(per_city, total_target - total)
 
-            for hour in range(0, 24, step):
-                dt = base + timedelta(hours=hour)
-                temp = random.uniform(18, 34)
-                humidity = random.uniform(30, 90)
-                wind = random.uniform(0, 12)
-                rain_prob = random.choice([0, 10, 20, 30, 40, 60, 80, 100])
-                condition_code = random.choice(["0", "1", "2", "3", "45", "61"]) # noqa E501
-
-                WeatherLog.objects.create(
-                    collected_at=dt,
-                    temperature=round(temp, 1),
-                    humidity=round(humidity, 1),
-                    wind_speed=round(wind, 1),
-                    rain_probability=rain_prob,
-                    condition=str(condition_code),
-                    source="seed-script",
-                    raw_payload={},
+            for offset in range(0, remaining, chunk_size):
+                n = min(chunk_size, remaining - offset)
+                epoch = start + (offset + np.arange(n, dtype=np.int64)) * step_seconds # noqa E501
+                temps, hums, pressures, winds, conditions = self._generate_chunk( # noqa E501
+                    rng, city_params, epoch / 3600
                 )
+                self._insert_rows(
+                    epoch,
+                    [
+                        temps.tolist(),
+                        hums.tolist(),
+                        pressures.tolist(),
+                        winds.tolist(),
+                        conditions.tolist(),
+                    ],
+                    city,
+                    city_key,
+                    created_at,
+                )
+                total += n
+
+            if total >= total_target:
+                break
 
-                total += 1
+        # inserção direta: descarta o cache de última medição
+        forget_latest(normalize_city(city) for city in cities)
+
+        if not options["skip_rollups"] and total:
+            rebuild_rollups(
+                since=datetime.fromtimestamp(start, tz=dt_timezone.utc)
+            )
 
+        elapsed = time.monotonic() - started
         self.stdout.write(
             self.style.SUCCESS(
-                f"Seed concluído: {total} registros criados em WeatherLog."
+                f"Seed concluído: {total} registros criados em WeatherLog "
+                f"({elapsed:.1f}s, {total / max(elapsed, 1e-9):.0f} linhas/s)." # noqa E501
             )
         )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def fill_city_key(apps, schema_editor):
+    WeatherLog = apps.get_model("weather", "WeatherLog")
+    cities = WeatherLog.objects.values_list("city", flat=True).distinct()
+    for city in list(cities):
+        WeatherLog.objects.filter(city=city).update(
+            city_key=" ".join(city.split()).lower()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0003_weatherexport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatherlog',
+            name='city_key',
+            field=models.CharField(default='', editable=False, max_length=128),
+        ),
+        migrations.RunPython(fill_city_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='weatherlog',
+            index=models.Index(fields=['city_key', 'timestamp'], name='weather_log_citykey_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherlog',
+            index=models.Index(fields=['city', 'timestamp'], name='weather_log_city_ts_idx'),
+        ),
+    ]
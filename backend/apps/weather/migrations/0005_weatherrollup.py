@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0004_weatherlog_city_key_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=128)),
+                ('city_key', models.CharField(max_length=128)),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Dia')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_sum', models.FloatField()),
+                ('humidity_min', models.FloatField()),
+                ('humidity_max', models.FloatField()),
+                ('humidity_sum', models.FloatField()),
+                ('pressure_min', models.FloatField()),
+                ('pressure_max', models.FloatField()),
+                ('pressure_sum', models.FloatField()),
+                ('wind_speed_min', models.FloatField()),
+                ('wind_speed_max', models.FloatField()),
+                ('wind_speed_sum', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('city_key', 'granularity', 'bucket_start'), name='weather_rollup_bucket_uniq')],
+            },
+        ),
+    ]
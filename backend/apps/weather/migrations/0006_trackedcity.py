@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0005_weatherrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackedCity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('country', models.CharField(default='BR', max_length=8)),
+                ('city_key', models.CharField(editable=False, max_length=128)),
+                ('lat', models.FloatField(blank=True, null=True)),
+                ('lon', models.FloatField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'tracked cities',
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(fields=('city_key', 'country'), name='tracked_city_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0006_trackedcity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedCity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_key', models.CharField(max_length=128)),
+                ('country', models.CharField(max_length=8)),
+                ('name', models.CharField(blank=True, max_length=128)),
+                ('lat', models.FloatField(blank=True, null=True)),
+                ('lon', models.FloatField(blank=True, null=True)),
+                ('found', models.BooleanField(default=True)),
+                ('expires_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'geocoded cities',
+                'constraints': [models.UniqueConstraint(fields=('city_key', 'country'), name='geocoded_city_uniq')],
+            },
+        ),
+    ]
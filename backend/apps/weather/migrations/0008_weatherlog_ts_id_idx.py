@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0007_geocodedcity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weatherlog',
+            index=models.Index(fields=['timestamp', 'id'], name='weather_log_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0008_weatherlog_ts_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatherinsight',
+            name='city',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+        migrations.AddField(
+            model_name='weatherinsight',
+            name='city_key',
+            field=models.CharField(default='', editable=False, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='weatherinsight',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='weatherinsight',
+            name='hours',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='weatherinsight',
+            index=models.Index(fields=['city_key', '-generated_at'], name='weather_insight_city_gen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherinsight',
+            index=models.Index(fields=['fingerprint'], name='weather_insight_fp_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+"""
+PostgreSQL: converte `weather_weatherlog` numa tabela particionada por
+mês (RANGE em `timestamp`), com uma partição DEFAULT para linhas fora
+das partições criadas. Em outros bancos (SQLite) não faz nada: a
+retenção usa DELETE por intervalo (ver `services/retention.py`).
+
+A chave primária no banco passa a ser `(id, timestamp)`, exigência do
+PostgreSQL para tabelas particionadas; `id` continua único (sequence) e
+é a chave primária do ponto de vista do Django.
+"""
+
+from datetime import datetime, timezone
+
+from django.db import migrations
+from django.db.migrations.exceptions import IrreversibleError
+
+TABLE = "weather_weatherlog"
+OLD = "weather_weatherlog_unpartitioned"
+SEQUENCE = "weather_weatherlog_part_id_seq"
+MONTHS_AHEAD = 3
+
+INDEXES = {
+    "weather_log_citykey_ts_idx": '("city_key", "timestamp")',
+    "weather_log_city_ts_idx": '("city", "timestamp")',
+    "weather_log_ts_id_idx": '("timestamp", "id")',
+}
+
+
+def _months(first, last):
+    start = datetime(first.year, first.month, 1, tzinfo=timezone.utc)
+    while start <= last:
+        index = start.year * 12 + start.month
+        end = start.replace(year=index // 12, month=index % 12 + 1)
+        yield start, end
+        start = end
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 + MONTHS_AHEAD
+    horizon = now.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{OLD}"')
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{OLD}" INCLUDING DEFAULTS) '
+            'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"') # noqa E501
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ALTER COLUMN "id" '
+            f"SET DEFAULT nextval('{SEQUENCE}')"
+        )
+        cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT') # noqa E501
+
+        cursor.execute(f'SELECT MIN("timestamp") FROM "{OLD}"')
+        first = cursor.fetchone()[0] or now
+        for start, end in _months(min(first, now), horizon):
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}_p{start:%Y_%m}" PARTITION OF "{TABLE}" ' # noqa E501
+                "FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{OLD}"')
+        cursor.execute(
+            f"SELECT setval('{SEQUENCE}', COALESCE(MAX(\"id\"), 0) + 1, false) " # noqa E501
+            f'FROM "{TABLE}"'
+        )
+        cursor.execute(f'DROP TABLE "{OLD}"')
+
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" '
+            'PRIMARY KEY ("id", "timestamp")'
+        )
+        for name, columns in INDEXES.items():
+            cursor.execute(f'CREATE INDEX "{name}" ON "{TABLE}" {columns}')
+
+
+def unpartition_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        raise IrreversibleError(
+            "O particionamento de weather_weatherlog não é revertido "
+            "automaticamente."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0009_weatherinsight_scope_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
@@ -0,0 +1,88 @@
+"""
+Move o JSON `raw` dos logs para RawPayload (comprimido e deduplicado).
+
+Separado da criação da FK (0011) e da remoção da coluna (0013): no
+PostgreSQL, atualizar a FK deixa eventos de trigger pendentes até o fim
+da transação, e um ALTER TABLE na mesma migração falharia ("pending
+trigger events").
+"""
+
+import hashlib
+import json
+import zlib
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def _encode(payload):
+    text = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode()
+    return hashlib.sha256(text).hexdigest(), zlib.compress(text, 6), len(text)
+
+
+def move_raw_to_payloads(apps, schema_editor):
+    WeatherLog = apps.get_model("weather", "WeatherLog")
+    RawPayload = apps.get_model("weather", "RawPayload")
+
+    last_id = 0
+    while True:
+        logs = list(
+            WeatherLog.objects.filter(id__gt=last_id, raw__isnull=False)
+            .order_by("id")
+            .only("id", "raw")[:BATCH_SIZE]
+        )
+        if not logs:
+            break
+        last_id = logs[-1].id
+
+        encoded = {log.id: _encode(log.raw) for log in logs if log.raw}
+        digests = {item[0] for item in encoded.values()}
+        existing = dict(
+            RawPayload.objects.filter(digest__in=digests).values_list("digest", "id") # noqa E501
+        )
+        RawPayload.objects.bulk_create(
+            [
+                RawPayload(digest=digest, data=data, size=size)
+                for digest, data, size in {
+                    item[0]: item for item in encoded.values()
+                }.values()
+                if digest not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        existing = dict(
+            RawPayload.objects.filter(digest__in=digests).values_list("digest", "id") # noqa E501
+        )
+        for log in logs:
+            if log.id in encoded:
+                log.raw_payload_id = existing[encoded[log.id][0]]
+        WeatherLog.objects.bulk_update(logs, ["raw_payload"])
+
+
+def move_payloads_to_raw(apps, schema_editor):
+    WeatherLog = apps.get_model("weather", "WeatherLog")
+
+    logs = WeatherLog.objects.filter(raw_payload__isnull=False).select_related("raw_payload") # noqa E501
+    batch = []
+    for log in logs.iterator(chunk_size=BATCH_SIZE):
+        log.raw = json.loads(zlib.decompress(bytes(log.raw_payload.data)))
+        batch.append(log)
+        if len(batch) >= BATCH_SIZE:
+            WeatherLog.objects.bulk_update(batch, ["raw"])
+            batch = []
+    if batch:
+        WeatherLog.objects.bulk_update(batch, ["raw"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0011_rawpayload'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_raw_to_payloads, move_payloads_to_raw),
+    ]
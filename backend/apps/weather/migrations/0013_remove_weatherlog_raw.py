@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0012_move_raw_to_payloads'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='weatherlog',
+            name='raw',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0013_remove_weatherlog_raw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawpayload',
+            name='used_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
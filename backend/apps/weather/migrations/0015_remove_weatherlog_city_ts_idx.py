@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0014_rawpayload_used_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='weatherlog',
+            name='weather_log_city_ts_idx',
+        ),
+    ]
@@ -1,27 +1,388 @@
+import hashlib
+import json
+import uuid
+import zlib
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+def normalize_city(name: str | None) -> str:
+    """
+    Forma canônica do nome da cidade usada nos filtros (igualdade exata
+    em vez de `iexact`, para aproveitar os índices).
+    """
+    return " ".join((name or "").split()).lower()
+
+
+def payload_grace() -> timedelta:
+    """
+    Janela em que um RawPayload usado recentemente (`used_at`) não é
+    apagado como órfão, mesmo sem log apontando para ele ainda.
+    """
+    minutes = getattr(settings, "RETENTION_CONFIG", {}).get("orphan_grace_minutes", 60) # noqa E501
+    return timedelta(minutes=float(minutes))
+
+
+class RawPayloadManager(models.Manager):
+
+    def resolve(self, payloads) -> list:
+        """
+        RawPayload de cada JSON de `payloads` (None para payload vazio),
+        criando só os que ainda não existem: 2 consultas + 1 insert para
+        qualquer quantidade.
+        """
+        encoded = [RawPayload.encode(data) if data else None for data in payloads] # noqa E501
+        digests = {item[0] for item in encoded if item}
+        if not digests:
+            return [None] * len(encoded)
+
+        found = {p.digest: p for p in self.filter(digest__in=digests).defer("data")} # noqa E501
+        self._touch(found)
+        missing = {}
+        for item in encoded:
+            if item and item[0] not in found:
+                digest, data, size = item
+                missing[digest] = RawPayload(digest=digest, data=data, size=size) # noqa E501
+        if missing:
+            # ignore_conflicts: outro processo pode ter gravado o mesmo JSON
+            self.bulk_create(missing.values(), ignore_conflicts=True)
+            found.update(
+                (p.digest, p)
+                for p in self.filter(digest__in=missing).defer("data")
+            )
+        return [found[item[0]] if item else None for item in encoded]
+
+    def _touch(self, found: dict) -> None:
+        """
+        Renova `used_at` dos payloads reaproveitados (no máximo uma vez por
+        meia janela), para a limpeza de órfãos não apagá-los entre esta
+        leitura e o insert do log. Os que a limpeza já apagou saem de
+        `found` e são recriados.
+        """
+        now = timezone.now()
+        stale = [p.pk for p in found.values() if p.used_at < now - payload_grace() / 2] # noqa E501
+        if not stale:
+            return
+        if self.filter(pk__in=stale).update(used_at=now) == len(stale):
+            return
+        alive = set(self.filter(pk__in=stale).values_list("pk", flat=True))
+        for digest, payload in list(found.items()):
+            if payload.pk in stale and payload.pk not in alive:
+                del found[digest]
+
+
+class RawPayload(models.Model):
+    """
+    JSON original da OpenWeather, fora da tabela de logs: comprimido e
+    endereçado pelo conteúdo (sha256 do JSON canônico), então leituras
+    idênticas compartilham a mesma linha.
+    """
+
+    class Encoding(models.TextChoices):
+        ZLIB = "zlib", "zlib"
+
+    digest = models.CharField(max_length=64, unique=True)
+    encoding = models.CharField(
+        max_length=8, choices=Encoding.choices, default=Encoding.ZLIB
+    )
+    data = models.BinaryField()
+    # tamanho do JSON sem compressão, em bytes
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # último `resolve` que devolveu o payload (criação ou reaproveitamento)
+    used_at = models.DateTimeField(default=timezone.now)
+
+    objects = RawPayloadManager()
+
+    def __str__(self):
+        return self.digest[:12]
+
+    @staticmethod
+    def encode(payload) -> tuple[str, bytes, int]:
+        """(digest, bytes comprimidos, tamanho original) do JSON."""
+        text = json.dumps(
+            payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode()
+        return hashlib.sha256(text).hexdigest(), zlib.compress(text, 6), len(text) # noqa E501
+
+    @staticmethod
+    def decode_bytes(data) -> bytes:
+        return zlib.decompress(bytes(data))
+
+    def decode(self):
+        return json.loads(self.decode_bytes(self.data))
+
+
+def attach_raw_payloads(logs) -> None:
+    """Grava os `raw` pendentes dos logs e preenche a FK (bulk)."""
+    pending = [log for log in logs if getattr(log, "_raw_pending", False)]
+    if not pending:
+        return
+    payloads = RawPayload.objects.resolve([log._raw for log in pending])
+    for log, payload in zip(pending, payloads):
+        log.raw_payload = payload
+        log._raw_pending = False
+
+
+class WeatherLogQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        attach_raw_payloads(objs)
+        return super().bulk_create(objs, *args, **kwargs)
 
 
 class WeatherLog(models.Model):
     timestamp = models.DateTimeField()
     city = models.CharField(max_length=128)
+    city_key = models.CharField(max_length=128, editable=False, default="")
     temperature = models.FloatField()
     humidity = models.FloatField()
     pressure = models.FloatField()
     wind_speed = models.FloatField()
     condition = models.CharField(max_length=255)
-    raw = models.JSONField(null=True, blank=True)
+    # JSON da OpenWeather em tabela separada (ver `raw`)
+    raw_payload = models.ForeignKey(
+        RawPayload,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="logs",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = WeatherLogQuerySet.as_manager()
+
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(
+                fields=["city_key", "timestamp"],
+                name="weather_log_citykey_ts_idx",
+            ),
+            models.Index(
+                fields=["timestamp", "id"],
+                name="weather_log_ts_id_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.city} - {self.timestamp:%d/%m %H:%M}"
 
+    @property
+    def raw(self):
+        """
+        JSON original da OpenWeather. Lido (e descomprimido) sob demanda;
+        atribuir um dict grava o RawPayload no próximo save/bulk_create.
+        """
+        if not hasattr(self, "_raw"):
+            payload = self.raw_payload if self.raw_payload_id else None
+            self._raw = payload.decode() if payload else None
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+        self._raw = value
+        self._raw_pending = True
+
+    def save(self, *args, **kwargs):
+        self.city_key = normalize_city(self.city)
+        attach_raw_payloads([self])
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "city" in update_fields:
+                update_fields.add("city_key")
+            if "raw" in update_fields:
+                update_fields = (update_fields - {"raw"}) | {"raw_payload"}
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+
+class TrackedCity(models.Model):
+    """Cidade coletada periodicamente pela task de coleta em lote."""
+
+    name = models.CharField(max_length=128)
+    country = models.CharField(max_length=8, default="BR")
+    city_key = models.CharField(max_length=128, editable=False)
+    lat = models.FloatField(null=True, blank=True)
+    lon = models.FloatField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name_plural = "tracked cities"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city_key", "country"],
+                name="tracked_city_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name}/{self.country}"
+
+    def save(self, *args, **kwargs):
+        self.city_key = normalize_city(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "city_key"}
+        super().save(*args, **kwargs)
+
+
+class GeocodedCity(models.Model):
+    """
+    Cache persistente do geocoding da OpenWeather. `found=False` guarda
+    o resultado negativo ("cidade não encontrada") por um TTL menor.
+    """
+
+    city_key = models.CharField(max_length=128)
+    country = models.CharField(max_length=8)
+    name = models.CharField(max_length=128, blank=True)
+    lat = models.FloatField(null=True, blank=True)
+    lon = models.FloatField(null=True, blank=True)
+    found = models.BooleanField(default=True)
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "geocoded cities"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city_key", "country"],
+                name="geocoded_city_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.city_key}/{self.country}"
+
+
+class WeatherRollup(models.Model):
+    """
+    Agregado por cidade e intervalo (hora/dia) dos WeatherLogs, mantido
+    incrementalmente a cada inserção e recompactado por task Celery.
+    """
+
+    class Granularity(models.TextChoices):
+        HOUR = "hour", "Hora"
+        DAY = "day", "Dia"
+
+    city = models.CharField(max_length=128)
+    city_key = models.CharField(max_length=128)
+    granularity = models.CharField(max_length=8, choices=Granularity.choices) # noqa E501
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_sum = models.FloatField()
+    humidity_min = models.FloatField()
+    humidity_max = models.FloatField()
+    humidity_sum = models.FloatField()
+    pressure_min = models.FloatField()
+    pressure_max = models.FloatField()
+    pressure_sum = models.FloatField()
+    wind_speed_min = models.FloatField()
+    wind_speed_max = models.FloatField()
+    wind_speed_sum = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["bucket_start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city_key", "granularity", "bucket_start"],
+                name="weather_rollup_bucket_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.city} {self.granularity} {self.bucket_start:%d/%m %H:%M}" # noqa E501
+
+    def _avg(self, metric: str):
+        if not self.count:
+            return None
+        return getattr(self, f"{metric}_sum") / self.count
+
+    @property
+    def temperature_avg(self):
+        return self._avg("temperature")
+
+    @property
+    def humidity_avg(self):
+        return self._avg("humidity")
+
+    @property
+    def pressure_avg(self):
+        return self._avg("pressure")
+
+    @property
+    def wind_speed_avg(self):
+        return self._avg("wind_speed")
+
 
 class WeatherInsight(models.Model):
     generated_at = models.DateTimeField(auto_now_add=True)
     text = models.TextField()
+    # escopo do insight: cidade ("" = todas) e janela em horas
+    city = models.CharField(max_length=128, blank=True, default="")
+    city_key = models.CharField(max_length=128, editable=False, default="")
+    hours = models.PositiveIntegerField(null=True, blank=True)
+    # hash dos agregados enviados à IA; vazio quando o texto não veio da IA
+    fingerprint = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["city_key", "-generated_at"],
+                name="weather_insight_city_gen_idx",
+            ),
+            models.Index(
+                fields=["fingerprint"],
+                name="weather_insight_fp_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Insight {self.generated_at:%d/%m %H:%M}"
+
+    def save(self, *args, **kwargs):
+        self.city_key = normalize_city(self.city)
+        super().save(*args, **kwargs)
+
+
+class WeatherExport(models.Model):
+    """Exportação gerada em background (Celery) para download posterior."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pendente"
+        RUNNING = "running", "Processando"
+        DONE = "done", "Concluída"
+        FAILED = "failed", "Falhou"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False) # noqa E501
+    format = models.CharField(max_length=16, default="xlsx")
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    file = models.FileField(upload_to="exports/", null=True, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="weather_exports",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Export {self.format} {self.id} ({self.status})"
@@ -0,0 +1,282 @@
+import csv
+import io
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from openpyxl import Workbook
+
+EXPORT_FIELDS = (
+    "timestamp",
+    "city",
+    "temperature",
+    "humidity",
+    "pressure",
+    "wind_speed",
+    "condition",
+)
+
+# linhas lidas do banco por vez (server-side cursor no PostgreSQL)
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+)
+
+# acima disso o arquivo temporário do XLSX vai da memória para o disco
+XLSX_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+# linhas por record batch / row group nos formatos colunares: grupos
+# maiores comprimem melhor que os blocos lidos do banco
+ARROW_BATCH_SIZE = 50000
+
+# tipos das colunas nos formatos colunares (demais como texto)
+_FLOAT_FIELDS = {"temperature", "humidity", "pressure", "wind_speed"}
+_TIMESTAMP_FIELDS = {"timestamp", "created_at"}
+
+
+def iter_export_rows(qs, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Percorre os logs em ordem cronológica como tuplas (sem instanciar
+    models), mantendo o uso de memória constante.
+    """
+    rows = (
+        qs.order_by("timestamp")
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for timestamp, *values in rows:
+        yield [timestamp.isoformat(), *values]
+
+
+class _Echo:
+    """Buffer fake: o csv.writer devolve a linha em vez de gravá-la."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(qs, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Gera o CSV em blocos de `chunk_size` linhas, para uso com
+    StreamingHttpResponse.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+
+    buffer = []
+    for row in iter_export_rows(qs, chunk_size=chunk_size):
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def arrow_schema(fields=EXPORT_FIELDS, with_raw: bool = False):
+    """Schema tipado: timestamp em UTC, métricas float64, textos string."""
+    import pyarrow as pa
+
+    columns = []
+    for field in fields:
+        if field in _TIMESTAMP_FIELDS:
+            columns.append(pa.field(field, pa.timestamp("us", tz="UTC")))
+        elif field == "id":
+            columns.append(pa.field(field, pa.int64()))
+        elif field in _FLOAT_FIELDS:
+            columns.append(pa.field(field, pa.float64()))
+        else:
+            columns.append(pa.field(field, pa.string()))
+    if with_raw:
+        # payload original como JSON (texto), para arquivamento
+        columns.append(pa.field("raw", pa.string()))
+    return pa.schema(columns)
+
+
+def iter_record_batches(qs, fields=EXPORT_FIELDS, *, with_raw: bool = False, batch_size: int = ARROW_BATCH_SIZE, chunk_size: int = EXPORT_CHUNK_SIZE): # noqa E501
+    """
+    Lê os logs em blocos do banco (como `iter_export_rows`) e agrupa em
+    `pyarrow.RecordBatch` de até `batch_size` linhas, coluna a coluna.
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema(fields, with_raw=with_raw)
+    names = list(fields) + (["raw_payload__data"] if with_raw else [])
+    rows = (
+        qs.order_by("timestamp")
+        .values_list(*names)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    columns = [[] for _ in names]
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+        if len(columns[0]) >= batch_size:
+            yield _record_batch(pa, schema, columns, with_raw)
+            columns = [[] for _ in names]
+    if columns[0]:
+        yield _record_batch(pa, schema, columns, with_raw)
+
+
+def _record_batch(pa, schema, columns, with_raw: bool):
+    if with_raw:
+        from apps.weather.models import RawPayload
+
+        # o RawPayload já guarda o JSON canônico: basta descomprimir
+        columns[-1] = [
+            None if data is None else RawPayload.decode_bytes(data).decode()
+            for data in columns[-1]
+        ]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=f.type) for column, f in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Destino de escrita que acumula os bytes gravados pelo writer do
+    pyarrow para serem entregues em blocos (StreamingHttpResponse).
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _iter_columnar(qs, open_writer, fields=EXPORT_FIELDS, *, with_raw: bool = False, **kwargs): # noqa E501
+    sink = _ChunkSink()
+    writer = open_writer(sink, arrow_schema(fields, with_raw=with_raw))
+    for batch in iter_record_batches(qs, fields, with_raw=with_raw, **kwargs): # noqa E501
+        writer.write_batch(batch)
+        data = sink.pop()
+        if data:
+            yield data
+    writer.close()
+    yield sink.pop()
+
+
+def iter_parquet(qs, compression: str = "zstd", **kwargs):
+    """
+    Gera um arquivo Parquet em blocos: um row group por record batch,
+    enviado assim que é escrito (o rodapé com os metadados vai no fim).
+    """
+    import pyarrow.parquet as pq
+
+    return _iter_columnar(
+        qs,
+        lambda sink, schema: pq.ParquetWriter(
+            sink, schema, compression=compression
+        ),
+        **kwargs,
+    )
+
+
+def iter_arrow_stream(qs, compression: str = "zstd", **kwargs):
+    """Gera o formato Arrow IPC (streaming), com buffers comprimidos."""
+    import pyarrow as pa
+
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    return _iter_columnar(
+        qs,
+        lambda sink, schema: pa.ipc.new_stream(sink, schema, options=options), # noqa E501
+        **kwargs,
+    )
+
+
+def write_xlsx(qs, fileobj, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Grava os logs em `fileobj` usando o modo write-only do openpyxl,
+    que não mantém as células em memória.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Weather Logs")
+    ws.append(EXPORT_FIELDS)
+    for row in iter_export_rows(qs, chunk_size=chunk_size):
+        ws.append(row)
+    wb.save(fileobj)
+    return fileobj
+
+
+def build_xlsx_file(qs):
+    """
+    Renderiza o XLSX num arquivo temporário (em memória até
+    XLSX_SPOOL_MAX_SIZE, depois em disco) pronto para ser lido do início.
+    """
+    tmp = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    write_xlsx(qs, tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def run_export(export):
+    """
+    Gera o arquivo de um WeatherExport pendente e o salva no storage.
+    Usado pela task Celery de exportação assíncrona.
+    """
+    from apps.weather.models import WeatherExport, WeatherLog
+    from apps.weather.services.queries import filter_weather_logs
+
+    export.status = WeatherExport.Status.RUNNING
+    export.save(update_fields=["status"])
+
+    try:
+        qs = filter_weather_logs(WeatherLog.objects.all(), **export.filters)
+        with build_xlsx_file(qs) as tmp:
+            export.file.save(
+                f"weather_logs_{export.id}.xlsx", File(tmp), save=False
+            )
+    except Exception as exc:
+        export.status = WeatherExport.Status.FAILED
+        export.error = str(exc)
+        export.finished_at = timezone.now()
+        export.save(update_fields=["status", "error", "finished_at"])
+        raise
+
+    export.status = WeatherExport.Status.DONE
+    export.finished_at = timezone.now()
+    export.save(update_fields=["status", "file", "finished_at"])
+    return export
+
+
+def purge_exports(now=None) -> int:
+    """
+    Apaga os WeatherExport criados há mais de `EXPORTS_CONFIG["ttl_days"]`
+    dias, com os arquivos no storage (inclusive pendentes que travaram).
+    Retorna quantas exportações foram removidas; `ttl_days=0` desliga.
+    """
+    from apps.weather.models import WeatherExport
+
+    ttl_days = int(getattr(settings, "EXPORTS_CONFIG", {}).get("ttl_days", 7))
+    if ttl_days <= 0:
+        return 0
+    cutoff = (now or timezone.now()) - timedelta(days=ttl_days)
+
+    expired = WeatherExport.objects.filter(created_at__lt=cutoff)
+    for export in expired.exclude(file="").exclude(file=None).iterator():
+        # o arquivo pode já ter sumido do storage: delete() não falha
+        export.file.delete(save=False)
+    deleted, _ = expired.delete()
+    return deleted
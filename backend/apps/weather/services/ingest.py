@@ -0,0 +1,108 @@
+from datetime import datetime
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from apps.weather.models import WeatherLog, normalize_city
+from apps.weather.services.latest import record_latest
+from apps.weather.services.rollups import record_rollups
+
+# linhas validadas e gravadas por transação
+INGEST_CHUNK_SIZE = 2000
+
+FLOAT_FIELDS = ("temperature", "humidity", "pressure", "wind_speed")
+TEXT_FIELDS = {"city": 128, "condition": 255}
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str):
+        dt = datetime.fromisoformat(value)
+    else:
+        raise ValueError
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def validate_row(row) -> tuple[WeatherLog | None, dict | None]:
+    """
+    Validação enxuta de uma leitura (mesmas regras do WeatherLogSerializer,
+    sem a maquinaria de fields do DRF). Devolve `(log, None)` ou
+    `(None, erros)` no formato de erros do DRF.
+    """
+    if not isinstance(row, dict):
+        return None, {"non_field_errors": ["Cada item deve ser um objeto JSON."]} # noqa E501
+
+    errors = {}
+    values = {}
+
+    try:
+        values["timestamp"] = _parse_timestamp(row.get("timestamp"))
+    except (TypeError, ValueError):
+        errors["timestamp"] = ["Data/hora inválida ou ausente."]
+
+    for field in FLOAT_FIELDS:
+        try:
+            values[field] = float(row[field])
+        except KeyError:
+            errors[field] = ["Este campo é obrigatório."]
+        except (TypeError, ValueError):
+            errors[field] = ["Um número válido é necessário."]
+
+    for field, max_length in TEXT_FIELDS.items():
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors[field] = ["Este campo é obrigatório."]
+        elif len(value) > max_length:
+            errors[field] = [
+                f"Certifique-se de que este campo não tenha mais de {max_length} caracteres." # noqa E501
+            ]
+        else:
+            values[field] = value
+
+    raw = row.get("raw")
+    if not isinstance(raw, dict) or not raw:
+        errors["raw"] = ["Campo 'raw' é obrigatório e não pode ser vazio."]
+    else:
+        values["raw"] = raw
+
+    if errors:
+        return None, errors
+    return WeatherLog(city_key=normalize_city(values["city"]), **values), None
+
+
+def ingest_rows(rows, chunk_size: int = INGEST_CHUNK_SIZE) -> dict:
+    """
+    Ingestão em lote: valida e grava `rows` (lista ou gerador, ex. NDJSON)
+    em blocos de `chunk_size`, cada bloco com um bulk_create numa única
+    transação. Linhas inválidas são reportadas sem abortar o lote.
+    """
+    created = 0
+    errors = []
+    iterator = iter(rows)
+    offset = 0
+
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+
+        logs = []
+        for index, row in enumerate(chunk, start=offset):
+            log, row_errors = validate_row(row)
+            if row_errors:
+                errors.append({"index": index, "errors": row_errors})
+            else:
+                logs.append(log)
+        offset += len(chunk)
+
+        if logs:
+            with transaction.atomic():
+                WeatherLog.objects.bulk_create(logs, batch_size=chunk_size)
+                record_rollups(logs)
+            # fora da transação: o cache só vê blocos já gravados
+            record_latest(logs)
+            created += len(logs)
+
+    return {"created": created, "failed": len(errors), "errors": errors}
@@ -0,0 +1,191 @@
+"""
+Deduplicação da geração de insights por `(hours, city)`.
+
+- `insights:job:<chave>`: task enfileirada (id da task), evita enfileirar
+  de novo enquanto ela não termina;
+- `insights:running:<chave>`: task (ou stream SSE) em execução, impede
+  duas gerações iguais em paralelo (inclusive as disparadas pelo beat);
+  guarda o id da execução, cujos eventos os outros pedidos acompanham;
+- `insights:done:<chave>`: último insight gerado, reaproveitado dentro da
+  janela de frescor (`INSIGHTS_CONFIG["freshness_seconds"]`);
+- `insights:events:<task_id>`: contador de eventos de progresso da task
+  e `insights:events:<task_id>:<n>`, o n-ésimo evento, lidos pelo
+  endpoint SSE `/insights/tasks/<task_id>/events/`.
+
+O registro fica no cache do Django (Redis em produção, compartilhado
+entre o web e os workers do Celery).
+"""
+
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from ..models import WeatherInsight, normalize_city
+
+
+def _config(name: str, default: float) -> float:
+    return float(getattr(settings, "INSIGHTS_CONFIG", {}).get(name, default))
+
+
+def freshness_seconds() -> float:
+    return _config("freshness_seconds", 300)
+
+
+def lock_timeout() -> float:
+    return _config("lock_timeout", 600)
+
+
+def insight_key(hours: int, city: str | None = None) -> str:
+    """Chave idempotente: mesmas horas e mesma cidade normalizada."""
+    return f"{int(hours)}:{normalize_city(city) or '*'}"
+
+
+def fresh_insight(key: str) -> WeatherInsight | None:
+    insight_id = cache.get(f"insights:done:{key}")
+    if insight_id is None:
+        return None
+    return WeatherInsight.objects.filter(pk=insight_id).first()
+
+
+def request_insight(hours: int, city: str | None, enqueue) -> dict:
+    """
+    Pede a geração de um insight. Devolve o insight recente, se houver
+    (`status="fresh"`), o id da task já enfileirada para a mesma chave
+    (`status="queued"`, `deduplicated=True`) ou enfileira uma nova task
+    via `enqueue(task_id)`.
+    """
+    key = insight_key(hours, city)
+
+    insight = fresh_insight(key)
+    if insight is not None:
+        return {"status": "fresh", "insight": insight}
+
+    job_key = f"insights:job:{key}"
+    task_id = str(uuid.uuid4())
+    if not cache.add(job_key, task_id, timeout=lock_timeout()):
+        existing = cache.get(job_key)
+        if existing is not None:
+            return {
+                "status": "queued",
+                "task_id": existing,
+                "deduplicated": True,
+            }
+        # a task anterior terminou entre o add e o get
+        cache.set(job_key, task_id, timeout=lock_timeout())
+
+    publish_progress(task_id, "queued", {"hours": int(hours), "city": city})
+    try:
+        enqueue(task_id)
+    except Exception:
+        cache.delete(job_key)
+        raise
+    return {"status": "queued", "task_id": task_id, "deduplicated": False}
+
+
+def acquire_run(key: str, task_id: str | None) -> bool:
+    """Registro de execução: False se outra task igual já está rodando."""
+    return cache.add(
+        f"insights:running:{key}", task_id or "local", timeout=lock_timeout()
+    )
+
+
+def running_task(key: str) -> str | None:
+    """Id da execução em andamento para a chave (task ou stream SSE)."""
+    return cache.get(f"insights:running:{key}")
+
+
+def mark_done(key: str, insight_id: int):
+    """Registra o insight recém-gerado para a janela de frescor."""
+    cache.set(f"insights:done:{key}", insight_id, timeout=freshness_seconds()) # noqa E501
+
+
+def release_job(key: str, task_id: str | None):
+    """Libera o registro de enfileiramento, se ainda for desta task."""
+    job_key = f"insights:job:{key}"
+    if task_id is not None and cache.get(job_key) == task_id:
+        cache.delete(job_key)
+
+
+def hand_over_job(key: str, task_id: str | None) -> str | None:
+    """
+    Task ignorada por já haver execução igual: o registro de enfileiramento
+    passa para essa execução (ou é liberado, se ela já terminou), e novos
+    pedidos acompanham quem de fato gera o insight. Devolve o id dela.
+    """
+    running = running_task(key)
+    if running == "local":
+        # execução sem id (fora do Celery) não publica progresso
+        running = None
+    job_key = f"insights:job:{key}"
+    if task_id is None or cache.get(job_key) != task_id:
+        return running
+    if running is not None and running != task_id:
+        cache.set(job_key, running, timeout=lock_timeout())
+    else:
+        cache.delete(job_key)
+    return running
+
+
+def finish_run(key: str, task_id: str | None, insight_id: int | None):
+    """
+    Encerra uma execução registrada por `acquire_run`. O registro de
+    execução só é apagado se ainda pertencer a `task_id`: uma task que
+    não o adquiriu não pode liberar o de outra que ainda está rodando.
+    """
+    if insight_id is not None:
+        mark_done(key, insight_id)
+    running_key = f"insights:running:{key}"
+    if cache.get(running_key) == (task_id or "local"):
+        cache.delete(running_key)
+    release_job(key, task_id)
+
+
+# eventos que encerram o stream de progresso de uma task
+FINAL_EVENTS = {"done", "skipped", "failed"}
+
+
+def _events_key(task_id: str) -> str:
+    return f"insights:events:{task_id}"
+
+
+def publish_progress(task_id: str | None, event: str, data: dict | None = None): # noqa E501
+    """
+    Acrescenta um evento ao histórico de progresso da task. A posição vem
+    de `cache.incr` (atômico no Redis) e cada evento tem a própria chave,
+    então publicações concorrentes (a task e o stream SSE, por exemplo)
+    não sobrescrevem uma à outra.
+    """
+    if task_id is None:
+        return
+    counter = _events_key(task_id)
+    timeout = lock_timeout()
+    cache.add(counter, 0, timeout=timeout)
+    try:
+        position = cache.incr(counter)
+    except ValueError:
+        # o contador expirou entre o add e o incr
+        cache.add(counter, 0, timeout=timeout)
+        position = cache.incr(counter)
+    cache.touch(counter, timeout=timeout)
+    cache.set(
+        f"{counter}:{position}",
+        {"event": event, "data": data or {}},
+        timeout=timeout,
+    )
+
+
+def progress_events(task_id: str, since: int = 0) -> list[dict]:
+    """
+    Eventos publicados a partir da posição `since`. Para no primeiro
+    evento ainda não gravado (posição reservada, `set` pendente), que
+    sai na próxima leitura, para não pular nem reordenar eventos.
+    """
+    counter = _events_key(task_id)
+    total = cache.get(counter) or 0
+    keys = [f"{counter}:{position}" for position in range(since + 1, total + 1)] # noqa E501
+    found = cache.get_many(keys)
+    events = []
+    for key in keys:
+        if key not in found:
+            break
+        events.append(found[key])
+    return events
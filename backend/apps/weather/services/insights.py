@@ -1,27 +1,52 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
-from apps.weather.models import WeatherLog
-from openai import OpenAI
+from django.db.models import Avg, Count, F, Max, Min, Window
+from django.db.models.functions import RowNumber
+from apps.weather.models import WeatherInsight, WeatherLog, normalize_city
+from apps.weather.services import insight_jobs
+from apps.weather.services.llm import (
+    LLMUnavailable,
+    chat_completion,
+    stream_chat_completion,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def _generate_rule_based_insight(qs, hours: int, city: str | None = None) -> str: # noqa E501
-    count = qs.count()
+def _summarize(qs) -> dict:
+    """
+    Calcula as estatísticas do período numa única consulta agregada.
+    """
+    return qs.aggregate(
+        count=Count("id"),
+        avg_temp=Avg("temperature"),
+        max_temp=Max("temperature"),
+        min_temp=Min("temperature"),
+        avg_humidity=Avg("humidity"),
+    )
+
+
+def _generate_rule_based_insight(qs, hours: int, city: str | None = None, *, stats: dict | None = None, last=None) -> str: # noqa E501
+    if stats is None:
+        stats = _summarize(qs)
+
+    count = stats["count"]
     if count == 0:
         if city:
             return f"Ainda não há dados suficientes para gerar insights climáticos para {city}." # noqa E501
         return "Ainda não há dados suficientes para gerar insights climáticos."
 
-    temps = [w.temperature for w in qs]
-    hums = [w.humidity for w in qs]
-    max_temp = max(temps)
-    min_temp = min(temps)
-    avg_temp = sum(temps) / len(temps)
-    avg_humidity = sum(hums) / len(hums)
-    last = qs.first()
+    max_temp = stats["max_temp"]
+    min_temp = stats["min_temp"]
+    avg_temp = stats["avg_temp"]
+    avg_humidity = stats["avg_humidity"]
+    if last is None:
+        last = qs.order_by("-timestamp").first()
 
     cidade_ref = city or last.city
 
@@ -35,23 +60,86 @@ def _generate_rule_based_insight(qs, hours: int, city: str | None = None) -> str
     return texto
 
 
+def insight_fingerprint(hours: int, city: str | None, model: str, stats: dict, recent_logs) -> str: # noqa E501
+    """
+    Hash dos dados que entram no prompt: mesma janela, cidade, modelo,
+    agregados e últimas medições geram o mesmo texto.
+    """
+    content = {
+        "hours": int(hours),
+        "city": normalize_city(city),
+        "model": model,
+        "stats": {
+            k: round(v, 2) if isinstance(v, float) else v
+            for k, v in stats.items()
+        },
+        "recent": [log.id for log in recent_logs],
+    }
+    data = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
 def generate_insights_for_last_hours(hours: int = 24, city: str | None = None) -> str: # noqa E501
+    return generate_insight(hours=hours, city=city)["text"]
+
+
+def _prepare_insight(hours: int, city: str | None) -> dict:
+    """
+    Etapa comum ao insight síncrono e ao streaming: lê os dados (2
+    queries) e monta o texto numérico. Devolve `text` já pronto quando a
+    IA não é necessária (sem chave, sem dados ou fingerprint repetido);
+    caso contrário devolve as `messages` para a OpenAI.
+    """
     since = timezone.now() - timedelta(hours=hours)
 
     qs = WeatherLog.objects.filter(timestamp__gte=since)
     if city:
-        qs = qs.filter(city__iexact=city)
+        qs = qs.filter(city_key=normalize_city(city))
 
     qs = qs.order_by("-timestamp")
 
+    stats = _summarize(qs)
+    recent_logs = list(qs[:5]) if stats["count"] else []
+
     logger.info(
         "Gerando insight para últimas %sh. Cidade=%s. Registros encontrados: %s", # noqa E501
         hours,
         city or "(todas)",
-        qs.count(),
+        stats["count"],
     )
 
-    base_text = _generate_rule_based_insight(qs, hours, city=city)
+    result = _insight_context(hours, city, stats, recent_logs)
+    if result["text"] is None:
+        previous = (
+            WeatherInsight.objects.filter(fingerprint=result["fingerprint"])
+            .values_list("text", flat=True)
+            .first()
+        )
+        if previous is not None:
+            logger.info("Dados inalterados (fingerprint %s): texto reaproveitado.", result["fingerprint"][:12]) # noqa E501
+            result.update(text=previous, reused=True)
+    return result
+
+
+def _insight_context(hours: int, city: str | None, stats: dict, recent_logs: list) -> dict: # noqa E501
+    """
+    Monta o texto numérico, o fingerprint e o pedido à OpenAI a partir de
+    dados já carregados (sem consultas ao banco). A checagem de texto
+    reaproveitável pelo fingerprint fica com o chamador.
+    """
+    base_text = _generate_rule_based_insight(
+        None,
+        hours,
+        city=city,
+        stats=stats,
+        last=recent_logs[0] if recent_logs else None,
+    )
+    result = {
+        "text": None,
+        "base_text": base_text,
+        "fingerprint": "",
+        "reused": False,
+    }
 
     openai_cfg = getattr(settings, "OPENAI_CONFIG", {})
     api_key = openai_cfg.get("api_key") or ""
@@ -61,12 +149,17 @@ def generate_insights_for_last_hours(hours: int = 24, city: str | None = None) -
         logger.warning(
             "OPENAI_API_KEY não configurada. Usando insight numérico."
         )
-        return base_text + "\n\n[IA desativada: OPENAI_API_KEY não configurada.]" # noqa E501
+        result["text"] = base_text + "\n\n[IA desativada: OPENAI_API_KEY não configurada.]" # noqa E501
+        return result
 
-    if qs.count() == 0:
-        return base_text
+    if not recent_logs:
+        result["text"] = base_text
+        return result
+
+    result["fingerprint"] = insight_fingerprint(
+        hours, city, model, stats, recent_logs
+    )
 
-    recent_logs = qs[:5]
     linhas = []
     for w in recent_logs:
         linhas.append(
@@ -90,37 +183,234 @@ def generate_insights_for_last_hours(hours: int = 24, city: str | None = None) -
         "Agora gere o insight:"
     )
 
+    result["request"] = {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": (
+                    "Você é um assistente especializado em clima, "
+                    "que gera comentários curtos e úteis sobre o tempo atual e recente." # noqa E501
+                ),
+            },
+            {"role": "user", "content": prompt_usuario},
+        ],
+        "temperature": 0.4,
+        "max_tokens": 300,
+    }
+    return result
+
+
+def _fallback_text(base_text: str) -> str:
+    return (
+        base_text
+        + "\n\n[Não foi possível gerar insight via IA no momento, exibindo resumo numérico.]" # noqa E501
+    )
+
+
+def generate_insight(hours: int = 24, city: str | None = None) -> dict:
+    """
+    Gera o texto do insight e devolve `{"text", "fingerprint", "reused"}`.
+    `fingerprint` só é preenchido quando o texto veio da IA; se um insight
+    com o mesmo fingerprint já existe, o texto dele é reaproveitado sem
+    chamar a OpenAI.
+    """
+    ctx = _prepare_insight(hours, city)
+    if ctx["text"] is not None:
+        return {
+            "text": ctx["text"],
+            "fingerprint": ctx["fingerprint"],
+            "reused": ctx["reused"],
+        }
+
     try:
         logger.info(
-            "Chamando OpenAI modelo=%s para gerar insight de clima.", model
+            "Chamando OpenAI modelo=%s para gerar insight de clima.",
+            ctx["request"]["model"],
         )
-        client = OpenAI(api_key=api_key)
-
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "Você é um assistente especializado em clima, "
-                        "que gera comentários curtos e úteis sobre o tempo atual e recente." # noqa E501
-                    ),
-                },
-                {"role": "user", "content": prompt_usuario},
-            ],
-            temperature=0.4,
-            max_tokens=300,
-        )
-
-        ia_text = (response.choices[0].message.content or "").strip()
+        ia_text = chat_completion(**ctx["request"])
         logger.info(
             "Insight IA gerado com sucesso. Tamanho: %s caracteres.", len(ia_text) # noqa E501
         )
-        return ia_text
+        return {
+            "text": ia_text,
+            "fingerprint": ctx["fingerprint"],
+            "reused": False,
+        }
 
+    except LLMUnavailable as exc:
+        logger.warning("IA indisponível (%s). Usando insight numérico.", exc)
     except Exception as exc:
         logger.exception("Erro ao chamar OpenAI para gerar insight: %s", exc)
-        return (
-            base_text
-            + "\n\n[Não foi possível gerar insight via IA no momento, exibindo resumo numérico.]" # noqa E501
+
+    return {
+        "text": _fallback_text(ctx["base_text"]),
+        "fingerprint": "",
+        "reused": False,
+    }
+
+
+def stream_insight(hours: int = 24, city: str | None = None):
+    """
+    Versão em streaming de `generate_insight`: gera `("token", trecho)`
+    conforme a OpenAI responde. Se a IA falhar, gera `("fallback", texto)`
+    com o texto numérico completo (substitui o que já foi enviado). O
+    último item é sempre `("result", {"text", "fingerprint", "reused"})`.
+    """
+    ctx = _prepare_insight(hours, city)
+    if ctx["text"] is not None:
+        yield "token", ctx["text"]
+        yield "result", {
+            "text": ctx["text"],
+            "fingerprint": ctx["fingerprint"],
+            "reused": ctx["reused"],
+        }
+        return
+
+    parts = []
+    try:
+        for token in stream_chat_completion(**ctx["request"]):
+            parts.append(token)
+            yield "token", token
+    except Exception as exc:
+        if isinstance(exc, LLMUnavailable):
+            logger.warning("IA indisponível (%s). Usando insight numérico.", exc) # noqa E501
+        else:
+            logger.exception("Erro no streaming da OpenAI: %s", exc)
+        text = _fallback_text(ctx["base_text"])
+        yield "fallback", text
+        yield "result", {"text": text, "fingerprint": "", "reused": False}
+        return
+
+    yield "result", {
+        "text": "".join(parts).strip(),
+        "fingerprint": ctx["fingerprint"],
+        "reused": False,
+    }
+
+
+def _recent_logs_by_city(qs, per_city: int = 5) -> dict[str, list]:
+    """
+    Últimas `per_city` medições de cada cidade numa única consulta
+    (ROW_NUMBER particionado por cidade).
+    """
+    rows = (
+        qs.annotate(
+            row=Window(
+                RowNumber(),
+                partition_by=F("city_key"),
+                order_by=F("timestamp").desc(),
+            )
+        )
+        .filter(row__lte=per_city)
+        .order_by("city_key", "-timestamp")
+    )
+    recent = {}
+    for log in rows:
+        recent.setdefault(log.city_key, []).append(log)
+    return recent
+
+
+def _complete(ctx: dict) -> dict:
+    try:
+        text = chat_completion(**ctx["request"])
+        return {"text": text, "fingerprint": ctx["fingerprint"], "reused": False} # noqa E501
+    except LLMUnavailable as exc:
+        logger.warning("IA indisponível (%s). Usando insight numérico.", exc)
+    except Exception as exc:
+        logger.exception("Erro ao chamar OpenAI para gerar insight: %s", exc)
+    return {
+        "text": _fallback_text(ctx["base_text"]),
+        "fingerprint": "",
+        "reused": False,
+    }
+
+
+def generate_insights_for_cities(hours: int = 24, cities=None, max_workers: int | None = None) -> list[WeatherInsight]: # noqa E501
+    """
+    Gera e grava um insight por cidade com medições nas últimas `hours`
+    horas (ou só para os nomes em `cities`).
+
+    O custo no banco não cresce com o número de cidades: uma consulta
+    agrupada para os agregados, uma para as últimas medições de cada
+    cidade, uma para os textos reaproveitáveis e um único bulk_create.
+    As chamadas à OpenAI rodam num pool de threads (`max_workers`,
+    default `OPENAI_CONFIG["max_concurrency"]`), sempre limitadas pelo
+    semáforo e pelo circuit breaker de `llm.py`; se a IA cair no meio do
+    lote, as cidades restantes recebem o insight numérico.
+    """
+    since = timezone.now() - timedelta(hours=hours)
+    qs = WeatherLog.objects.filter(timestamp__gte=since)
+    if cities is not None:
+        qs = qs.filter(
+            city_key__in={normalize_city(name) for name in cities}
+        )
+
+    grouped = (
+        qs.values("city_key")
+        .annotate(
+            count=Count("id"),
+            avg_temp=Avg("temperature"),
+            max_temp=Max("temperature"),
+            min_temp=Min("temperature"),
+            avg_humidity=Avg("humidity"),
+        )
+        .order_by("city_key")
+    )
+    stats_by_city = {row.pop("city_key"): row for row in grouped}
+    if not stats_by_city:
+        return []
+    recent_by_city = _recent_logs_by_city(qs)
+
+    logger.info(
+        "Gerando insights em lote para %s cidades (últimas %sh).",
+        len(stats_by_city),
+        hours,
+    )
+
+    contexts = []
+    for city_key, stats in stats_by_city.items():
+        recent_logs = recent_by_city.get(city_key, [])
+        city = recent_logs[0].city if recent_logs else city_key
+        contexts.append(
+            (city, _insight_context(hours, city, stats, recent_logs))
+        )
+
+    pending = [ctx for _, ctx in contexts if ctx["text"] is None]
+    previous = dict(
+        WeatherInsight.objects.filter(
+            fingerprint__in=[ctx["fingerprint"] for ctx in pending]
+        ).values_list("fingerprint", "text")
+    )
+    for ctx in pending:
+        if ctx["fingerprint"] in previous:
+            ctx.update(text=previous[ctx["fingerprint"]], reused=True)
+
+    to_call = [ctx for ctx in pending if ctx["text"] is None]
+    if to_call:
+        workers = max_workers or int(
+            getattr(settings, "OPENAI_CONFIG", {}).get("max_concurrency", 4)
+        )
+        workers = min(workers, len(to_call))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for ctx, result in zip(to_call, pool.map(_complete, to_call)):
+                ctx.update(result)
+
+    # bulk_create não chama save(): city_key é preenchido aqui
+    insights = WeatherInsight.objects.bulk_create(
+        [
+            WeatherInsight(
+                text=ctx["text"],
+                city=city,
+                city_key=normalize_city(city),
+                hours=hours,
+                fingerprint=ctx["fingerprint"],
+            )
+            for city, ctx in contexts
+        ]
+    )
+    for insight in insights:
+        insight_jobs.mark_done(
+            insight_jobs.insight_key(hours, insight.city), insight.id
         )
+    return insights
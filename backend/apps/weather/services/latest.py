@@ -0,0 +1,158 @@
+"""
+Última medição de cada cidade, em cache atualizado na gravação.
+
+Dois tiers, como o geocoding:
+- LRU em memória do processo, com TTL curto (`memory_ttl`): o worker
+  Celery e os outros workers web também gravam logs, então o tier local
+  só pode ficar alguns segundos desatualizado;
+- cache do Django (Redis em produção, ver `CACHES`), compartilhado entre
+  os processos; desligável com `LATEST_CACHE_CONFIG["shared"]`.
+
+Quem grava logs chama `record_latest(logs)` junto de `record_rollups`.
+Num miss dos dois tiers a leitura cai no banco com uma consulta por
+cidade no índice (city_key, timestamp), sem varrer a tabela.
+"""
+
+from urllib.parse import quote
+from django.conf import settings
+from django.core.cache import cache
+from apps.weather.models import WeatherLog, normalize_city
+from .cache import MISSING, LRUCache
+
+# mesmas colunas da listagem compacta (WeatherLogListSerializer)
+LATEST_FIELDS = (
+    "id",
+    "timestamp",
+    "city",
+    "temperature",
+    "humidity",
+    "pressure",
+    "wind_speed",
+    "condition",
+    "created_at",
+)
+
+_latest = LRUCache(maxsize=4096)
+
+
+def _config(name: str, default):
+    return getattr(settings, "LATEST_CACHE_CONFIG", {}).get(name, default)
+
+
+def _memory_ttl() -> float:
+    return float(_config("memory_ttl", 5))
+
+
+def _shared() -> bool:
+    return bool(_config("shared", True))
+
+
+def _shared_ttl() -> float:
+    return float(_config("shared_ttl", 86400))
+
+
+def _key(city_key: str) -> str:
+    # quote: sem espaços nem acentos na chave (memcached/Redis)
+    return f"weather:latest:{quote(city_key)}"
+
+
+def _newer(row: dict, current: dict | None) -> bool:
+    if not current:
+        return True
+    return (row["timestamp"], row["id"] or 0) > (
+        current["timestamp"], current["id"] or 0
+    )
+
+
+def record_latest(logs) -> int:
+    """
+    Atualiza o cache com os logs recém-gravados: por cidade, só o mais
+    novo, e só se for mais novo que o já guardado (ingestão de dados
+    antigos não sobrescreve a leitura atual). Retorna quantas cidades
+    foram consideradas.
+
+    O tier compartilhado é lido e regravado sem lock: duas gravações
+    simultâneas da mesma cidade podem deixar a mais antiga, corrigida na
+    próxima coleta.
+    """
+    newest = {}
+    for log in logs:
+        row = {field: getattr(log, field) for field in LATEST_FIELDS}
+        city_key = normalize_city(log.city)
+        if _newer(row, newest.get(city_key)):
+            newest[city_key] = row
+    if not newest:
+        return 0
+
+    if _shared():
+        current = cache.get_many([_key(k) for k in newest])
+        changed = {}
+        for city_key, row in newest.items():
+            cached = current.get(_key(city_key))
+            if _newer(row, cached):
+                changed[_key(city_key)] = row
+            else:
+                newest[city_key] = cached
+        if changed:
+            cache.set_many(changed, timeout=_shared_ttl())
+
+    for city_key, row in newest.items():
+        if _newer(row, _latest.get(city_key, None)):
+            _latest.set(city_key, row, ttl=_memory_ttl())
+    return len(newest)
+
+
+def forget_latest(city_keys) -> None:
+    """Descarta as cidades do cache (ex.: logs apagados pela retenção)."""
+    city_keys = list(city_keys)
+    for city_key in city_keys:
+        _latest.delete(city_key)
+    if _shared() and city_keys:
+        cache.delete_many([_key(k) for k in city_keys])
+
+
+def latest_for_cities(city_keys) -> dict[str, dict]:
+    """
+    Última medição (dict com `LATEST_FIELDS`) de cada `city_key`, na
+    ordem pedida; cidades sem nenhum log ficam de fora. Os dicts são
+    compartilhados com o cache: copie antes de alterar.
+    """
+    city_keys = list(dict.fromkeys(city_keys))
+    found = {}
+    missing = []
+    for city_key in city_keys:
+        row = _latest.get(city_key)
+        if row is MISSING:
+            missing.append(city_key)
+        else:
+            found[city_key] = row
+
+    if missing and _shared():
+        shared = cache.get_many([_key(k) for k in missing])
+        still_missing = []
+        for city_key in missing:
+            row = shared.get(_key(city_key))
+            if row is None:
+                still_missing.append(city_key)
+            else:
+                found[city_key] = row
+                _latest.set(city_key, row, ttl=_memory_ttl())
+        missing = still_missing
+
+    # cache frio: uma consulta por cidade, pelo índice (city_key, timestamp)
+    for city_key in missing:
+        row = (
+            WeatherLog.objects.filter(city_key=city_key)
+            .order_by("-timestamp", "-id")
+            .values(*LATEST_FIELDS)
+            .first()
+        )
+        if row is None:
+            continue
+        found[city_key] = row
+        if _shared():
+            # add: não sobrescreve uma gravação feita nesse meio tempo
+            cache.add(_key(city_key), row, timeout=_shared_ttl())
+        _latest.set(city_key, row, ttl=_memory_ttl())
+
+    return {k: found[k] for k in city_keys if k in found}
@@ -0,0 +1,249 @@
+"""
+Acesso à OpenAI compartilhado pelo processo: um único cliente (pool de
+conexões e sessão TLS reaproveitados entre tasks), timeouts explícitos,
+retries limitados com backoff, limite de chamadas simultâneas e circuit
+breaker. Com o circuito aberto as chamadas falham na hora com
+`LLMUnavailable` e o chamador usa o insight numérico.
+"""
+
+import logging
+import random
+import threading
+import time
+import httpx
+import openai
+from django.conf import settings
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+# erros transitórios: vale tentar de novo
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # inclui APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+_semaphore = None
+_semaphore_lock = threading.Lock()
+
+
+def _is_outage(exc: Exception) -> bool:
+    """
+    Falha da OpenAI (rede, timeout, 429 ou 5xx), que conta para o
+    circuit breaker. Erros do pedido (4xx: chave, modelo, parâmetros)
+    não dizem nada sobre a disponibilidade da API.
+    """
+    if isinstance(exc, RETRYABLE_ERRORS):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _record_error(exc: Exception):
+    if _is_outage(exc):
+        breaker.record_failure()
+    else:
+        # libera a chamada de teste do meio-aberto sem contar falha
+        breaker.cancel_trial()
+
+
+class LLMUnavailable(Exception):
+    """IA indisponível agora (circuito aberto ou limite de concorrência)."""
+
+
+def _config(name: str, default):
+    return type(default)(
+        getattr(settings, "OPENAI_CONFIG", {}).get(name, default)
+    )
+
+
+class CircuitBreaker:
+    """
+    Abre após `failure_threshold` falhas seguidas; enquanto aberto recusa
+    as chamadas por `reset_timeout` segundos. Depois deixa passar uma
+    chamada de teste (meio-aberto): sucesso fecha, falha reabre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60): # noqa E501
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold: # noqa E501
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def cancel_trial(self):
+        """Chamada liberada que não chegou à API (não conta como falha)."""
+        with self._lock:
+            self._trial_running = False
+
+    def reset(self):
+        self.record_success()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=_config("breaker_threshold", 5),
+    reset_timeout=_config("breaker_reset", 60.0),
+)
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Cliente único por processo (recriado só se a chave mudar). Os retries
+    do SDK ficam desligados: quem controla é `chat_completion`.
+    """
+    global _client, _client_key
+    api_key = getattr(settings, "OPENAI_CONFIG", {}).get("api_key") or ""
+    if _client is None or _client_key != api_key:
+        with _client_lock:
+            if _client is None or _client_key != api_key:
+                _client = OpenAI(
+                    api_key=api_key,
+                    timeout=httpx.Timeout(
+                        _config("timeout", 30.0),
+                        connect=_config("connect_timeout", 5.0),
+                    ),
+                    max_retries=0,
+                )
+                _client_key = api_key
+    return _client
+
+
+def _get_semaphore() -> threading.BoundedSemaphore:
+    global _semaphore
+    if _semaphore is None:
+        with _semaphore_lock:
+            if _semaphore is None:
+                _semaphore = threading.BoundedSemaphore(
+                    _config("max_concurrency", 4)
+                )
+    return _semaphore
+
+
+def _backoff(attempt: int) -> float:
+    base = _config("backoff", 0.5)
+    return base * (2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def _acquire():
+    """Circuito fechado (ou chamada de teste) e uma vaga no semáforo."""
+    if not breaker.allow():
+        raise LLMUnavailable("Circuito da OpenAI aberto.")
+
+    semaphore = _get_semaphore()
+    if not semaphore.acquire(timeout=_config("queue_timeout", 10.0)):
+        breaker.cancel_trial()
+        raise LLMUnavailable("Limite de chamadas simultâneas à OpenAI.")
+    return semaphore
+
+
+def _create(**kwargs):
+    """`chat.completions.create` com retries limitados e backoff."""
+    retries = _config("max_retries", 2)
+    for attempt in range(retries + 1):
+        try:
+            return get_openai_client().chat.completions.create(**kwargs)
+        except RETRYABLE_ERRORS as exc:
+            if attempt >= retries:
+                breaker.record_failure()
+                raise
+            delay = _backoff(attempt)
+            logger.warning(
+                "OpenAI falhou (%s); nova tentativa em %.1fs.", exc, delay
+            )
+            time.sleep(delay)
+        except Exception as exc:
+            _record_error(exc)
+            raise
+
+
+def chat_completion(**kwargs) -> str:
+    """
+    `chat.completions.create(**kwargs)` com as proteções do módulo e
+    devolve o texto da primeira escolha. Levanta `LLMUnavailable` sem
+    chamar a API quando o circuito está aberto ou a fila de chamadas
+    simultâneas não anda dentro de `queue_timeout`.
+    """
+    semaphore = _acquire()
+    try:
+        response = _create(**kwargs)
+        try:
+            text = (response.choices[0].message.content or "").strip()
+        except (AttributeError, IndexError):
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return text
+    finally:
+        semaphore.release()
+
+
+def stream_chat_completion(**kwargs):
+    """
+    Streaming de `chat.completions.create`: gera os trechos de texto
+    conforme chegam. Mesmas proteções de `chat_completion`; só há retry
+    antes do primeiro trecho (depois dele o texto já foi entregue).
+    """
+    semaphore = _acquire()
+    try:
+        stream = _create(stream=True, **kwargs)
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    yield token
+        except GeneratorExit:
+            # cliente desconectou: não é falha da OpenAI
+            breaker.cancel_trial()
+            stream.close()
+            raise
+        except Exception as exc:
+            _record_error(exc)
+            raise
+        breaker.record_success()
+    finally:
+        semaphore.release()
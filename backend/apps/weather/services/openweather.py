@@ -1,10 +1,151 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from ..models import WeatherLog
+from ..models import GeocodedCity, TrackedCity, WeatherLog, normalize_city
+from .cache import MISSING, LRUCache, SingleFlight
+from .latest import record_latest
+from .rollups import record_rollups
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+# tier em memória do cache de geocoding; o tier persistente é GeocodedCity
+_geocode_cache = LRUCache(maxsize=2048)
+_geocode_stats = {"db_hits": 0, "remote_calls": 0}
+_geocode_stats_lock = threading.Lock()
+
+# coalescência das chamadas de clima atual dentro do processo
+_weather_flight = SingleFlight()
+
+
+def _timeout() -> float:
+    return float(settings.OPENWEATHER_CONFIG.get("timeout", 10))
+
+
+def _max_workers() -> int:
+    return int(settings.OPENWEATHER_CONFIG.get("max_workers", 16))
+
+
+def get_session() -> requests.Session:
+    """
+    Session compartilhada pelo processo: reaproveita conexões TCP/TLS
+    (keep-alive) com a OpenWeather entre chamadas e entre threads.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=_max_workers()
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _geocode_ttl(found: bool) -> timedelta:
+    cfg = settings.OPENWEATHER_CONFIG
+    if found:
+        return timedelta(days=float(cfg.get("geocode_ttl_days", 30)))
+    return timedelta(seconds=float(cfg.get("geocode_negative_ttl", 3600)))
+
+
+def count_geocode(name: str) -> None:
+    # geocode_city roda em várias threads (collect_weather_for_cities)
+    with _geocode_stats_lock:
+        _geocode_stats[name] += 1
+
+
+def geocode_cache_info() -> dict:
+    """Contadores do cache de geocoding (memória, banco e API)."""
+    info = _geocode_cache.info()
+    with _geocode_stats_lock:
+        stats = dict(_geocode_stats)
+    return {
+        "memory_hits": info["hits"],
+        "memory_misses": info["misses"],
+        "memory_size": info["size"],
+        **stats,
+    }
+
+
+def geocode_metrics() -> list[tuple]:
+    """`geocode_cache_info` no formato de `MetricsRegistry.register_collector`.""" # noqa E501
+    info = geocode_cache_info()
+    return [
+        ("weather_geocode_memory_hits_total", "counter", "Acertos do cache de geocoding em memória.", info["memory_hits"]), # noqa E501
+        ("weather_geocode_memory_misses_total", "counter", "Faltas do cache de geocoding em memória.", info["memory_misses"]), # noqa E501
+        ("weather_geocode_memory_size", "gauge", "Cidades no cache de geocoding em memória.", info["memory_size"]), # noqa E501
+        ("weather_geocode_db_hits_total", "counter", "Geocodings servidos pela tabela GeocodedCity.", info["db_hits"]), # noqa E501
+        ("weather_geocode_remote_calls_total", "counter", "Chamadas à API de geocoding da OpenWeather.", info["remote_calls"]), # noqa E501
+    ]
+
+
+def _geocode_result(entry, city_name: str):
+    if entry is None:
+        raise ValueError(
+            f"Cidade '{city_name}' não encontrada na API de geocoding."
+        )
+    return entry
 
 
 def geocode_city(city_name: str, country_code: str = "BR"):
+    """
+    Geocoding com cache em dois níveis: LRU em memória e GeocodedCity
+    no banco, ambos com TTL. "Não encontrada" também fica em cache
+    (TTL menor), então consultas repetidas não chamam a API.
+    """
+    key = (normalize_city(city_name), country_code.upper())
+
+    entry = _geocode_cache.get(key)
+    if entry is not MISSING:
+        return _geocode_result(entry, city_name)
+
+    now = timezone.now()
+    row = GeocodedCity.objects.filter(
+        city_key=key[0], country=key[1], expires_at__gt=now
+    ).first()
+    if row:
+        count_geocode("db_hits")
+        entry = (row.lat, row.lon, row.name) if row.found else None
+        ttl = (row.expires_at - now).total_seconds()
+        _geocode_cache.set(key, entry, ttl=ttl)
+        return _geocode_result(entry, city_name)
+
+    count_geocode("remote_calls")
+    try:
+        entry = _geocode_city_remote(city_name, country_code=country_code)
+    except ValueError:
+        entry = None
+
+    ttl = _geocode_ttl(found=entry is not None)
+    GeocodedCity.objects.update_or_create(
+        city_key=key[0],
+        country=key[1],
+        defaults={
+            "found": entry is not None,
+            "lat": entry[0] if entry else None,
+            "lon": entry[1] if entry else None,
+            "name": entry[2] if entry else "",
+            "expires_at": now + ttl,
+        },
+    )
+    _geocode_cache.set(key, entry, ttl=ttl.total_seconds())
+    return _geocode_result(entry, city_name)
+
+
+def _geocode_city_remote(city_name: str, country_code: str = "BR"):
     cfg = settings.OPENWEATHER_CONFIG
 
     params = {
@@ -13,7 +154,7 @@ def geocode_city(city_name: str, country_code: str = "BR"):
         "appid": cfg["api_key"],
     }
 
-    resp = requests.get(cfg["geocode_url"], params=params, timeout=10)
+    resp = get_session().get(cfg["geocode_url"], params=params, timeout=_timeout()) # noqa E501
     resp.raise_for_status()
     data = resp.json()
 
@@ -30,37 +171,120 @@ def geocode_city(city_name: str, country_code: str = "BR"):
     return lat, lon, name
 
 
-def fetch_current_weather(*, lat: float | None = None, lon: float | None = None): # noqa E501
+def _build_payload(data: dict) -> dict:
+    return {
+        "timestamp": timezone.now(),
+        "city": data.get("name") or "Desconhecida",
+        "temperature": data["main"]["temp"],
+        "humidity": data["main"]["humidity"],
+        "pressure": data["main"]["pressure"],
+        "wind_speed": data["wind"]["speed"],
+        "condition": data["weather"][0]["description"],
+        "raw": data,
+    }
+
+
+def _fetch_current_weather_remote(lat: float, lon: float) -> dict:
     cfg = settings.OPENWEATHER_CONFIG
 
     params = {
-        "lat": lat if lat is not None else cfg["lat"],
-        "lon": lon if lon is not None else cfg["lon"],
+        "lat": lat,
+        "lon": lon,
         "appid": cfg["api_key"],
         "units": cfg["units"],
         "lang": cfg["lang"],
     }
 
-    resp = requests.get(cfg["base_url"], params=params, timeout=10)
+    resp = get_session().get(cfg["base_url"], params=params, timeout=_timeout()) # noqa E501
     resp.raise_for_status()
     data = resp.json()
 
-    payload = {
-        "timestamp": timezone.now(),
-        "city": data.get("name") or "Desconhecida",
-        "temperature": data["main"]["temp"],
-        "humidity": data["main"]["humidity"],
-        "pressure": data["main"]["pressure"],
-        "wind_speed": data["wind"]["speed"],
-        "condition": data["weather"][0]["description"],
-        "raw": data,
-    }
-    return payload
+    return _build_payload(data)
+
+
+def _weather_cache_key(lat: float, lon: float) -> str:
+    precision = int(settings.OPENWEATHER_CONFIG.get("cache_precision", 2))
+    return f"weather:current:{round(lat, precision)}:{round(lon, precision)}" # noqa E501
+
+
+def _fetch_coalesced(key: str, lat: float, lon: float, ttl: float) -> dict:
+    """
+    Single-flight entre workers: só quem obtém o lock no cache chama a
+    OpenWeather; os demais aguardam o resultado ser publicado no cache.
+    """
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    lock_key = f"{key}:lock"
+    wait = _timeout() + 1
+    owner = cache.add(lock_key, 1, timeout=wait)
+    if not owner:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            payload = cache.get(key)
+            if payload is not None:
+                return payload
+            if cache.get(lock_key) is None:
+                break
+        # o worker dono do lock falhou ou demorou demais: busca direto
+
+    try:
+        payload = _fetch_current_weather_remote(lat, lon)
+        cache.set(key, payload, timeout=ttl)
+        return payload
+    finally:
+        if owner:
+            cache.delete(lock_key)
+
+
+def fetch_current_weather(*, lat: float | None = None, lon: float | None = None, use_cache: bool = True): # noqa E501
+    """
+    Clima atual para (lat, lon). Com cache ativo, respostas ficam
+    guardadas por `cache_ttl` segundos por coordenada arredondada e
+    requisições simultâneas para a mesma chave compartilham uma única
+    chamada à OpenWeather (entre threads e entre workers).
+    """
+    cfg = settings.OPENWEATHER_CONFIG
+    lat = float(lat if lat is not None else cfg["lat"])
+    lon = float(lon if lon is not None else cfg["lon"])
+
+    ttl = float(cfg.get("cache_ttl", 0))
+    if not use_cache or ttl <= 0:
+        return _fetch_current_weather_remote(lat, lon)
+
+    key = _weather_cache_key(lat, lon)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+    return _weather_flight.do(
+        key, lambda: _fetch_coalesced(key, lat, lon, ttl)
+    )
+
+
+def _store_payload(payload: dict) -> WeatherLog:
+    """
+    Grava o payload como WeatherLog. Respostas vindas do cache têm o
+    mesmo timestamp da coleta original, então reaproveitam o log já
+    gravado em vez de criar uma duplicata.
+    """
+    log = WeatherLog.objects.filter(
+        city_key=normalize_city(payload["city"]),
+        timestamp=payload["timestamp"],
+    ).first()
+    if log:
+        return log
+
+    log = WeatherLog.objects.create(**payload)
+    record_rollups([log])
+    record_latest([log])
+    return log
 
 
 def store_current_weather(*, lat: float | None = None, lon: float | None = None): # noqa E501
     payload = fetch_current_weather(lat=lat, lon=lon)
-    return WeatherLog.objects.create(**payload)
+    return _store_payload(payload)
 
 
 def store_weather_for_city(city_name: str, country_code: str = "BR"):
@@ -68,5 +292,72 @@ def store_weather_for_city(city_name: str, country_code: str = "BR"):
         city_name, country_code=country_code
     )
     payload = fetch_current_weather(lat=lat, lon=lon)
-    payload["city"] = normalized_name
-    return WeatherLog.objects.create(**payload)
+    return _store_payload({**payload, "city": normalized_name})
+
+
+def _fetch_tracked_city(city: TrackedCity) -> dict:
+    """
+    Executado nas threads do pool: só faz HTTP, sem acessar o banco.
+    Cidades ainda sem coordenadas são geocodificadas aqui.
+    """
+    lat, lon = city.lat, city.lon
+    if lat is None or lon is None:
+        # TrackedCity já persiste as coordenadas: sem acesso ao banco aqui
+        lat, lon, _ = _geocode_city_remote(
+            city.name, country_code=city.country
+        )
+
+    # coleta agendada: sempre uma leitura nova, sem passar pelo cache
+    payload = fetch_current_weather(lat=lat, lon=lon, use_cache=False)
+    payload["city"] = city.name
+    return {"payload": payload, "lat": lat, "lon": lon}
+
+
+def collect_weather_for_cities(cities, max_workers: int | None = None):
+    """
+    Coleta o clima atual de várias cidades em paralelo (pool de threads
+    + Session compartilhada) e grava tudo com um único bulk_create.
+    O tempo total fica próximo ao da chamada mais lenta.
+
+    Retorna `(logs, falhas)`, onde `falhas` é uma lista de
+    `(cidade, mensagem)`.
+    """
+    cities = list(cities)
+    if not cities:
+        return [], []
+
+    results = []
+    failures = []
+    workers = min(max_workers or _max_workers(), len(cities))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_fetch_tracked_city, city): city for city in cities
+        }
+        for future in as_completed(futures):
+            city = futures[future]
+            try:
+                results.append((city, future.result()))
+            except (requests.RequestException, ValueError, KeyError) as exc:
+                logger.warning("Falha ao coletar clima de %s: %s", city, exc)
+                failures.append((city, str(exc)))
+
+    geocoded = []
+    for city, result in results:
+        if city.lat is None or city.lon is None:
+            city.lat, city.lon = result["lat"], result["lon"]
+            geocoded.append(city)
+    if geocoded:
+        TrackedCity.objects.bulk_update(geocoded, ["lat", "lon"])
+
+    logs = WeatherLog.objects.bulk_create(
+        [
+            WeatherLog(
+                **result["payload"],
+                city_key=normalize_city(result["payload"]["city"]),
+            )
+            for _, result in results
+        ]
+    )
+    record_rollups(logs)
+    record_latest(logs)
+    return logs, failures
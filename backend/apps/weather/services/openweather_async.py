@@ -0,0 +1,217 @@
+"""
+Variante assíncrona (ASGI) do fluxo de fetch-city: HTTP com
+`httpx.AsyncClient` e ORM assíncrono, sem prender uma thread do worker
+enquanto a OpenWeather responde. Reaproveita os caches e as regras de
+`openweather.py` (mesmo LRU de geocoding, mesmas chaves de cache).
+"""
+
+import asyncio
+import time
+import weakref
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from ..models import GeocodedCity, WeatherLog, normalize_city
+from .cache import MISSING, AsyncSingleFlight
+from .openweather import (
+    _build_payload,
+    _geocode_cache,
+    _geocode_result,
+    _geocode_ttl,
+    _max_workers,
+    _timeout,
+    _weather_cache_key,
+    count_geocode,
+)
+from .latest import record_latest
+from .rollups import record_rollups
+
+# um AsyncClient por event loop (as conexões do pool pertencem ao loop)
+_clients = weakref.WeakKeyDictionary()
+
+_geocode_flight = AsyncSingleFlight()
+_weather_flight = AsyncSingleFlight()
+_store_flight = AsyncSingleFlight()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """AsyncClient compartilhado pelo event loop atual (keep-alive)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=_timeout(),
+            limits=httpx.Limits(
+                max_connections=_max_workers() * 4,
+                max_keepalive_connections=_max_workers(),
+            ),
+        )
+    return client
+
+
+async def _get_json(url: str, params: dict):
+    resp = await get_async_client().get(url, params=params)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def _ageocode_city_remote(city_name: str, country_code: str = "BR"):
+    cfg = settings.OPENWEATHER_CONFIG
+
+    data = await _get_json(
+        cfg["geocode_url"],
+        {
+            "q": f"{city_name},{country_code}",
+            "limit": 1,
+            "appid": cfg["api_key"],
+        },
+    )
+    if not data:
+        return None
+
+    item = data[0]
+    return float(item["lat"]), float(item["lon"]), item.get("name") or city_name # noqa E501
+
+
+async def _ageocode_miss(key: tuple, city_name: str, country_code: str):
+    now = timezone.now()
+    row = await GeocodedCity.objects.filter(
+        city_key=key[0], country=key[1], expires_at__gt=now
+    ).afirst()
+    if row:
+        count_geocode("db_hits")
+        entry = (row.lat, row.lon, row.name) if row.found else None
+        ttl = (row.expires_at - now).total_seconds()
+        _geocode_cache.set(key, entry, ttl=ttl)
+        return entry
+
+    count_geocode("remote_calls")
+    entry = await _ageocode_city_remote(city_name, country_code=country_code)
+
+    ttl = _geocode_ttl(found=entry is not None)
+    await GeocodedCity.objects.aupdate_or_create(
+        city_key=key[0],
+        country=key[1],
+        defaults={
+            "found": entry is not None,
+            "lat": entry[0] if entry else None,
+            "lon": entry[1] if entry else None,
+            "name": entry[2] if entry else "",
+            "expires_at": now + ttl,
+        },
+    )
+    _geocode_cache.set(key, entry, ttl=ttl.total_seconds())
+    return entry
+
+
+async def ageocode_city(city_name: str, country_code: str = "BR"):
+    """
+    `geocode_city` assíncrono, com os mesmos tiers de cache. Requisições
+    simultâneas para a mesma cidade compartilham a mesma consulta.
+    """
+    key = (normalize_city(city_name), country_code.upper())
+
+    entry = _geocode_cache.get(key)
+    if entry is MISSING:
+        entry = await _geocode_flight.do(
+            key, lambda: _ageocode_miss(key, city_name, country_code)
+        )
+    return _geocode_result(entry, city_name)
+
+
+async def _afetch_current_weather_remote(lat: float, lon: float) -> dict:
+    cfg = settings.OPENWEATHER_CONFIG
+
+    data = await _get_json(
+        cfg["base_url"],
+        {
+            "lat": lat,
+            "lon": lon,
+            "appid": cfg["api_key"],
+            "units": cfg["units"],
+            "lang": cfg["lang"],
+        },
+    )
+    return _build_payload(data)
+
+
+async def _afetch_coalesced(key: str, lat: float, lon: float, ttl: float) -> dict: # noqa E501
+    """Mesmo lock entre workers de `_fetch_coalesced`, sem bloquear."""
+    payload = await cache.aget(key)
+    if payload is not None:
+        return payload
+
+    lock_key = f"{key}:lock"
+    wait = _timeout() + 1
+    owner = await cache.aadd(lock_key, 1, timeout=wait)
+    if not owner:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            payload = await cache.aget(key)
+            if payload is not None:
+                return payload
+            if await cache.aget(lock_key) is None:
+                break
+
+    try:
+        payload = await _afetch_current_weather_remote(lat, lon)
+        await cache.aset(key, payload, timeout=ttl)
+        return payload
+    finally:
+        if owner:
+            await cache.adelete(lock_key)
+
+
+async def afetch_current_weather(*, lat: float, lon: float) -> dict:
+    ttl = float(settings.OPENWEATHER_CONFIG.get("cache_ttl", 0))
+    if ttl <= 0:
+        return await _afetch_current_weather_remote(lat, lon)
+
+    key = _weather_cache_key(lat, lon)
+    payload = await cache.aget(key)
+    if payload is not None:
+        return payload
+    return await _weather_flight.do(
+        key, lambda: _afetch_coalesced(key, lat, lon, ttl)
+    )
+
+
+async def _astore_payload(payload: dict) -> WeatherLog:
+    """
+    Mesma deduplicação de `_store_payload`; requisições simultâneas com o
+    mesmo payload (vindo do cache) gravam um único log.
+    """
+    city_key = normalize_city(payload["city"])
+
+    async def store():
+        # select_related: `raw` é lido do RawPayload ao serializar, e um
+        # acesso lazy aqui seria uma consulta síncrona no event loop
+        log = await WeatherLog.objects.select_related("raw_payload").filter(
+            city_key=city_key, timestamp=payload["timestamp"]
+        ).afirst()
+        if log:
+            return log
+
+        log = await WeatherLog.objects.acreate(**payload)
+        await sync_to_async(record_rollups)([log])
+        await sync_to_async(record_latest)([log])
+        return log
+
+    return await _store_flight.do((city_key, payload["timestamp"]), store)
+
+
+async def astore_weather_for_city(city_name: str, country_code: str = "BR"): # noqa E501
+    """
+    `store_weather_for_city` assíncrono. O clima depende das coordenadas,
+    então geocoding e clima são sequenciais dentro da requisição; o ganho
+    está em atender muitas requisições no mesmo worker enquanto aguardam
+    a OpenWeather, e em coalescer as que pedem a mesma cidade.
+    """
+    lat, lon, normalized_name = await ageocode_city(
+        city_name, country_code=country_code
+    )
+    payload = await afetch_current_weather(lat=lat, lon=lon)
+    return await _astore_payload({**payload, "city": normalized_name})
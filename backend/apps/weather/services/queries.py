@@ -0,0 +1,43 @@
+from datetime import datetime, time
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from apps.weather.models import normalize_city
+
+
+def parse_datetime_param(value: str | None, *, end_of_day: bool = False):
+    """
+    Converte um parâmetro de query (ISO 8601 ou YYYY-MM-DD) em datetime
+    com timezone. Datas sem horário viram início (ou fim) do dia.
+    """
+    if not value:
+        return None
+
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            raise ValueError(f"Data/hora inválida: '{value}'.")
+        dt = datetime.combine(d, time.max if end_of_day else time.min)
+
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def filter_weather_logs(qs, *, city: str | None = None, start: str | None = None, end: str | None = None): # noqa E501
+    """
+    Aplica os filtros de cidade e intervalo de tempo aceitos pela API
+    de logs (listagem e exportações).
+    """
+    if city:
+        qs = qs.filter(city_key=normalize_city(city))
+
+    since = parse_datetime_param(start)
+    until = parse_datetime_param(end, end_of_day=True)
+    if since and until and since > until:
+        raise ValueError("Parâmetro 'start' deve ser anterior a 'end'.")
+    if since:
+        qs = qs.filter(timestamp__gte=since)
+    if until:
+        qs = qs.filter(timestamp__lte=until)
+    return qs
@@ -0,0 +1,326 @@
+"""
+Retenção dos WeatherLogs.
+
+- No PostgreSQL a tabela é particionada por mês (`timestamp`, migração
+  0010): consultas com filtro de período só leem as partições do
+  intervalo, e arquivar um mês é um `DETACH` + `DROP` da partição.
+- No SQLite (e em bancos não particionados) o mesmo fluxo apaga as
+  linhas do mês com um DELETE por intervalo.
+
+Meses arquivados são gravados antes no storage, com o `raw` (lido do
+`RawPayload`), como JSONL
+compactado (`archive/weather_logs_AAAA_MM.jsonl.gz`) ou Parquet
+(`RETENTION_CONFIG["archive_format"] = "parquet"`). Os rollups não são
+apagados: a série (`services.series`) de um período sem logs é montada
+só com eles, então séries e agregados antigos continuam disponíveis.
+"""
+
+import gzip
+import json
+import logging
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from apps.weather.models import RawPayload, WeatherLog, payload_grace
+from apps.weather.services.exports import EXPORT_FIELDS, iter_parquet
+from apps.weather.services.latest import forget_latest
+
+logger = logging.getLogger(__name__)
+
+TABLE = WeatherLog._meta.db_table
+RAW_STRIP_BATCH_SIZE = 5000
+ARCHIVE_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+ARCHIVE_FIELDS = ("id", *EXPORT_FIELDS, "city_key", "created_at")
+
+
+def _config(name: str, default: int) -> int:
+    return int(getattr(settings, "RETENTION_CONFIG", {}).get(name, default))
+
+
+def month_start(dt: datetime) -> datetime:
+    """Início do mês (UTC) que contém `dt`: limite das partições."""
+    dt = dt.astimezone(dt_timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    index = dt.year * 12 + dt.month - 1 + months
+    return dt.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{TABLE}_p{start:%Y_%m}"
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE] # noqa E501
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def _partitions(cursor) -> set[str]:
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        [TABLE],
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_partitions(months_ahead: int | None = None) -> list[str]:
+    """
+    Cria as partições mensais do mês atual até `months_ahead` meses à
+    frente (as linhas fora delas caem na partição DEFAULT). Sem efeito
+    fora do PostgreSQL particionado.
+    """
+    if not is_partitioned():
+        return []
+    if months_ahead is None:
+        months_ahead = _config("partition_months_ahead", 3)
+
+    created = []
+    current = month_start(timezone.now())
+    with connection.cursor() as cursor:
+        existing = _partitions(cursor)
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            name = partition_name(start)
+            if name in existing:
+                continue
+            _create_partition(cursor, name, start, add_months(start, 1))
+            created.append(name)
+    return created
+
+
+def _create_partition(cursor, name: str, start: datetime, end: datetime):
+    """
+    Cria a partição [start, end). Se a DEFAULT já tem linhas nesse
+    intervalo (gravadas antes da partição existir), o PostgreSQL recusa o
+    `PARTITION OF`: a tabela é criada solta, recebe as linhas movidas da
+    DEFAULT e só então é anexada, tudo na mesma transação.
+    """
+    default = f"{TABLE}_default"
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM "{default}" '
+        'WHERE "timestamp" >= %s AND "timestamp" < %s)',
+        [start, end],
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" '
+            "FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+        return
+
+    with transaction.atomic():
+        cursor.execute(
+            f'CREATE TABLE "{name}" '
+            f'(LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{default}" '
+            'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+            "FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    logger.info("Linhas de %s movidas da partição DEFAULT para %s.", f"{start:%m/%Y}", name) # noqa E501
+
+
+def strip_raw(before: datetime) -> int:
+    """
+    Desvincula o payload `raw` dos logs anteriores a `before`, mantendo as
+    colunas numéricas, e apaga os RawPayloads que ficaram sem nenhum log.
+    Em lotes, para não segurar um lock longo.
+    """
+    stale = WeatherLog.objects.filter(
+        timestamp__lt=before, raw_payload__isnull=False
+    )
+    total = 0
+    while True:
+        ids = list(stale.values_list("id", flat=True)[:RAW_STRIP_BATCH_SIZE])
+        if not ids:
+            break
+        total += WeatherLog.objects.filter(id__in=ids).update(raw_payload=None) # noqa E501
+    if total:
+        delete_orphan_payloads()
+    return total
+
+
+def delete_orphan_payloads() -> int:
+    """
+    Apaga os RawPayloads que nenhum log referencia mais, num único DELETE
+    (sem carregar os blobs). Os usados há menos de `payload_grace()`
+    ficam: uma ingestão concorrente pode ter acabado de reaproveitá-los.
+    """
+    payloads = RawPayload._meta.db_table
+    cutoff = timezone.now() - payload_grace()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM "{payloads}" WHERE "used_at" < %s AND NOT EXISTS '
+            f'(SELECT 1 FROM "{TABLE}" WHERE "{TABLE}"."raw_payload_id" = "{payloads}"."id")', # noqa E501
+            [connection.ops.adapt_datetimefield_value(cutoff)],
+        )
+        return cursor.rowcount
+
+
+def _write_jsonl(rows, fileobj) -> int:
+    count = 0
+    with gzip.GzipFile(fileobj=fileobj, mode="wb") as gz:
+        values = rows.values(*ARCHIVE_FIELDS, "raw_payload__data")
+        for row in values.iterator(chunk_size=2000):
+            data = row.pop("raw_payload__data")
+            row["raw"] = None if data is None else json.loads(
+                RawPayload.decode_bytes(data)
+            )
+            line = json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+            gz.write(line.encode() + b"\n")
+            count += 1
+    return count
+
+
+def _write_parquet(rows, fileobj) -> int:
+    for chunk in iter_parquet(rows, fields=ARCHIVE_FIELDS, with_raw=True):
+        fileobj.write(chunk)
+    return rows.count()
+
+
+def _write_archive(start: datetime, rows) -> tuple[str, int]:
+    rows = rows.order_by("timestamp", "id")
+    archive_format = getattr(settings, "RETENTION_CONFIG", {}).get(
+        "archive_format", "jsonl"
+    )
+    if archive_format == "parquet":
+        write, extension = _write_parquet, "parquet"
+    else:
+        write, extension = _write_jsonl, "jsonl.gz"
+
+    tmp = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_MAX_SIZE)
+    count = write(rows, tmp)
+    tmp.seek(0)
+    path = default_storage.save(
+        f"archive/weather_logs_{start:%Y_%m}.{extension}", File(tmp)
+    )
+    tmp.close()
+    return path, count
+
+
+def archive_month(start: datetime, partitioned: bool | None = None) -> dict:
+    """
+    Arquiva e remove os logs do mês iniciado em `start`.
+
+    Arquivo e remoção usam o mesmo conjunto de linhas, na mesma
+    transação: com partição, ela fica em `LOCK ... IN SHARE MODE` (leitura
+    liberada, gravações no mês esperam) até o `DETACH`; sem partição (ou
+    linhas na DEFAULT), só são apagados os ids até o maior arquivado, e se
+    o DELETE não bater com o que foi gravado (log de id menor confirmado
+    durante a escrita) a transação é desfeita e o mês fica para a próxima
+    execução.
+    """
+    end = add_months(start, 1)
+    if partitioned is None:
+        partitioned = is_partitioned()
+    month = f"{start:%Y-%m}"
+
+    logs = WeatherLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    with transaction.atomic():
+        name = partition_name(start) if partitioned else None
+        if name:
+            with connection.cursor() as cursor:
+                if name in _partitions(cursor):
+                    cursor.execute(f'LOCK TABLE "{name}" IN SHARE MODE')
+                else:
+                    name = None
+
+        last_id = logs.aggregate(last=Max("id"))["last"]
+        if last_id is None:
+            return {"month": month, "path": None, "rows": 0}
+        logs = logs.filter(id__lte=last_id)
+        city_keys = list(
+            logs.order_by().values_list("city_key", flat=True).distinct()
+        )
+        path, count = _write_archive(start, logs)
+
+        if name:
+            with connection.cursor() as cursor:
+                # FKs (raw_payload) são DEFERRABLE: verificações pendentes de
+                # gravações anteriores nesta transação impedem o DROP
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"') # noqa E501
+                cursor.execute(f'DROP TABLE "{name}"')
+            consistent = True
+        else:
+            _, deleted = logs.delete()
+            consistent = deleted.get(WeatherLog._meta.label, 0) == count
+        if consistent:
+            delete_orphan_payloads()
+        else:
+            transaction.set_rollback(True)
+
+    if not consistent:
+        default_storage.delete(path)
+        logger.warning("Logs de %s mudaram durante o arquivamento; mês mantido.", f"{start:%m/%Y}") # noqa E501
+        return {"month": month, "path": None, "rows": 0}
+
+    # a última medição de alguma cidade pode ter sido arquivada
+    forget_latest(city_keys)
+
+    logger.info("Logs de %s arquivados em %s (%s linhas).", f"{start:%m/%Y}", path, count) # noqa E501
+    return {"month": month, "path": path, "rows": count}
+
+
+def archive_before(cutoff: datetime) -> list[dict]:
+    """Arquiva os meses completos anteriores ao mês de `cutoff`."""
+    cutoff = month_start(cutoff)
+    oldest = WeatherLog.objects.aggregate(first=Min("timestamp"))["first"]
+    if oldest is None:
+        return []
+
+    partitioned = is_partitioned()
+    archived = []
+    start = month_start(oldest)
+    while start < cutoff:
+        if WeatherLog.objects.filter(
+            timestamp__gte=start, timestamp__lt=add_months(start, 1)
+        ).exists():
+            archived.append(archive_month(start, partitioned=partitioned))
+        start = add_months(start, 1)
+    return archived
+
+
+def apply_retention(now: datetime | None = None) -> dict:
+    """
+    Política completa, configurada em `RETENTION_CONFIG`:
+    partições futuras, `raw` removido após `raw_days` dias e meses
+    arquivados após `archive_months` meses (0 = nunca arquivar).
+    """
+    now = now or timezone.now()
+    result = {"partitions": ensure_partitions(), "raw_stripped": 0, "archived": []} # noqa E501
+
+    raw_days = _config("raw_days", 30)
+    if raw_days > 0:
+        result["raw_stripped"] = strip_raw(now - timedelta(days=raw_days))
+
+    archive_months = _config("archive_months", 0)
+    if archive_months > 0:
+        result["archived"] = archive_before(
+            add_months(month_start(now), -archive_months)
+        )
+    return result
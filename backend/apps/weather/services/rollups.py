@@ -0,0 +1,234 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncDay, TruncHour
+from django.utils import timezone
+from apps.weather.models import WeatherLog, WeatherRollup, normalize_city
+from apps.weather.services.queries import parse_datetime_param
+
+ROLLUP_METRICS = ("temperature", "humidity", "pressure", "wind_speed")
+
+Granularity = WeatherRollup.Granularity
+
+_TRUNC_BY_GRANULARITY = {
+    Granularity.HOUR: TruncHour,
+    Granularity.DAY: TruncDay,
+}
+
+
+def bucket_start(ts, granularity: str):
+    """
+    Início do intervalo (no fuso local, como o TruncHour/TruncDay do
+    banco) ao qual `ts` pertence.
+    """
+    local = timezone.localtime(ts)
+    if granularity == Granularity.DAY:
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def _empty_bucket(city: str) -> dict:
+    bucket = {"city": city, "count": 0}
+    for metric in ROLLUP_METRICS:
+        bucket[f"{metric}_min"] = None
+        bucket[f"{metric}_max"] = None
+        bucket[f"{metric}_sum"] = 0.0
+    return bucket
+
+
+def _accumulate(bucket: dict, log) -> None:
+    bucket["count"] += 1
+    for metric in ROLLUP_METRICS:
+        value = float(getattr(log, metric))
+        current_min = bucket[f"{metric}_min"]
+        current_max = bucket[f"{metric}_max"]
+        bucket[f"{metric}_min"] = value if current_min is None else min(current_min, value) # noqa E501
+        bucket[f"{metric}_max"] = value if current_max is None else max(current_max, value) # noqa E501
+        bucket[f"{metric}_sum"] += value
+
+
+def _merge_into_db(city_key: str, granularity: str, start, bucket: dict):
+    lookup = {
+        "city_key": city_key,
+        "granularity": granularity,
+        "bucket_start": start,
+    }
+    changes = {"count": F("count") + bucket["count"]}
+    for metric in ROLLUP_METRICS:
+        changes[f"{metric}_min"] = Least(
+            F(f"{metric}_min"), Value(bucket[f"{metric}_min"])
+        )
+        changes[f"{metric}_max"] = Greatest(
+            F(f"{metric}_max"), Value(bucket[f"{metric}_max"])
+        )
+        changes[f"{metric}_sum"] = F(f"{metric}_sum") + bucket[f"{metric}_sum"] # noqa E501
+    changes["updated_at"] = timezone.now()
+
+    if WeatherRollup.objects.filter(**lookup).update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            WeatherRollup.objects.create(**lookup, **bucket)
+    except IntegrityError:
+        # outro processo criou o bucket entre o update e o create
+        WeatherRollup.objects.filter(**lookup).update(**changes)
+
+
+_UPSERT_COLUMNS = (
+    "city",
+    "city_key",
+    "granularity",
+    "bucket_start",
+    "count",
+    *(f"{metric}_{agg}" for metric in ROLLUP_METRICS for agg in ("min", "max", "sum")), # noqa E501
+    "updated_at",
+)
+
+
+def _upsert_sql(rows: int) -> str:
+    table = WeatherRollup._meta.db_table
+    # LEAST/GREATEST no PostgreSQL; no SQLite, MIN/MAX com dois argumentos
+    least, greatest = ("LEAST", "GREATEST") if connection.vendor == "postgresql" else ("MIN", "MAX") # noqa E501
+    updates = [f'"count" = "{table}"."count" + excluded."count"']
+    for metric in ROLLUP_METRICS:
+        updates += [
+            f'"{metric}_min" = {least}("{table}"."{metric}_min", excluded."{metric}_min")', # noqa E501
+            f'"{metric}_max" = {greatest}("{table}"."{metric}_max", excluded."{metric}_max")', # noqa E501
+            f'"{metric}_sum" = "{table}"."{metric}_sum" + excluded."{metric}_sum"', # noqa E501
+        ]
+    updates.append('"updated_at" = excluded."updated_at"')
+    columns = ", ".join(f'"{column}"' for column in _UPSERT_COLUMNS)
+    placeholders = "(" + ", ".join(["%s"] * len(_UPSERT_COLUMNS)) + ")"
+    return (
+        f'INSERT INTO "{table}" ({columns}) '
+        f'VALUES {", ".join([placeholders] * rows)} '
+        'ON CONFLICT ("city_key", "granularity", "bucket_start") '
+        f'DO UPDATE SET {", ".join(updates)}'
+    )
+
+
+def _upsert(buckets: dict) -> None:
+    """
+    Soma os buckets aos rollups com `INSERT ... ON CONFLICT DO UPDATE`:
+    um comando por lote (limite de parâmetros do banco), em vez de um
+    UPDATE (e às vezes um INSERT) por bucket.
+    """
+    ops = connection.ops
+    now = ops.adapt_datetimefield_value(timezone.now())
+    # ordem fixa: duas ingestões simultâneas travam as linhas na mesma ordem
+    rows = []
+    for (city_key, granularity, start), bucket in sorted(buckets.items()):
+        rows.append(
+            [
+                bucket["city"],
+                city_key,
+                granularity,
+                ops.adapt_datetimefield_value(start),
+                *(bucket[column] for column in _UPSERT_COLUMNS[4:-1]),
+                now,
+            ]
+        )
+    batch = ops.bulk_batch_size(_UPSERT_COLUMNS, rows)
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), batch):
+            chunk = rows[i:i + batch]
+            cursor.execute(
+                _upsert_sql(len(chunk)), [v for row in chunk for v in row]
+            )
+
+
+def record_rollups(logs) -> int:
+    """
+    Soma os logs recém-inseridos aos rollups horários e diários.
+    Os logs são agrupados antes, então o custo é O(buckets afetados),
+    gravados num upsert por lote (PostgreSQL/SQLite) ou, em outros
+    bancos, num UPDATE/INSERT por bucket.
+    """
+    buckets = {}
+    tz = timezone.get_current_timezone()
+    for log in logs:
+        city_key = log.city_key or normalize_city(log.city)
+        # mesmo cálculo de bucket_start, com um único localtime por log
+        hour = log.timestamp.astimezone(tz).replace(minute=0, second=0, microsecond=0) # noqa E501
+        for granularity, start in ((Granularity.HOUR, hour), (Granularity.DAY, hour.replace(hour=0))): # noqa E501
+            key = (city_key, granularity, start)
+            if key not in buckets:
+                buckets[key] = _empty_bucket(log.city)
+            _accumulate(buckets[key], log)
+
+    if connection.vendor in ("postgresql", "sqlite"):
+        _upsert(buckets)
+        return len(buckets)
+
+    with transaction.atomic():
+        for (city_key, granularity, start), bucket in buckets.items():
+            _merge_into_db(city_key, granularity, start, bucket)
+    return len(buckets)
+
+
+def rebuild_rollups(since=None, until=None) -> int:
+    """
+    Recalcula (backfill/compactação) os rollups a partir dos logs brutos
+    numa consulta agrupada por granularidade. `since` é alinhado ao
+    início do dia para não gerar buckets parciais.
+    """
+    logs = WeatherLog.objects.all()
+    rollups = WeatherRollup.objects.all()
+    if since is not None:
+        since = bucket_start(since, Granularity.DAY)
+        logs = logs.filter(timestamp__gte=since)
+        rollups = rollups.filter(bucket_start__gte=since)
+    if until is not None:
+        logs = logs.filter(timestamp__lt=until)
+        rollups = rollups.filter(bucket_start__lt=until)
+
+    aggregates = {"city": Max("city"), "count": Count("id")}
+    for metric in ROLLUP_METRICS:
+        aggregates[f"{metric}_min"] = Min(metric)
+        aggregates[f"{metric}_max"] = Max(metric)
+        aggregates[f"{metric}_sum"] = Sum(metric)
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        for granularity, trunc in _TRUNC_BY_GRANULARITY.items():
+            rows = (
+                logs.annotate(bucket=trunc("timestamp"))
+                .values("city_key", "bucket")
+                .annotate(**aggregates)
+                .order_by()
+            )
+            objs = [
+                WeatherRollup(
+                    granularity=granularity,
+                    bucket_start=row.pop("bucket"),
+                    **row,
+                )
+                for row in rows.iterator()
+            ]
+            WeatherRollup.objects.bulk_create(objs, batch_size=1000)
+            created += len(objs)
+    return created
+
+
+def filter_rollups(qs, *, city: str | None = None, granularity: str | None = None, start: str | None = None, end: str | None = None): # noqa E501
+    """
+    Filtros aceitos pelo endpoint de rollups.
+    """
+    granularity = granularity or Granularity.HOUR
+    if granularity not in Granularity.values:
+        raise ValueError(
+            f"Granularidade inválida: '{granularity}'. Use 'hour' ou 'day'."
+        )
+    qs = qs.filter(granularity=granularity)
+
+    if city:
+        qs = qs.filter(city_key=normalize_city(city))
+
+    since = parse_datetime_param(start)
+    until = parse_datetime_param(end, end_of_day=True)
+    if since:
+        qs = qs.filter(bucket_start__gte=bucket_start(since, granularity))
+    if until:
+        qs = qs.filter(bucket_start__lte=until)
+    return qs
@@ -0,0 +1,185 @@
+"""
+Série temporal reduzida para gráficos: em vez de devolver todos os logs
+do período, agrupa no banco (rollups horários/diários já mantidos a
+cada gravação) e, se ainda sobrar ponto demais, reduz com LTTB
+(Largest-Triangle-Three-Buckets), que preserva picos e vales.
+
+O tamanho do período também sai dos rollups: os logs brutos só são
+lidos quando cabem em `points`, e meses arquivados pela retenção (sem
+logs, mas com rollups) continuam com série.
+"""
+
+import math
+import numpy as np
+from django.db.models import Max, Min, Sum
+from apps.weather.models import WeatherLog, WeatherRollup, normalize_city
+from apps.weather.services.queries import parse_datetime_param
+from apps.weather.services.rollups import ROLLUP_METRICS, Granularity, bucket_start # noqa E501
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """
+    Índices dos `threshold` pontos escolhidos pelo LTTB. O primeiro e o
+    último ponto sempre ficam; em cada bucket intermediário fica o ponto
+    que forma o maior triângulo com o ponto anterior escolhido e a média
+    do bucket seguinte.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = a = 0
+
+    for i in range(threshold - 2):
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        next_start = end
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+
+    selected[-1] = n - 1
+    return selected
+
+
+def _raw_points(logs, metric: str, limit: int) -> list[dict]:
+    rows = logs.order_by("timestamp").values_list("timestamp", metric)[:limit] # noqa E501
+    return [{"timestamp": ts, "value": value} for ts, value in rows]
+
+
+def _rollups(granularity: str, city_key: str | None, since, until):
+    qs = WeatherRollup.objects.filter(granularity=granularity)
+    if city_key:
+        qs = qs.filter(city_key=city_key)
+    if since:
+        qs = qs.filter(bucket_start__gte=bucket_start(since, granularity))
+    if until:
+        qs = qs.filter(bucket_start__lte=until)
+    return qs
+
+
+def _rollup_stats(city_key: str | None, since, until) -> dict:
+    """Medições e primeiro/último bucket horário do período, sem ler logs.""" # noqa E501
+    stats = _rollups(Granularity.HOUR, city_key, since, until).aggregate(
+        count=Sum("count"), first=Min("bucket_start"), last=Max("bucket_start") # noqa E501
+    )
+    stats["count"] = stats["count"] or 0
+    return stats
+
+
+def _rollup_points(granularity: str, city_key: str | None, since, until, metric: str) -> list[dict]: # noqa E501
+    """
+    Buckets da granularidade pedida, somando as cidades quando não há
+    filtro (média ponderada pelo número de medições).
+    """
+    rows = (
+        _rollups(granularity, city_key, since, until)
+        .values("bucket_start")
+        .annotate(
+            n=Sum("count"),
+            total=Sum(f"{metric}_sum"),
+            low=Min(f"{metric}_min"),
+            high=Max(f"{metric}_max"),
+        )
+        .order_by("bucket_start")
+    )
+    return [
+        {
+            "timestamp": row["bucket_start"],
+            "value": row["total"] / row["n"],
+            "min": row["low"],
+            "max": row["high"],
+        }
+        for row in rows
+        if row["n"]
+    ]
+
+
+def build_series(*, metric: str = "temperature", city: str | None = None, start: str | None = None, end: str | None = None, points: int = DEFAULT_POINTS) -> dict: # noqa E501
+    """
+    Série de `metric` com no máximo `points` pontos.
+
+    - o total de medições e o intervalo vêm dos rollups horários;
+    - até `points` medições: devolve as brutas (ou, se os logs já foram
+      arquivados, os buckets horários);
+    - senão agrega no banco pelos rollups: horários, enquanto os diários
+      dariam menos de `points` pontos, e diários acima disso;
+    - se ainda houver buckets demais, aplica LTTB sobre eles.
+
+    Os buckets dos rollups são inteiros, então o primeiro e o último
+    podem incluir medições logo fora de `start`/`end`.
+    """
+    if metric not in ROLLUP_METRICS:
+        raise ValueError(
+            f"Métrica inválida: '{metric}'. Use uma de: {', '.join(ROLLUP_METRICS)}." # noqa E501
+        )
+    if not 2 <= points <= MAX_POINTS:
+        raise ValueError(f"'points' deve estar entre 2 e {MAX_POINTS}.")
+
+    since = parse_datetime_param(start)
+    until = parse_datetime_param(end, end_of_day=True)
+    if since and until and since > until:
+        raise ValueError("Parâmetro 'start' deve ser anterior a 'end'.")
+
+    city_key = normalize_city(city) or None
+    stats = _rollup_stats(city_key, since, until)
+    result = {
+        "metric": metric,
+        "city": city or None,
+        "source_count": stats["count"],
+        "granularity": "raw",
+        "downsampled": False,
+        "points": [],
+    }
+    if not stats["count"]:
+        return result
+
+    if stats["count"] <= points:
+        logs = WeatherLog.objects.all()
+        if city_key:
+            logs = logs.filter(city_key=city_key)
+        if since:
+            logs = logs.filter(timestamp__gte=since)
+        if until:
+            logs = logs.filter(timestamp__lte=until)
+        raw = _raw_points(logs, metric, points + 1)
+        if 0 < len(raw) <= points:
+            result.update(source_count=len(raw), points=raw)
+            return result
+        if not raw:
+            # logs arquivados: só os rollups cobrem o período
+            series = _rollup_points(
+                Granularity.HOUR, city_key, stats["first"], stats["last"], metric # noqa E501
+            )
+            result.update(granularity=Granularity.HOUR, points=series)
+            return result
+
+    span_hours = (stats["last"] - stats["first"]).total_seconds() / 3600
+    granularity = Granularity.HOUR if span_hours / 24 < points else Granularity.DAY # noqa E501
+
+    series = _rollup_points(
+        granularity, city_key, stats["first"], stats["last"], metric
+    )
+    if len(series) > points:
+        x = [p["timestamp"].timestamp() for p in series]
+        y = [p["value"] for p in series]
+        series = [series[i] for i in lttb(x, y, points)]
+
+    result.update(granularity=granularity, downsampled=True, points=series)
+    return result
@@ -1,7 +1,10 @@
 import logging
 from celery import shared_task
-from .services.openweather import store_current_weather
-from .services.insights import generate_insights_for_last_hours
+from .services.openweather import (
+    collect_weather_for_cities,
+    store_current_weather,
+)
+from .services.insights import generate_insight, generate_insights_for_cities
 
 logger = logging.getLogger(__name__)
 
@@ -14,23 +17,179 @@ def collect_weather_task():
 
 
 @shared_task
-def generate_insights_task(hours: int = 24, force_collect: bool = False, city: str | None = None): # noqa E501
+def collect_tracked_cities_task():
+    """
+    Coleta em paralelo todas as cidades ativas do registro TrackedCity.
+    """
+    from .models import TrackedCity
+
+    cities = TrackedCity.objects.filter(active=True)
+    logs, failures = collect_weather_for_cities(cities)
+    logger.info(
+        "Coleta em lote: %s weatherlogs criados, %s falhas.",
+        len(logs),
+        len(failures),
+    )
+    return len(logs)
+
+
+@shared_task(bind=True)
+def generate_insights_task(self, hours: int = 24, force_collect: bool = False, city: str | None = None): # noqa E501
     """
     Gera insights de IA para as últimas `hours` horas.
     Se `city` for informado, filtra por cidade.
     `force_collect` hoje só coleta a cidade padrão (Brasília).
+
+    Idempotente por `(hours, city)`: se um insight igual foi gerado dentro
+    da janela de frescor ou outra task igual está rodando, não chama a
+    OpenAI de novo.
     """
     from .models import WeatherInsight
+    from .services import insight_jobs
+
+    key = insight_jobs.insight_key(hours, city)
+    task_id = self.request.id
+
+    publish = insight_jobs.publish_progress
+
+    fresh = insight_jobs.fresh_insight(key)
+    if fresh is not None:
+        logger.info("Insight %s ainda recente para %s; reaproveitado.", fresh.id, key) # noqa E501
+        # sem acquire_run aqui: só libera o registro de enfileiramento
+        insight_jobs.release_job(key, task_id)
+        publish(task_id, "done", {"insight_id": fresh.id, "cached": True})
+        return fresh.id
 
-    if force_collect and not city:
-        log = store_current_weather()
+    if not insight_jobs.acquire_run(key, task_id):
+        logger.info("Insight para %s já está em geração; task ignorada.", key) # noqa E501
+        running = insight_jobs.hand_over_job(key, task_id)
+        publish(task_id, "skipped", {"reason": "duplicada", "task_id": running}) # noqa E501
+        return None
+
+    publish(task_id, "started", {})
+    insight_id = None
+    try:
+        if force_collect and not city:
+            publish(task_id, "collecting", {})
+            log = store_current_weather()
+            logger.info(
+                "Coleta forçada antes do insight. Weatherlog id=%s (%s)", log.id, log.city # noqa E501
+            )
+
+        publish(task_id, "generating", {})
+        result = generate_insight(hours=hours, city=city)
+        insight = WeatherInsight.objects.create(
+            text=result["text"],
+            city=city or "",
+            hours=hours,
+            fingerprint=result["fingerprint"],
+        )
+        insight_id = insight.id
         logger.info(
-            "Coleta forçada antes do insight. Weatherlog id=%s (%s)", log.id, log.city # noqa E501
+            "Insight_id=%s salvo com sucesso. city=%s", insight.id, city or "(todas)" # noqa E501
         )
+        publish(task_id, "done", {"insight_id": insight.id, "cached": False})
+        return insight.id
+    except Exception as exc:
+        publish(task_id, "failed", {"detail": str(exc)})
+        raise
+    finally:
+        insight_jobs.finish_run(key, task_id, insight_id)
+
+
+@shared_task(bind=True)
+def generate_city_insights_task(self, hours: int = 24, tracked_only: bool = True): # noqa E501
+    """
+    Gera em lote um insight por cidade: as cidades ativas de TrackedCity
+    ou, com `tracked_only=False`, todas as que têm medições no período.
+    Uma varredura por vez (a do beat não se sobrepõe a uma manual).
+    """
+    from .models import TrackedCity
+    from .services import insight_jobs
+
+    key = f"batch:{int(hours)}:{'tracked' if tracked_only else 'all'}"
+    if not insight_jobs.acquire_run(key, self.request.id):
+        logger.info("Insights em lote (%s) já em execução; task ignorada.", key) # noqa E501
+        return 0
+
+    try:
+        cities = None
+        if tracked_only:
+            cities = list(
+                TrackedCity.objects.filter(active=True).values_list(
+                    "name", flat=True
+                )
+            )
+            if not cities:
+                return 0
+        insights = generate_insights_for_cities(hours=hours, cities=cities)
+        logger.info("Insights em lote: %s cidades.", len(insights))
+        return len(insights)
+    finally:
+        insight_jobs.finish_run(key, self.request.id, None)
+
+
+@shared_task
+def export_xlsx_task(export_id: str):
+    """
+    Gera em background o XLSX de um WeatherExport pendente.
+    """
+    from .models import WeatherExport
+    from .services.exports import run_export
+
+    export = WeatherExport.objects.get(pk=export_id)
+    run_export(export)
+    logger.info("Exportação %s concluída: %s", export.id, export.file.name)
+    return str(export.id)
+
+
+@shared_task
+def purge_exports_task():
+    """
+    Remove as exportações assíncronas (registro e arquivo) mais antigas
+    que `EXPORTS_CONFIG["ttl_days"]`.
+    """
+    from .services.exports import purge_exports
+
+    deleted = purge_exports()
+    logger.info("Exportações expiradas removidas: %s", deleted)
+    return deleted
+
+
+@shared_task
+def rebuild_rollups_task(days: int | None = 2):
+    """
+    Backfill/compactação dos rollups: recalcula os últimos `days` dias a
+    partir dos logs brutos (`days=None` recalcula tudo).
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from .services.rollups import rebuild_rollups
+
+    since = timezone.now() - timedelta(days=days) if days else None
+    total = rebuild_rollups(since=since)
+    logger.info("Rollups recalculados: %s buckets (days=%s)", total, days)
+    return total
+
+
+@shared_task
+def apply_retention_task():
+    """
+    Política de retenção dos WeatherLogs (ver `RETENTION_CONFIG`): cria as
+    próximas partições mensais (PostgreSQL), remove o `raw` dos logs
+    antigos e arquiva os meses fora da janela.
+    """
+    from .services.retention import apply_retention
 
-    text = generate_insights_for_last_hours(hours=hours, city=city)
-    insight = WeatherInsight.objects.create(text=text)
+    result = apply_retention()
     logger.info(
-        "Insight_id=%s salvo com sucesso. city=%s", insight.id, city or "(todas)" # noqa E501
+        "Retenção: %s partições criadas, raw removido de %s logs, %s meses arquivados.", # noqa E501
+        len(result["partitions"]),
+        result["raw_stripped"],
+        len(result["archived"]),
     )
-    return insight.id
+    return {
+        "partitions": len(result["partitions"]),
+        "raw_stripped": result["raw_stripped"],
+        "archived": [item["month"] for item in result["archived"]],
+    }
@@ -0,0 +1,64 @@
+import json
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.weather.management.commands.bench_weather import Command
+from apps.weather.models import WeatherLog
+
+
+class BenchWeatherCommandTest(TestCase):
+
+    def test_bench_gera_relatorio_json(self):
+        out = StringIO()
+        call_command(
+            "bench_weather",
+            in_place=True,
+            rows=120,
+            cities=2,
+            iterations=1,
+            ingest_batch=20,
+            stdout=out,
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["meta"]["rows"], 120)
+        results = report["results"]
+        for name in (
+            "list_offset_deep",
+            "list_cursor_first",
+            "latest_by_city",
+            "export_csv",
+            "export_xlsx",
+            "insights_24h_city",
+            "ingest_bulk",
+        ):
+            self.assertIn(name, results)
+            self.assertEqual(results[name]["iterations"], 1)
+        self.assertEqual(results["ingest_bulk"]["rows"], 20)
+
+    def test_cursor_profundo_comeca_na_posicao_antiga(self):
+        call_command("seed_weather_logs", cities="2", rows=60, step=1, stdout=StringIO()) # noqa E501
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user("bench", password="x")
+        )
+        url = reverse("weather-logs-list")
+
+        response = client.get(
+            url,
+            {
+                "limit": 10,
+                "pagination": "cursor",
+                "cursor": Command._cursor_at(url, 45),
+            },
+        )
+
+        expected = list(
+            WeatherLog.objects.order_by("-timestamp", "-id").values_list(
+                "id", flat=True
+            )[46:56]
+        )
+        self.assertEqual([row["id"] for row in response.data["results"]], expected) # noqa E501
@@ -0,0 +1,260 @@
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from openpyxl import load_workbook
+import pyarrow as pa
+import pyarrow.parquet as pq
+from apps.weather.models import WeatherLog, WeatherExport
+from apps.weather.services.exports import iter_parquet, run_export
+from apps.weather.tasks import purge_exports_task
+
+User = get_user_model()
+
+
+class WeatherExportCsvTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("weather-logs-export-csv")
+
+        now = timezone.now()
+        for i, city in enumerate(["Brasília", "Recife", "Brasília"]):
+            WeatherLog.objects.create(
+                timestamp=now - timedelta(days=i),
+                city=city,
+                temperature=20 + i,
+                humidity=50,
+                pressure=1013,
+                wind_speed=3,
+                condition="céu limpo",
+                raw={"name": city},
+            )
+
+    def _read_lines(self, response):
+        content = b"".join(response.streaming_content).decode()
+        return content.strip().splitlines()
+
+    def test_export_csv_streaming(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        lines = self._read_lines(response)
+        self.assertEqual(
+            lines[0],
+            "timestamp,city,temperature,humidity,pressure,wind_speed,condition", # noqa E501
+        )
+        self.assertEqual(len(lines), 4)
+        # ordem cronológica: o registro mais antigo vem primeiro
+        self.assertIn("22.0", lines[1])
+
+    def test_export_csv_filtra_por_cidade(self):
+        response = self.client.get(self.url, {"city": "brasília"})
+
+        lines = self._read_lines(response)
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all("Brasília" in line for line in lines[1:]))
+
+    def test_export_csv_filtra_por_intervalo(self):
+        start = (timezone.now() - timedelta(hours=36)).isoformat()
+        response = self.client.get(self.url, {"start": start})
+
+        lines = self._read_lines(response)
+        self.assertEqual(len(lines), 3)
+
+    def test_export_csv_data_invalida(self):
+        response = self.client.get(self.url, {"start": "ontem"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WeatherExportColumnarTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=self.user)
+
+        now = timezone.now()
+        for i, city in enumerate(["Brasília", "Recife", "Brasília"]):
+            WeatherLog.objects.create(
+                timestamp=now - timedelta(days=i),
+                city=city,
+                temperature=20 + i,
+                humidity=50,
+                pressure=1013,
+                wind_speed=3,
+                condition="céu limpo",
+                raw={"name": city},
+            )
+
+    def _content(self, response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_export_parquet_tipado(self):
+        response = self.client.get(reverse("weather-logs-export-parquet"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.parquet") # noqa E501
+        table = pq.read_table(BytesIO(self._content(response)))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.schema.field("timestamp").type, pa.timestamp("us", tz="UTC")) # noqa E501
+        self.assertEqual(table.schema.field("temperature").type, pa.float64())
+        # ordem cronológica, como no CSV
+        self.assertEqual(table.column("temperature").to_pylist(), [22.0, 21.0, 20.0]) # noqa E501
+
+    def test_parquet_um_row_group_por_lote(self):
+        content = b"".join(
+            iter_parquet(WeatherLog.objects.all(), batch_size=2)
+        )
+
+        parquet = pq.ParquetFile(BytesIO(content))
+        self.assertEqual(parquet.num_row_groups, 2)
+        self.assertEqual(parquet.metadata.row_group(0).column(0).compression, "ZSTD") # noqa E501
+
+    def test_export_arrow_stream_filtra_por_cidade(self):
+        response = self.client.get(
+            reverse("weather-logs-export-arrow"), {"city": "brasília"}
+        )
+
+        table = pa.ipc.open_stream(self._content(response)).read_all()
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(set(table.column("city").to_pylist()), {"Brasília"})
+
+    def test_export_sem_dados(self):
+        response = self.client.get(
+            reverse("weather-logs-export-parquet"), {"city": "Natal"}
+        )
+
+        table = pq.read_table(BytesIO(self._content(response)))
+        self.assertEqual(table.num_rows, 0)
+        self.assertIn("condition", table.schema.names)
+
+    def test_export_data_invalida(self):
+        response = self.client.get(
+            reverse("weather-logs-export-arrow"), {"start": "ontem"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class WeatherExportXlsxTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("weather-logs-export-xlsx")
+
+        now = timezone.now()
+        for i in range(3):
+            WeatherLog.objects.create(
+                timestamp=now - timedelta(hours=i),
+                city="Recife",
+                temperature=25 + i,
+                humidity=70,
+                pressure=1010,
+                wind_speed=4,
+                condition="nublado",
+                raw={"name": "Recife"},
+            )
+
+    def _load_rows(self, response):
+        content = b"".join(response.streaming_content)
+        wb = load_workbook(BytesIO(content), read_only=True)
+        return list(wb["Weather Logs"].iter_rows(values_only=True))
+
+    def test_export_xlsx_sincrono(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = self._load_rows(response)
+        self.assertEqual(rows[0][0], "timestamp")
+        self.assertEqual(len(rows), 4)
+
+    def test_export_xlsx_assincrono(self):
+        with mock.patch(
+            "apps.weather.api.viewsets.export_xlsx_task.delay"
+        ) as delay:
+            response = self.client.get(
+                self.url, {"async": "1", "city": "recife"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        export = WeatherExport.objects.get(pk=response.data["export_id"])
+        delay.assert_called_once_with(str(export.id))
+        self.assertEqual(export.filters, {"city": "recife"})
+
+        pending = self.client.get(response.data["download_url"])
+        self.assertEqual(pending.status_code, status.HTTP_202_ACCEPTED)
+
+        run_export(export)
+
+        done = self.client.get(response.data["download_url"])
+        self.assertEqual(done.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self._load_rows(done)), 4)
+
+    def test_export_download_de_outro_usuario(self):
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="Django13$"
+        )
+        export = WeatherExport.objects.create(requested_by=other)
+
+        response = self.client.get(
+            reverse(
+                "weather-logs-export-download",
+                kwargs={"export_id": export.id},
+            )
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(EXPORTS_CONFIG={"ttl_days": 7})
+    def test_exportacoes_expiradas_sao_apagadas(self):
+        old = run_export(WeatherExport.objects.create(requested_by=self.user)) # noqa E501
+        recent = run_export(WeatherExport.objects.create(requested_by=self.user)) # noqa E501
+        stuck = WeatherExport.objects.create(requested_by=self.user)
+        WeatherExport.objects.filter(pk__in=[old.pk, stuck.pk]).update(
+            created_at=timezone.now() - timedelta(days=8)
+        )
+
+        deleted = purge_exports_task.apply().result
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(list(WeatherExport.objects.all()), [recent])
+        self.assertFalse(default_storage.exists(old.file.name))
+        self.assertTrue(default_storage.exists(recent.file.name))
+
+    @override_settings(EXPORTS_CONFIG={"ttl_days": 0})
+    def test_ttl_zero_nao_apaga(self):
+        export = WeatherExport.objects.create(requested_by=self.user)
+        WeatherExport.objects.filter(pk=export.pk).update(
+            created_at=timezone.now() - timedelta(days=365)
+        )
+
+        self.assertEqual(purge_exports_task.apply().result, 0)
+        self.assertTrue(WeatherExport.objects.exists())
@@ -0,0 +1,149 @@
+import asyncio
+from unittest import mock
+import httpx
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from apps.weather.models import GeocodedCity, WeatherLog
+from apps.weather.services import openweather, openweather_async
+
+User = get_user_model()
+
+
+class FakeOpenWeather:
+    """Transport httpx que simula geocoding e clima atual."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, request):
+        self.calls.append(request.url.path)
+        await asyncio.sleep(self.delay)
+        if "geo" in request.url.path:
+            name = request.url.params["q"].split(",")[0]
+            if name != "Recife":
+                return httpx.Response(200, json=[])
+            return httpx.Response(
+                200, json=[{"lat": -8.05, "lon": -34.9, "name": name}]
+            )
+        if request.url.params["appid"] == "erro":
+            return httpx.Response(503, json={})
+        return httpx.Response(
+            200,
+            json={
+                "name": "Recife",
+                "main": {"temp": 29.0, "humidity": 70, "pressure": 1010},
+                "wind": {"speed": 4.0},
+                "weather": [{"description": "nublado"}],
+            },
+        )
+
+
+class FetchCityAsyncTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        openweather._geocode_cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+            is_superuser=True,
+        )
+        self.token = Token.objects.get(user=self.user).key
+        self.url = reverse("weather-logs-fetch-city-async")
+        self.fake = FakeOpenWeather(delay=0.05)
+        patcher = mock.patch.object(
+            openweather_async,
+            "get_async_client",
+            side_effect=lambda: httpx.AsyncClient(
+                transport=httpx.MockTransport(self.fake)
+            ),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, data, token=None):
+        return self.async_client.post(
+            self.url,
+            data,
+            content_type="application/json",
+            headers={"Authorization": f"Token {token or self.token}"},
+        )
+
+    async def test_busca_e_grava_log(self):
+        response = await self._post({"city": "Recife"})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["city"], "Recife")
+        self.assertEqual(await WeatherLog.objects.acount(), 1)
+        self.assertTrue(
+            await GeocodedCity.objects.filter(city_key="recife").aexists()
+        )
+
+    async def test_requisicoes_concorrentes_compartilham_chamadas(self):
+        responses = await asyncio.gather(
+            *(self._post({"city": "Recife"}) for _ in range(10))
+        )
+
+        self.assertEqual({r.status_code for r in responses}, {201})
+        # 10 requisições simultâneas: um geocoding e um clima
+        self.assertEqual(len(self.fake.calls), 2)
+        self.assertEqual(await WeatherLog.objects.acount(), 1)
+
+    async def test_requisicao_repetida_reaproveita_o_log(self):
+        first = await self._post({"city": "Recife"})
+        # mesma cidade dentro do OPENWEATHER_CACHE_TTL: mesmo payload em cache
+        second = await self._post({"city": "Recife"})
+
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json()["id"], first.json()["id"])
+        self.assertEqual(second.json()["raw"]["name"], "Recife")
+        self.assertEqual(await WeatherLog.objects.acount(), 1)
+
+    async def test_corpo_de_formulario(self):
+        headers = {"Authorization": f"Token {self.token}"}
+
+        # multipart (padrão do test client) e urlencoded, como no DRF
+        response = await self.async_client.post(
+            self.url, {"city": "Recife"}, headers=headers
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["city"], "Recife")
+
+        response = await self.async_client.post(
+            self.url,
+            "city=Recife&country=BR",
+            content_type="application/x-www-form-urlencoded",
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response = await self.async_client.post(
+            self.url, "city", content_type="text/plain", headers=headers
+        )
+        self.assertEqual(response.status_code, 415)
+
+    async def test_erros(self):
+        response = await self._post({})
+        self.assertEqual(response.status_code, 400)
+
+        response = await self._post({"city": "Atlantida"})
+        self.assertEqual(response.status_code, 404)
+
+        response = await self._post({"city": "Recife"}, token="invalido")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_falha_da_openweather(self):
+        with self.settings(
+            OPENWEATHER_CONFIG={
+                **openweather_async.settings.OPENWEATHER_CONFIG,
+                "api_key": "erro",
+            }
+        ):
+            response = await self._post({"city": "Recife"})
+
+        self.assertEqual(response.status_code, 502)
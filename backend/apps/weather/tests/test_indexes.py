@@ -0,0 +1,76 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from apps.weather.models import WeatherLog
+from apps.weather.services import retention
+from apps.weather.services.queries import filter_weather_logs
+
+
+class WeatherLogIndexTest(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        WeatherLog.objects.bulk_create(
+            [
+                WeatherLog(
+                    timestamp=now - timedelta(hours=i),
+                    city=city,
+                    city_key=city.lower(),
+                    temperature=20,
+                    humidity=50,
+                    pressure=1013,
+                    wind_speed=2,
+                    condition="céu limpo",
+                )
+                for i in range(50)
+                for city in ("Brasília", "Recife")
+            ]
+        )
+
+    def test_city_key_normalizado_no_save(self):
+        log = WeatherLog.objects.create(
+            timestamp=timezone.now(),
+            city="  São   Paulo ",
+            temperature=20,
+            humidity=50,
+            pressure=1013,
+            wind_speed=2,
+            condition="nublado",
+        )
+        self.assertEqual(log.city_key, "são paulo")
+
+    def test_sem_indice_redundante_por_city(self):
+        with connection.cursor() as cursor:
+            names = set(
+                connection.introspection.get_constraints(
+                    cursor, WeatherLog._meta.db_table
+                )
+            )
+
+        # filtros por cidade usam `city_key`; (city, timestamp) só custava
+        # escrita
+        self.assertIn("weather_log_citykey_ts_idx", names)
+        self.assertNotIn("weather_log_city_ts_idx", names)
+
+    def test_filtro_cidade_usa_indice_composto(self):
+        since = (timezone.now() - timedelta(hours=24)).isoformat()
+        qs = filter_weather_logs(
+            WeatherLog.objects.all(), city="BRASÍLIA", start=since
+        ).order_by("-timestamp")
+
+        self.assertEqual(qs.count(), 24)
+
+        if connection.vendor == "postgresql":
+            # tabela de teste é pequena: força o planner a considerar índices
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+        elif connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN verificado apenas em SQLite/PostgreSQL.")
+
+        plan = qs.explain()
+        if retention.is_partitioned():
+            # o índice do pai é replicado em cada partição do intervalo
+            self.assertIn("_city_key_timestamp_idx", plan)
+        else:
+            self.assertIn("weather_log_citykey_ts_idx", plan)
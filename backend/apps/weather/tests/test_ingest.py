@@ -0,0 +1,90 @@
+import json
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.weather.models import WeatherLog, WeatherRollup
+
+User = get_user_model()
+
+
+def reading(**overrides):
+    data = {
+        "timestamp": "2025-11-20T12:00:00-03:00",
+        "city": "Belém",
+        "temperature": 31.5,
+        "humidity": 80,
+        "pressure": 1009,
+        "wind_speed": 2.1,
+        "condition": "chuva leve",
+        "raw": {"name": "Belém"},
+    }
+    data.update(overrides)
+    return data
+
+
+class WeatherLogBulkIngestTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="collector",
+            email="collector@example.com",
+            password="Django13$",
+        )
+        self.user.user_permissions.add(
+            Permission.objects.get(codename="add_weatherlog")
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("weather-logs-bulk")
+
+    def test_bulk_json_array(self):
+        rows = [reading(temperature=20 + i) for i in range(5)]
+
+        response = self.client.post(self.url, rows, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 5)
+        self.assertEqual(WeatherLog.objects.filter(city_key="belém").count(), 5) # noqa E501
+        self.assertEqual(
+            WeatherRollup.objects.get(granularity="hour").count, 5
+        )
+
+    def test_bulk_ndjson_com_erros_por_linha(self):
+        lines = [
+            json.dumps(reading()),
+            "{isto não é json",
+            json.dumps(reading(temperature="quente", raw={})),
+            json.dumps(reading(city="Macapá")),
+        ]
+
+        response = self.client.generic(
+            "POST",
+            self.url,
+            "\n".join(lines) + "\n",
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["failed"], 2)
+        errors = {e["index"]: e["errors"] for e in response.data["errors"]}
+        self.assertIn("non_field_errors", errors[1])
+        self.assertEqual(set(errors[2]), {"temperature", "raw"})
+        self.assertEqual(WeatherLog.objects.count(), 2)
+
+    def test_bulk_exige_lista(self):
+        response = self.client.post(self.url, reading(), format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_exige_permissao(self):
+        self.user.user_permissions.clear()
+        user = User.objects.get(pk=self.user.pk)
+        self.client.force_authenticate(user=user)
+
+        response = self.client.post(self.url, [reading()], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,278 @@
+import json
+import threading
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.weather.models import WeatherInsight, WeatherLog
+from apps.weather.api import viewsets
+from apps.weather.services import insight_jobs, llm
+from apps.weather.tasks import generate_insights_task
+
+User = get_user_model()
+
+
+def _chunk(text):
+    return mock.Mock(choices=[mock.Mock(delta=mock.Mock(content=text))])
+
+
+def _read_events(response) -> list[tuple[str, dict]]:
+    body = b"".join(response.streaming_content).decode()
+    events = []
+    for block in body.split("\n\n"):
+        lines = dict(
+            line.split(": ", 1)
+            for line in block.splitlines()
+            if line and not line.startswith(":")
+        )
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@override_settings(
+    OPENAI_CONFIG={"api_key": "test", "model": "gpt-4.1-mini", "max_retries": 0}, # noqa E501
+    INSIGHTS_CONFIG={"freshness_seconds": 300, "lock_timeout": 600},
+)
+class InsightStreamTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        llm.breaker.reset()
+        self.addCleanup(llm.breaker.reset)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+            is_superuser=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("weather-logs-insights-stream")
+        WeatherLog.objects.create(
+            timestamp=timezone.now(),
+            city="Recife",
+            temperature=28,
+            humidity=70,
+            pressure=1010,
+            wind_speed=3.5,
+            condition="nublado",
+            raw={"name": "Recife"},
+        )
+        patcher = mock.patch.object(llm, "get_openai_client")
+        self.openai = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_tokens_chegam_em_ordem_e_insight_e_salvo(self):
+        self.openai.chat.completions.create.return_value = iter(
+            [_chunk("Calor "), _chunk("em "), _chunk("Recife.")]
+        )
+
+        response = self.client.post(
+            self.url, {"hours": 24, "city": "Recife"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/event-stream")) # noqa E501
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        events = _read_events(response)
+        self.assertEqual(events[0][0], "start")
+        tokens = [data["text"] for name, data in events if name == "token"]
+        self.assertEqual(tokens, ["Calor ", "em ", "Recife."])
+        name, data = events[-1]
+        self.assertEqual(name, "done")
+        self.assertFalse(data["cached"])
+        self.assertEqual(data["insight"]["text"], "Calor em Recife.")
+
+        insight = WeatherInsight.objects.get()
+        self.assertEqual(insight.city, "Recife")
+        self.assertEqual(insight.hours, 24)
+        self.assertTrue(insight.fingerprint)
+        self.assertTrue(
+            self.openai.chat.completions.create.call_args.kwargs["stream"]
+        )
+
+        # segundo pedido: insight recente, sem chamar a IA
+        again = _read_events(
+            self.client.post(self.url, {"hours": 24, "city": "recife"}, format="json") # noqa E501
+        )
+        self.assertEqual(again[-1][0], "done")
+        self.assertTrue(again[-1][1]["cached"])
+        self.assertEqual(self.openai.chat.completions.create.call_count, 1)
+
+    def test_falha_da_ia_envia_fallback(self):
+        self.openai.chat.completions.create.side_effect = RuntimeError("boom")
+
+        with self.assertLogs("apps.weather.services.insights", "ERROR"):
+            events = _read_events(
+                self.client.post(self.url, {"hours": 24}, format="json")
+            )
+
+        names = [name for name, _ in events]
+        self.assertEqual(names, ["start", "fallback", "done"])
+        self.assertIn("Temperatura média", events[1][1]["text"])
+        self.assertEqual(
+            events[-1][1]["insight"]["text"], events[1][1]["text"]
+        )
+        self.assertEqual(WeatherInsight.objects.get().fingerprint, "")
+
+    def test_stream_registra_a_execucao(self):
+        self.openai.chat.completions.create.return_value = iter([_chunk("Ok.")]) # noqa E501
+        key = insight_jobs.insight_key(24, "Recife")
+
+        events = _read_events(
+            self.client.post(self.url, {"hours": 24, "city": "Recife"}, format="json") # noqa E501
+        )
+
+        self.assertEqual(events[-1][0], "done")
+        # execução encerrada e liberada ao fim do stream
+        self.assertIsNone(insight_jobs.running_task(key))
+        self.assertTrue(insight_jobs.acquire_run(key, "depois"))
+
+    def test_stream_acompanha_geracao_em_andamento(self):
+        key = insight_jobs.insight_key(24, "Recife")
+        self.assertTrue(insight_jobs.acquire_run(key, "outro-stream"))
+        insight = WeatherInsight.objects.create(text="Já gerado.", city="Recife", hours=24) # noqa E501
+        insight_jobs.publish_progress("outro-stream", "generating", {})
+        insight_jobs.publish_progress("outro-stream", "done", {"insight_id": insight.id}) # noqa E501
+
+        events = _read_events(
+            self.client.post(self.url, {"hours": 24, "city": "Recife"}, format="json") # noqa E501
+        )
+
+        self.assertEqual(
+            [name for name, _ in events], ["start", "following", "done"]
+        )
+        self.assertEqual(events[1][1]["task_id"], "outro-stream")
+        self.assertTrue(events[-1][1]["shared"])
+        self.assertEqual(events[-1][1]["insight"]["text"], "Já gerado.")
+        self.openai.chat.completions.create.assert_not_called()
+        self.assertEqual(WeatherInsight.objects.count(), 1)
+
+    def test_hours_invalido(self):
+        response = self.client.post(self.url, {"hours": "x"}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    OPENAI_CONFIG={"api_key": "", "model": "gpt-4.1-mini"},
+    INSIGHTS_CONFIG={"freshness_seconds": 300, "lock_timeout": 600},
+)
+class InsightTaskEventsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+            is_superuser=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        WeatherLog.objects.create(
+            timestamp=timezone.now(),
+            city="Recife",
+            temperature=28,
+            humidity=70,
+            pressure=1010,
+            wind_speed=3.5,
+            condition="nublado",
+            raw={"name": "Recife"},
+        )
+
+    def test_progresso_da_task_ate_o_fim(self):
+        with mock.patch.object(generate_insights_task, "apply_async"):
+            response = self.client.post(
+                reverse("weather-logs-insights"), {"hours": 24}, format="json"
+            )
+        task_id = response.data["task_id"]
+        generate_insights_task.apply(
+            kwargs={"hours": 24, "city": None}, task_id=task_id
+        )
+
+        response = self.client.get(
+            reverse("weather-logs-insights-task-events", args=[task_id]),
+            HTTP_ACCEPT="text/event-stream",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        events = _read_events(response)
+        names = [name for name, _ in events]
+        self.assertEqual(names, ["queued", "started", "generating", "done"])
+        insight = WeatherInsight.objects.get()
+        self.assertEqual(events[-1][1]["insight"]["id"], insight.id)
+
+    def test_espera_limitada_com_retomada(self):
+        insight_jobs.publish_progress("t2", "queued", {"hours": 24})
+        url = reverse("weather-logs-insights-task-events", args=["t2"])
+
+        with mock.patch.object(viewsets, "SSE_MAX_WAIT_SECONDS", 0), \
+                mock.patch.object(viewsets, "SSE_POLL_SECONDS", 0):
+            events = _read_events(self.client.get(url))
+            self.assertEqual(
+                events, [("queued", {"hours": 24}), ("timeout", {"since": 1})] # noqa E501
+            )
+
+            insight_jobs.publish_progress("t2", "failed", {"detail": "x"})
+            events = _read_events(self.client.get(url, {"since": 1}))
+        self.assertEqual([name for name, _ in events], ["failed"])
+
+    def test_task_desconhecida(self):
+        response = self.client.get(
+            reverse("weather-logs-insights-task-events", args=["nada"])
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_evento_final_encerra_o_stream(self):
+        insight_jobs.publish_progress("t1", "queued", {"hours": 24})
+        insight_jobs.publish_progress("t1", "skipped", {"reason": "running"})
+
+        events = _read_events(
+            self.client.get(
+                reverse("weather-logs-insights-task-events", args=["t1"])
+            )
+        )
+
+        self.assertEqual([name for name, _ in events], ["queued", "skipped"])
+
+    def test_publicacoes_concorrentes_nao_se_perdem(self):
+        def publish(worker):
+            for n in range(25):
+                insight_jobs.publish_progress("t3", "generating", {"w": worker, "n": n}) # noqa E501
+
+        threads = [threading.Thread(target=publish, args=(w,)) for w in range(8)] # noqa E501
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        events = insight_jobs.progress_events("t3")
+        self.assertEqual(len(events), 200)
+        for worker in range(8):
+            # a ordem de cada publicador é preservada
+            self.assertEqual(
+                [e["data"]["n"] for e in events if e["data"]["w"] == worker],
+                list(range(25)),
+            )
+
+    def test_leitura_para_no_evento_ainda_nao_gravado(self):
+        insight_jobs.publish_progress("t4", "queued", {})
+        # outro publicador reservou a posição 2 e ainda não gravou
+        cache.incr("insights:events:t4")
+        insight_jobs.publish_progress("t4", "started", {})
+
+        self.assertEqual(
+            [e["event"] for e in insight_jobs.progress_events("t4")], ["queued"] # noqa E501
+        )
+
+        cache.set("insights:events:t4:2", {"event": "collecting", "data": {}})
+        self.assertEqual(
+            [e["event"] for e in insight_jobs.progress_events("t4", since=1)],
+            ["collecting", "started"],
+        )
@@ -0,0 +1,376 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.weather.models import TrackedCity, WeatherInsight, WeatherLog
+from apps.weather.services import insight_jobs, llm
+from apps.weather.services.insights import (
+    generate_insight,
+    generate_insights_for_cities,
+    generate_insights_for_last_hours,
+)
+from apps.weather.tasks import (
+    generate_city_insights_task,
+    generate_insights_task,
+)
+
+User = get_user_model()
+
+
+@override_settings(OPENAI_CONFIG={"api_key": "", "model": "gpt-4.1-mini"})
+class RuleBasedInsightTest(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        for i, temp in enumerate([30.0, 20.0, 25.0]):
+            WeatherLog.objects.create(
+                timestamp=now - timedelta(hours=i),
+                city="Recife",
+                temperature=temp,
+                humidity=60 + i * 10,
+                pressure=1010,
+                wind_speed=3.5,
+                condition="nublado",
+                raw={"name": "Recife"},
+            )
+
+    def test_insight_numerico_em_duas_consultas(self):
+        with self.assertNumQueries(2):
+            text = generate_insights_for_last_hours(hours=24, city="recife")
+
+        self.assertIn("foram coletadas 3 medições em recife", text)
+        self.assertIn("Temperatura média: 25.0°C", text)
+        self.assertIn("máx 30.0°C, mín 20.0°C", text)
+        self.assertIn("Umidade média: 70%", text)
+        self.assertIn("com 30.0°C", text)
+
+    def test_insight_sem_dados(self):
+        with self.assertNumQueries(1):
+            text = generate_insights_for_last_hours(hours=24, city="Natal")
+
+        self.assertIn("Ainda não há dados suficientes", text)
+
+
+@override_settings(
+    OPENAI_CONFIG={"api_key": "", "model": "gpt-4.1-mini"},
+    INSIGHTS_CONFIG={"freshness_seconds": 300, "lock_timeout": 600},
+)
+class InsightDeduplicationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+            is_superuser=True,
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("weather-logs-insights")
+        WeatherLog.objects.create(
+            timestamp=timezone.now(),
+            city="Recife",
+            temperature=28,
+            humidity=70,
+            pressure=1010,
+            wind_speed=3.5,
+            condition="nublado",
+            raw={"name": "Recife"},
+        )
+        patcher = mock.patch.object(generate_insights_task, "apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pedidos_repetidos_reaproveitam_a_task(self):
+        first = self.client.post(self.url, {"hours": 24, "city": "Recife"})
+        second = self.client.post(self.url, {"hours": 24, "city": " recife "}) # noqa E501
+        other = self.client.post(self.url, {"hours": 48, "city": "Recife"})
+
+        self.assertEqual(first.status_code, 202)
+        self.assertFalse(first.data["deduplicated"])
+        self.assertTrue(second.data["deduplicated"])
+        self.assertEqual(second.data["task_id"], first.data["task_id"])
+        self.assertNotEqual(other.data["task_id"], first.data["task_id"])
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_insight_recente_e_devolvido(self):
+        response = self.client.post(self.url, {"hours": 24, "city": "Recife"}) # noqa E501
+        task_id = response.data["task_id"]
+
+        generate_insights_task.apply(
+            kwargs={"hours": 24, "city": "Recife"}, task_id=task_id
+        )
+        response = self.client.post(self.url, {"hours": 24, "city": "Recife"}) # noqa E501
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["cached"])
+        self.assertEqual(
+            response.data["insight"]["id"], WeatherInsight.objects.get().id
+        )
+        self.assertEqual(self.apply_async.call_count, 1)
+
+        # task duplicada que chega depois também reaproveita o insight
+        generate_insights_task.apply(kwargs={"hours": 24, "city": "Recife"})
+        self.assertEqual(WeatherInsight.objects.count(), 1)
+
+    def test_task_em_execucao_nao_roda_em_paralelo(self):
+        key = insight_jobs.insight_key(24, "Recife")
+        self.assertTrue(insight_jobs.acquire_run(key, "outra-task"))
+
+        result = generate_insights_task.apply(
+            kwargs={"hours": 24, "city": "Recife"}
+        )
+
+        self.assertIsNone(result.result)
+        self.assertEqual(WeatherInsight.objects.count(), 0)
+
+    def test_task_ignorada_repassa_o_enfileiramento(self):
+        response = self.client.post(self.url, {"hours": 24, "city": "Recife"}) # noqa E501
+        task_id = response.data["task_id"]
+        key = insight_jobs.insight_key(24, "Recife")
+        self.assertTrue(insight_jobs.acquire_run(key, "outra-task"))
+
+        generate_insights_task.apply(
+            kwargs={"hours": 24, "city": "Recife"}, task_id=task_id
+        )
+
+        self.assertEqual(
+            insight_jobs.progress_events(task_id)[-1],
+            {
+                "event": "skipped",
+                "data": {"reason": "duplicada", "task_id": "outra-task"},
+            },
+        )
+        # novos pedidos acompanham a execução que de fato gera o insight
+        response = self.client.post(self.url, {"hours": 24, "city": "Recife"}) # noqa E501
+        self.assertEqual(response.data["task_id"], "outra-task")
+        self.assertTrue(response.data["deduplicated"])
+        self.assertEqual(self.apply_async.call_count, 1)
+
+        # quando ela termina, o registro é liberado
+        insight_jobs.finish_run(key, "outra-task", None)
+        response = self.client.post(self.url, {"hours": 24, "city": "Recife"}) # noqa E501
+        self.assertFalse(response.data["deduplicated"])
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_insight_recente_nao_libera_execucao_alheia(self):
+        key = insight_jobs.insight_key(24, "Recife")
+        self.assertTrue(insight_jobs.acquire_run(key, "outra-task"))
+        insight = WeatherInsight.objects.create(text="ok", city="Recife", hours=24) # noqa E501
+        insight_jobs.mark_done(key, insight.id)
+
+        result = generate_insights_task.apply(
+            kwargs={"hours": 24, "city": "Recife"}
+        )
+
+        self.assertEqual(result.result, insight.id)
+        # a execução da outra task continua registrada
+        self.assertFalse(insight_jobs.acquire_run(key, "terceira-task"))
+
+        insight_jobs.finish_run(key, "terceira-task", None)
+        self.assertFalse(insight_jobs.acquire_run(key, "terceira-task"))
+        insight_jobs.finish_run(key, "outra-task", None)
+        self.assertTrue(insight_jobs.acquire_run(key, "terceira-task"))
+
+
+@override_settings(OPENAI_CONFIG={"api_key": "chave", "model": "gpt-4.1-mini"}) # noqa E501
+class InsightFingerprintTest(TestCase):
+
+    def setUp(self):
+        self.log = WeatherLog.objects.create(
+            timestamp=timezone.now(),
+            city="Recife",
+            temperature=28,
+            humidity=70,
+            pressure=1010,
+            wind_speed=3.5,
+            condition="nublado",
+            raw={"name": "Recife"},
+        )
+        llm.breaker.reset()
+        patcher = mock.patch.object(llm, "get_openai_client")
+        self.openai = patcher.start()
+        self.addCleanup(patcher.stop)
+        create = self.openai.return_value.chat.completions.create
+        create.return_value.choices = [
+            mock.Mock(message=mock.Mock(content="Tempo abafado em Recife."))
+        ]
+
+    def _run_task(self):
+        cache.clear()
+        insight_id = generate_insights_task.apply(
+            kwargs={"hours": 24, "city": "Recife"}
+        ).result
+        return WeatherInsight.objects.get(pk=insight_id)
+
+    def test_dados_iguais_reaproveitam_o_texto(self):
+        first = self._run_task()
+        second = self._run_task()
+
+        self.assertEqual(first.city, "Recife")
+        self.assertEqual(first.hours, 24)
+        self.assertEqual(len(first.fingerprint), 64)
+        self.assertEqual(second.fingerprint, first.fingerprint)
+        self.assertEqual(second.text, "Tempo abafado em Recife.")
+        self.assertEqual(self.openai.return_value.chat.completions.create.call_count, 1) # noqa E501
+
+    def test_dados_novos_chamam_a_ia(self):
+        first = self._run_task()
+        WeatherLog.objects.create(
+            timestamp=timezone.now(),
+            city="Recife",
+            temperature=31,
+            humidity=60,
+            pressure=1009,
+            wind_speed=2.0,
+            condition="céu limpo",
+            raw={"name": "Recife"},
+        )
+        second = self._run_task()
+
+        self.assertNotEqual(second.fingerprint, first.fingerprint)
+        self.assertEqual(self.openai.return_value.chat.completions.create.call_count, 2) # noqa E501
+
+    def test_falha_da_ia_nao_gera_fingerprint(self):
+        self.openai.return_value.chat.completions.create.side_effect = RuntimeError # noqa E501
+
+        insight = self._run_task()
+
+        self.assertEqual(insight.fingerprint, "")
+        self.assertIn("Não foi possível gerar insight via IA", insight.text)
+
+    def test_circuito_aberto_usa_insight_numerico(self):
+        for _ in range(llm.breaker.failure_threshold):
+            llm.breaker.record_failure()
+        self.addCleanup(llm.breaker.reset)
+
+        insight = self._run_task()
+
+        self.assertIn("Temperatura média: 28.0°C", insight.text)
+        self.openai.return_value.chat.completions.create.assert_not_called()
+
+
+class LatestInsightByCityTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=user)
+        self.url = reverse("weather-logs-insights-latest")
+        WeatherInsight.objects.create(text="Recife 24h", city="Recife", hours=24) # noqa E501
+        WeatherInsight.objects.create(text="Natal 24h", city="Natal", hours=24) # noqa E501
+        WeatherInsight.objects.create(text="Geral", hours=24)
+
+    def test_latest_por_cidade(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"city": " RECIFE "})
+
+        self.assertEqual(response.data["text"], "Recife 24h")
+        self.assertEqual(response.data["city"], "Recife")
+        self.assertNotIn("fingerprint", response.data)
+
+        response = self.client.get(self.url, {"city": "Recife", "hours": 48})
+        self.assertEqual(response.status_code, 204)
+
+    def test_latest_sem_cidade_e_o_geral(self):
+        # insight de cidade gerado depois do geral não o substitui
+        WeatherInsight.objects.create(text="Manaus 24h", city="Manaus", hours=24) # noqa E501
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data["text"], "Geral")
+        self.assertEqual(response.data["city"], "")
+
+
+@override_settings(
+    OPENAI_CONFIG={"api_key": "chave", "model": "gpt-4.1-mini", "max_retries": 0}, # noqa E501
+    INSIGHTS_CONFIG={"freshness_seconds": 300, "lock_timeout": 600},
+)
+class CityInsightsBatchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        llm.breaker.reset()
+        self.addCleanup(llm.breaker.reset)
+        now = timezone.now()
+        for i, city in enumerate(["Recife", "Natal", "Belém"]):
+            for h in range(3):
+                WeatherLog.objects.create(
+                    timestamp=now - timedelta(hours=h),
+                    city=city,
+                    temperature=25 + i + h,
+                    humidity=60,
+                    pressure=1010,
+                    wind_speed=3.0,
+                    condition="nublado",
+                    raw={"name": city},
+                )
+        patcher = mock.patch.object(llm, "get_openai_client")
+        self.create = patcher.start().return_value.chat.completions.create
+        self.addCleanup(patcher.stop)
+
+        def complete(**kwargs):
+            prompt = kwargs["messages"][-1]["content"]
+            city = prompt.split("A cidade foco é: ")[1].split(".")[0]
+            if city == "Natal":
+                raise RuntimeError("boom")
+            return mock.Mock(
+                choices=[mock.Mock(message=mock.Mock(content=f"IA {city}"))]
+            )
+
+        self.create.side_effect = complete
+
+    def test_consultas_nao_crescem_com_as_cidades(self):
+        with self.assertLogs("apps.weather.services.insights", "ERROR"):
+            with self.assertNumQueries(4):
+                insights = generate_insights_for_cities(hours=24)
+
+        texts = {insight.city: insight.text for insight in insights}
+        self.assertEqual(texts["Recife"], "IA Recife")
+        self.assertEqual(texts["Belém"], "IA Belém")
+        self.assertIn("Não foi possível gerar insight via IA", texts["Natal"]) # noqa E501
+        self.assertEqual(self.create.call_count, 3)
+
+        stored = WeatherInsight.objects.get(city_key="recife")
+        self.assertEqual(stored.hours, 24)
+        self.assertEqual(len(stored.fingerprint), 64)
+        self.assertEqual(WeatherInsight.objects.get(city_key="natal").fingerprint, "") # noqa E501
+        # mesmo fingerprint do insight por cidade e registrado como recente
+        self.assertTrue(generate_insight(hours=24, city="Recife")["reused"])
+        self.assertEqual(
+            insight_jobs.fresh_insight(insight_jobs.insight_key(24, "recife")),
+            stored,
+        )
+
+    def test_lote_reaproveita_textos(self):
+        with self.assertLogs("apps.weather.services.insights", "ERROR"):
+            generate_insights_for_cities(hours=24, cities=["Recife"])
+            generate_insights_for_cities(hours=24, cities=["recife", "Natal"]) # noqa E501
+
+        self.assertEqual(self.create.call_count, 2)
+        self.assertEqual(
+            WeatherInsight.objects.filter(city_key="recife", text="IA Recife").count(), # noqa E501
+            2,
+        )
+
+    def test_task_usa_cidades_cadastradas(self):
+        TrackedCity.objects.create(name="Recife")
+        TrackedCity.objects.create(name="Belém", active=False)
+
+        result = generate_city_insights_task.apply(kwargs={"hours": 24})
+
+        self.assertEqual(result.result, 1)
+        self.assertEqual(
+            list(WeatherInsight.objects.values_list("city", flat=True)),
+            ["Recife"],
+        )
@@ -0,0 +1,139 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.weather.models import TrackedCity, WeatherLog
+from apps.weather.services import latest
+from apps.weather.services.ingest import ingest_rows
+
+User = get_user_model()
+
+
+def reading(city: str, hours_ago: float = 0, temperature: float = 25.0):
+    return {
+        "timestamp": (timezone.now() - timedelta(hours=hours_ago)).isoformat(), # noqa E501
+        "city": city,
+        "temperature": temperature,
+        "humidity": 70,
+        "pressure": 1012,
+        "wind_speed": 3.0,
+        "condition": "nublado",
+        "raw": {"name": city},
+    }
+
+
+class LatestByCityTest(TestCase):
+
+    def setUp(self):
+        latest._latest.clear()
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create_superuser(
+            username="admin",
+            email="admin@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=user)
+        self.url = reverse("weather-logs-latest-by-city")
+
+    def test_ingestao_atualiza_o_cache(self):
+        ingest_rows(
+            [
+                reading("Recife", hours_ago=2, temperature=24),
+                reading("Recife", hours_ago=1, temperature=26),
+                reading("Natal", hours_ago=3, temperature=29),
+            ]
+        )
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"city": "natal, RECIFE"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r["city"], r["temperature"]) for r in response.data["results"]],
+            [("Natal", 29), ("Recife", 26)],
+        )
+        self.assertEqual(response.data["missing"], [])
+
+    def test_dados_antigos_nao_sobrescrevem(self):
+        ingest_rows([reading("Recife", hours_ago=1, temperature=26)])
+        ingest_rows([reading("Recife", hours_ago=48, temperature=18)])
+
+        rows = latest.latest_for_cities(["recife"])
+
+        self.assertEqual(rows["recife"]["temperature"], 26)
+
+    def test_cache_frio_consulta_por_cidade(self):
+        ingest_rows([reading("Recife"), reading("Natal", hours_ago=1)])
+        latest._latest.clear()
+        cache.clear()
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                self.url, {"city": "Recife,Natal,Cidade Vazia"}
+            )
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["missing"], ["cidade vazia"])
+
+        # agora em cache: só a cidade sem registros vai ao banco
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {"city": "Recife,Natal,Cidade Vazia"})
+
+    def test_tier_compartilhado(self):
+        ingest_rows([reading("Recife")])
+        # outro processo: memória vazia, mas o cache compartilhado tem o log
+        latest._latest.clear()
+
+        with self.assertNumQueries(0):
+            rows = latest.latest_for_cities(["recife"])
+        self.assertEqual(rows["recife"]["city"], "Recife")
+
+    @override_settings(LATEST_CACHE_CONFIG={"shared": False})
+    def test_sem_tier_compartilhado(self):
+        ingest_rows([reading("Recife")])
+        self.assertIsNone(cache.get("weather:latest:recife"))
+
+        latest._latest.clear()
+        with self.assertNumQueries(1):
+            rows = latest.latest_for_cities(["recife"])
+        self.assertEqual(rows["recife"]["city"], "Recife")
+
+    def test_padrao_usa_cidades_acompanhadas(self):
+        TrackedCity.objects.create(name="Recife")
+        TrackedCity.objects.create(name="Manaus")
+        TrackedCity.objects.create(name="Natal", active=False)
+        ingest_rows([reading("Recife"), reading("Natal")])
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            [r["city"] for r in response.data["results"]], ["Recife"]
+        )
+        self.assertEqual(response.data["missing"], ["manaus"])
+
+    def test_post_e_retencao_atualizam_o_cache(self):
+        response = self.client.post(
+            reverse("weather-logs-list"),
+            reading("Recife", temperature=31),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            latest.latest_for_cities(["recife"])["recife"]["id"],
+            response.data["id"],
+        )
+
+        WeatherLog.objects.all().delete()
+        latest.forget_latest(["recife"])
+        self.assertEqual(latest.latest_for_cities(["recife"]), {})
+
+    def test_limite_de_cidades(self):
+        cities = ",".join(f"Cidade {i}" for i in range(101))
+
+        response = self.client.get(self.url, {"city": cities})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
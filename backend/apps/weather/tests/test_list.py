@@ -0,0 +1,166 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.weather.models import WeatherLog
+
+User = get_user_model()
+
+
+class WeatherLogListTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("weather-logs-list")
+
+        now = timezone.now()
+        WeatherLog.objects.bulk_create(
+            [
+                WeatherLog(
+                    timestamp=now - timedelta(hours=i),
+                    city="Natal",
+                    city_key="natal",
+                    temperature=25 + i,
+                    humidity=70,
+                    pressure=1011,
+                    wind_speed=5,
+                    condition="céu limpo",
+                    raw={"name": "Natal", "main": {"temp": 25 + i}},
+                )
+                for i in range(25)
+            ]
+        )
+
+    def test_paginacao_limit_offset_padrao(self):
+        response = self.client.get(self.url, {"limit": 10, "offset": 20})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertIsNone(response.data["next"])
+
+    def test_sem_total_nao_executa_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                self.url, {"limit": 10, "offset": 10, "count": "false"}
+            )
+
+        self.assertIsNone(response.data["count"])
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIn("offset=20", response.data["next"])
+        self.assertFalse(
+            any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries)
+        )
+
+    def test_paginacao_por_cursor(self):
+        # empates de timestamp atravessando as bordas das páginas
+        tied = WeatherLog.objects.order_by("timestamp")[12].timestamp
+        WeatherLog.objects.bulk_create(
+            [
+                WeatherLog(
+                    timestamp=tied,
+                    city="Recife",
+                    city_key="recife",
+                    temperature=20,
+                    humidity=70,
+                    pressure=1011,
+                    wind_speed=5,
+                    condition="nublado",
+                )
+                for _ in range(14)
+            ]
+        )
+
+        pages = []
+        params = {"pagination": "cursor", "limit": 10}
+        url = self.url
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            # keyset de verdade: nenhum OFFSET para resolver os empates
+            self.assertFalse(
+                any("OFFSET" in q["sql"].upper() for q in ctx.captured_queries) # noqa E501
+            )
+            pages.append((response.data["previous"], [log["id"] for log in response.data["results"]])) # noqa E501
+            url, params = response.data["next"], None
+
+        expected = list(
+            WeatherLog.objects.order_by("-timestamp", "-id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual([i for _, ids in pages for i in ids], expected)
+
+        # voltando pelos links `previous` as páginas se repetem
+        for (previous, _), (_, ids) in zip(pages[1:], pages):
+            response = self.client.get(previous)
+            self.assertEqual([log["id"] for log in response.data["results"]], ids) # noqa E501
+
+    def test_cursor_com_timestamps_empatados(self):
+        # 30 logs em grupos de 3 com o mesmo timestamp (como no seed)
+        base = timezone.now() - timedelta(days=2)
+        WeatherLog.objects.bulk_create(
+            [
+                WeatherLog(
+                    timestamp=base - timedelta(hours=i // 3),
+                    city=city,
+                    city_key=city.lower(),
+                    temperature=20,
+                    humidity=70,
+                    pressure=1011,
+                    wind_speed=5,
+                    condition="nublado",
+                )
+                for i, city in enumerate(["Recife", "Natal", "Belém"] * 10)
+            ]
+        )
+
+        for include in ("", "raw"):
+            seen = []
+            params = {"pagination": "cursor", "limit": 2, "include": include}
+            url = self.url
+            while url:
+                response = self.client.get(url, params)
+                seen.extend(log["id"] for log in response.data["results"])
+                url, params = response.data["next"], None
+
+            self.assertEqual(len(seen), 55, include)
+            self.assertEqual(
+                sorted(seen),
+                sorted(WeatherLog.objects.values_list("id", flat=True)),
+            )
+
+    def test_listagem_enxuta_sem_raw(self):
+        response = self.client.get(self.url, {"limit": 5})
+
+        row = response.data["results"][0]
+        self.assertNotIn("raw", row)
+        self.assertNotIn("city_key", row)
+        self.assertEqual(row["city"], "Natal")
+        self.assertEqual(row["temperature"], 25)
+
+        # mesmo formato de datas do serializer completo
+        full = self.client.get(self.url, {"limit": 5, "include": "raw"})
+        full_row = full.data["results"][0]
+        self.assertEqual(full_row["raw"]["name"], "Natal")
+        self.assertEqual(full_row["timestamp"], row["timestamp"])
+        self.assertEqual(full_row["created_at"], row["created_at"])
+
+    def test_listagem_enxuta_nao_le_raw_do_banco(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, {"limit": 5})
+
+        select = ctx.captured_queries[-1]["sql"]
+        self.assertNotIn('"raw"', select)
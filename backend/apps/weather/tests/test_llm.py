@@ -0,0 +1,167 @@
+import threading
+from unittest import mock
+import httpx
+import openai
+from django.test import SimpleTestCase, override_settings
+from apps.weather.services import llm
+
+CONFIG = {
+    "api_key": "chave",
+    "model": "gpt-4.1-mini",
+    "timeout": 20,
+    "connect_timeout": 3,
+    "max_retries": 2,
+    "backoff": 0.01,
+    "max_concurrency": 1,
+    "queue_timeout": 0.05,
+}
+
+
+def _completion(text):
+    return mock.Mock(choices=[mock.Mock(message=mock.Mock(content=text))])
+
+
+def _timeout_error():
+    return openai.APITimeoutError(
+        request=httpx.Request("POST", "https://api.openai.com")
+    )
+
+
+def _status_error(cls, status_code):
+    request = httpx.Request("POST", "https://api.openai.com")
+    return cls(
+        f"HTTP {status_code}",
+        response=httpx.Response(status_code, request=request),
+        body=None,
+    )
+
+
+@override_settings(OPENAI_CONFIG=CONFIG)
+class OpenAIClientTest(SimpleTestCase):
+
+    def setUp(self):
+        llm._client = None
+        self.addCleanup(setattr, llm, "_client", None)
+
+    def test_cliente_unico_com_timeouts(self):
+        first = llm.get_openai_client()
+        second = llm.get_openai_client()
+
+        self.assertIs(first, second)
+        self.assertEqual(first.timeout.read, 20)
+        self.assertEqual(first.timeout.connect, 3)
+        self.assertEqual(first.max_retries, 0)
+
+    def test_troca_de_chave_recria_o_cliente(self):
+        first = llm.get_openai_client()
+        with self.settings(OPENAI_CONFIG={**CONFIG, "api_key": "outra"}):
+            self.assertIsNot(llm.get_openai_client(), first)
+
+
+@override_settings(OPENAI_CONFIG=CONFIG)
+class ChatCompletionTest(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = mock.patch.object(
+            llm, "breaker", llm.CircuitBreaker(failure_threshold=2, reset_timeout=60) # noqa E501
+        )
+        self.breaker.start()
+        self.addCleanup(self.breaker.stop)
+        patcher = mock.patch.object(llm, "get_openai_client")
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.create = self.client.chat.completions.create
+        sleep = mock.patch.object(llm.time, "sleep")
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_retry_com_backoff(self):
+        self.create.side_effect = [_timeout_error(), _completion(" ok ")]
+
+        self.assertEqual(llm.chat_completion(model="m", messages=[]), "ok")
+        self.assertEqual(self.create.call_count, 2)
+        self.assertEqual(self.sleep.call_count, 1)
+
+    def test_retries_limitados(self):
+        self.create.side_effect = _timeout_error()
+
+        with self.assertRaises(openai.APITimeoutError):
+            llm.chat_completion(model="m", messages=[])
+        self.assertEqual(self.create.call_count, 3)
+
+    def test_circuito_abre_e_falha_na_hora(self):
+        self.create.side_effect = _status_error(openai.APIStatusError, 502)
+        for _ in range(2):
+            with self.assertRaises(openai.APIStatusError):
+                llm.chat_completion(model="m", messages=[])
+
+        self.assertEqual(llm.breaker.state, llm.CircuitBreaker.OPEN)
+        with self.assertRaises(llm.LLMUnavailable):
+            llm.chat_completion(model="m", messages=[])
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_erro_4xx_nao_conta_para_o_circuito(self):
+        for error in (
+            _status_error(openai.BadRequestError, 400),
+            _status_error(openai.AuthenticationError, 401),
+            _status_error(openai.NotFoundError, 404),
+        ):
+            self.create.side_effect = error
+            with self.assertRaises(type(error)):
+                llm.chat_completion(model="m", messages=[])
+
+        # sem retry e o circuito continua fechado
+        self.assertEqual(self.create.call_count, 3)
+        self.assertEqual(llm.breaker.state, llm.CircuitBreaker.CLOSED)
+        self.assertEqual(llm.breaker._failures, 0)
+
+    def test_erro_4xx_no_meio_aberto_libera_a_chamada_de_teste(self):
+        breaker = llm.breaker
+        breaker.reset_timeout = 0
+        breaker.record_failure()
+        breaker.record_failure()
+        self.create.side_effect = _status_error(openai.BadRequestError, 400)
+
+        with self.assertRaises(openai.BadRequestError):
+            llm.chat_completion(model="m", messages=[])
+
+        self.assertEqual(breaker._failures, 2)
+        self.assertEqual(breaker.state, llm.CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_meio_aberto_fecha_apos_sucesso(self):
+        breaker = llm.breaker
+        breaker.reset_timeout = 0
+        breaker.record_failure()
+        breaker.record_failure()
+        self.create.side_effect = None
+        self.create.return_value = _completion("voltou")
+
+        self.assertEqual(breaker.state, llm.CircuitBreaker.HALF_OPEN)
+        self.assertEqual(llm.chat_completion(model="m", messages=[]), "voltou") # noqa E501
+        self.assertEqual(breaker.state, llm.CircuitBreaker.CLOSED)
+
+    def test_limite_de_concorrencia(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow(**kwargs):
+            started.set()
+            release.wait(2)
+            return _completion("lento")
+
+        self.create.side_effect = slow
+        llm._semaphore = None
+        self.addCleanup(setattr, llm, "_semaphore", None)
+        worker = threading.Thread(
+            target=llm.chat_completion, kwargs={"model": "m", "messages": []}
+        )
+        worker.start()
+        started.wait(2)
+        try:
+            with self.assertRaises(llm.LLMUnavailable):
+                llm.chat_completion(model="m", messages=[])
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(self.create.call_count, 1)
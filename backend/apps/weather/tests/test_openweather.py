@@ -0,0 +1,202 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from apps.weather.models import (
+    GeocodedCity,
+    TrackedCity,
+    WeatherLog,
+    WeatherRollup,
+)
+from apps.weather.services import openweather
+
+
+class FakeResponse:
+
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """Simula a OpenWeather: geocoding e clima atual por lat/lon."""
+
+    COORDS = {"Recife": (-8.05, -34.9), "Manaus": (-3.1, -60.0)}
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, dict(params)))
+        if "geo" in url:
+            name = params["q"].split(",")[0]
+            if name not in self.COORDS:
+                return FakeResponse([])
+            lat, lon = self.COORDS[name]
+            return FakeResponse([{"lat": lat, "lon": lon, "name": name}])
+
+        if params["lat"] == 0:
+            return FakeResponse({}, status_code=503)
+        return FakeResponse(
+            {
+                "name": f"lat {params['lat']}",
+                "main": {"temp": 28.0, "humidity": 75, "pressure": 1012},
+                "wind": {"speed": 3.0},
+                "weather": [{"description": "nublado"}],
+            }
+        )
+
+
+class CollectWeatherForCitiesTest(TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        patcher = mock.patch.object(
+            openweather, "get_session", return_value=self.session
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_coleta_em_lote(self):
+        TrackedCity.objects.create(name="Recife")
+        TrackedCity.objects.create(name="Manaus", lat=-3.1, lon=-60.0)
+        TrackedCity.objects.create(name="Quebrada", lat=0, lon=0)
+
+        logs, failures = openweather.collect_weather_for_cities(
+            TrackedCity.objects.all()
+        )
+
+        self.assertEqual(len(logs), 2)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0].name, "Quebrada")
+        self.assertEqual(
+            set(WeatherLog.objects.values_list("city_key", flat=True)),
+            {"recife", "manaus"},
+        )
+        # coordenadas geocodificadas ficam salvas para a próxima coleta
+        recife = TrackedCity.objects.get(name="Recife")
+        self.assertEqual((recife.lat, recife.lon), (-8.05, -34.9))
+        self.assertEqual(
+            WeatherRollup.objects.filter(granularity="hour").count(), 2
+        )
+
+    def test_lista_vazia(self):
+        self.assertEqual(
+            openweather.collect_weather_for_cities([]), ([], [])
+        )
+        self.assertEqual(self.session.calls, [])
+
+
+class GeocodeCacheTest(TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        patcher = mock.patch.object(
+            openweather, "get_session", return_value=self.session
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        openweather._geocode_cache.clear()
+
+    def _geocode_calls(self):
+        return [c for c in self.session.calls if "geo" in c[0]]
+
+    def test_consultas_repetidas_nao_chamam_a_api(self):
+        first = openweather.geocode_city("Recife")
+        second = openweather.geocode_city("  RECIFE ", country_code="br")
+
+        self.assertEqual(first, (-8.05, -34.9, "Recife"))
+        self.assertEqual(second, first)
+        self.assertEqual(len(self._geocode_calls()), 1)
+        self.assertEqual(openweather.geocode_cache_info()["memory_hits"], 1)
+
+    def test_contadores_entre_threads(self):
+        before = openweather.geocode_cache_info()["db_hits"]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(openweather.count_geocode, ["db_hits"] * 4000))
+
+        self.assertEqual(
+            openweather.geocode_cache_info()["db_hits"], before + 4000
+        )
+
+    def test_tier_persistente(self):
+        openweather.geocode_city("Manaus")
+        openweather._geocode_cache.clear()
+
+        self.assertEqual(openweather.geocode_city("Manaus")[2], "Manaus")
+        self.assertEqual(len(self._geocode_calls()), 1)
+
+    def test_cache_negativo(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                openweather.geocode_city("Atlântida")
+
+        self.assertEqual(len(self._geocode_calls()), 1)
+        self.assertFalse(GeocodedCity.objects.get(city_key="atlântida").found) # noqa E501
+
+
+@override_settings(
+    OPENWEATHER_CONFIG={
+        **settings.OPENWEATHER_CONFIG,
+        "cache_ttl": 300,
+        "cache_precision": 2,
+    }
+)
+class CurrentWeatherCacheTest(TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        patcher = mock.patch.object(
+            openweather, "get_session", return_value=self.session
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+    def _weather_calls(self):
+        return [c for c in self.session.calls if "geo" not in c[0]]
+
+    def test_coordenadas_proximas_usam_o_cache(self):
+        first = openweather.fetch_current_weather(lat=-8.0501, lon=-34.9)
+        second = openweather.fetch_current_weather(lat=-8.0499, lon=-34.9)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self._weather_calls()), 1)
+
+    def test_requisicoes_concorrentes_compartilham_a_chamada(self):
+        original_get = self.session.get
+
+        def slow_get(*args, **kwargs):
+            time.sleep(0.2)
+            return original_get(*args, **kwargs)
+
+        self.session.get = slow_get
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(
+                pool.map(
+                    lambda _: openweather.fetch_current_weather(
+                        lat=-3.1, lon=-60.0
+                    ),
+                    range(8),
+                )
+            )
+
+        self.assertEqual(len(self._weather_calls()), 1)
+        self.assertTrue(all(r == results[0] for r in results))
+
+    def test_fetch_repetido_nao_duplica_log(self):
+        first = openweather.store_current_weather(lat=-3.1, lon=-60.0)
+        second = openweather.store_current_weather(lat=-3.1, lon=-60.0)
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(WeatherLog.objects.count(), 1)
@@ -0,0 +1,194 @@
+import asyncio
+from io import StringIO
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.weather.models import WeatherLog
+from core.profiling import ProfilingMiddleware, QueryCounter, registry
+from core.testing import QueryAssertionsMixin
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTest(QueryAssertionsMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+            is_superuser=True,
+        )
+        WeatherLog.objects.create(
+            timestamp=timezone.now(),
+            city="Natal",
+            temperature=25,
+            humidity=70,
+            pressure=1011,
+            wind_speed=5,
+            condition="céu limpo",
+            raw={"name": "Natal"},
+        )
+        registry.clear()
+        # `response.close()` fora do test client dispara request_finished,
+        # que fecharia a conexão da transação do teste
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+
+    def _get(self, url, **params):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        return client.get(url, params)
+
+    def test_desligado_por_padrao(self):
+        response = self._get(reverse("weather-logs-list"))
+
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertEqual(self._get(reverse("metrics")).status_code, 404)
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_server_timing_e_metricas(self):
+        with self.assertLogs("core.profiling", level="INFO") as logs:
+            response = self._get(reverse("weather-logs-list"), limit=5)
+
+        timing = response["Server-Timing"]
+        self.assertIn('desc="2 queries"', timing)
+        for name in ("db;dur=", "serialize;dur=", "render;dur=", "total;dur="): # noqa E501
+            self.assertIn(name, timing)
+        self.assertIn('"queries": 2', logs.output[0])
+
+        metrics = self._get(reverse("metrics"))
+        body = metrics.content.decode()
+        self.assertEqual(metrics.status_code, 200)
+        self.assertIn(
+            'http_request_db_queries_count{method="GET",route="api/v1/weather/logs/"} 1', # noqa E501
+            body,
+        )
+        self.assertIn(
+            'http_request_db_queries_bucket{method="GET",route="api/v1/weather/logs/",le="2"} 1', # noqa E501
+            body,
+        )
+        # contadores do geocoding, registrados pelo app weather
+        self.assertIn("# TYPE weather_geocode_remote_calls_total counter", body) # noqa E501
+        self.assertRegex(body, r"\nweather_geocode_memory_size \d+\n")
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_streaming_registrado_ao_fim_do_stream(self):
+        response = self._get(reverse("weather-logs-export-csv"))
+
+        self.assertIn("Server-Timing", response)
+        # nada registrado antes de o corpo ser gerado
+        self.assertNotIn("http_request_db_queries_count", registry.render())
+
+        with self.assertLogs("core.profiling", level="INFO") as logs:
+            body = b"".join(response.streaming_content)
+            response.close()
+
+        self.assertIn(b"Natal", body)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('"streaming": true', logs.output[0])
+        # a query das linhas roda durante o stream e entra na contagem
+        self.assertRegex(
+            registry.render(),
+            r'http_request_db_queries_sum\{method="GET",route="[^"]*export[^"]*"\} [1-9]', # noqa E501
+        )
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_middleware_assincrono(self):
+        def chunks():
+            yield b"a"
+            WeatherLog.objects.count()
+            yield b"b"
+
+        async def stream():
+            yield b"x"
+
+        async def get_response(request):
+            if request.path == "/sync-stream/":
+                return StreamingHttpResponse(chunks())
+            if request.path == "/async-stream/":
+                return StreamingHttpResponse(stream())
+            return HttpResponse("ok")
+
+        middleware = ProfilingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = RequestFactory()
+
+        async def call(path):
+            response = await middleware(factory.get(path))
+            if response.streaming and response.is_async:
+                body = b"".join([part async for part in response])
+            elif response.streaming:
+                body = b"".join(response.streaming_content)
+            else:
+                body = response.content
+            response.close()
+            return response, body
+
+        with self.assertLogs("core.profiling", level="INFO") as logs:
+            response, body = asyncio.run(call("/"))
+            self.assertEqual(body, b"ok")
+            self.assertIn("total;dur=", response["Server-Timing"])
+
+            response, body = asyncio.run(call("/async-stream/"))
+            self.assertEqual(body, b"x")
+
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('"streaming": true', logs.output[1])
+
+        # stream síncrono: a query do corpo é contada no fim
+        with self.assertLogs("core.profiling", level="INFO") as logs:
+            middleware = ProfilingMiddleware(lambda request: StreamingHttpResponse(chunks())) # noqa E501
+            response = middleware(factory.get("/sync-stream/"))
+            self.assertEqual(b"".join(response.streaming_content), b"ab")
+            response.close()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('"queries": 1', logs.output[0])
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_stream_fechado_sem_consumo_registra_uma_vez(self):
+        middleware = ProfilingMiddleware(
+            lambda request: StreamingHttpResponse(iter([b"a", b"b"]))
+        )
+
+        with self.assertLogs("core.profiling", level="INFO") as logs:
+            response = middleware(RequestFactory().get("/"))
+            response.close()
+            response.close()
+
+        self.assertEqual(len(logs.output), 1)
+
+    def test_query_counter_detecta_repeticao(self):
+        with QueryCounter() as counter:
+            for log in WeatherLog.objects.all():
+                WeatherLog.objects.filter(pk=log.pk).exists()
+                WeatherLog.objects.filter(pk=log.pk + 1).exists()
+
+        self.assertEqual(counter.count, 3)
+        self.assertEqual(list(counter.duplicates().values()), [2])
+
+    def test_helper_de_asserção(self):
+        with self.assertRaises(AssertionError):
+            with self.assertMaxQueries(1):
+                self._get(reverse("weather-logs-list"))
+
+        with self.assertMaxQueries(2), self.assertNoDuplicateQueries():
+            self._get(reverse("weather-logs-list"))
+
+    def test_comando_profile_endpoint(self):
+        out = StringIO()
+        call_command(
+            "profile_endpoint", "/api/v1/weather/logs/?limit=5",
+            repeat=2, stdout=out,
+        )
+
+        self.assertIn("-> 200", out.getvalue())
+        self.assertIn("queries: 2", out.getvalue())
+        self.assertIn("Server-Timing: db;dur=", out.getvalue())
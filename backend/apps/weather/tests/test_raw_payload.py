@@ -0,0 +1,173 @@
+import zlib
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.weather.models import RawPayload, WeatherLog
+from apps.weather.services.ingest import ingest_rows
+
+User = get_user_model()
+
+RAW = {
+    "name": "Recife",
+    "main": {"temp": 28.4, "humidity": 70},
+    "weather": [{"description": "céu limpo"}],
+}
+
+
+def make_log(raw=RAW, **overrides):
+    data = {
+        "timestamp": timezone.now(),
+        "city": "Recife",
+        "temperature": 28.4,
+        "humidity": 70,
+        "pressure": 1012,
+        "wind_speed": 4.1,
+        "condition": "céu limpo",
+        "raw": raw,
+    }
+    data.update(overrides)
+    return WeatherLog(**data)
+
+
+class RawPayloadTest(TestCase):
+
+    def test_comprime_e_le_de_volta(self):
+        log = make_log()
+        log.save()
+
+        payload = RawPayload.objects.get()
+        self.assertEqual(payload.encoding, RawPayload.Encoding.ZLIB)
+        self.assertEqual(payload.size, len(zlib.decompress(bytes(payload.data)))) # noqa E501
+        self.assertEqual(
+            zlib.decompress(bytes(payload.data)).decode(),
+            '{"main":{"humidity":70,"temp":28.4},"name":"Recife","weather":[{"description":"céu limpo"}]}', # noqa E501
+        )
+        self.assertEqual(WeatherLog.objects.get(pk=log.pk).raw, RAW)
+
+    def test_payload_grande_fica_menor(self):
+        forecast = {"list": [RAW] * 40}
+        make_log(raw=forecast).save()
+
+        payload = RawPayload.objects.get()
+        self.assertLess(len(bytes(payload.data)), payload.size / 5)
+        self.assertEqual(payload.decode(), forecast)
+
+    def test_payloads_iguais_sao_deduplicados(self):
+        make_log().save()
+        # mesma estrutura em outra ordem de chaves: mesmo digest
+        make_log(raw=dict(reversed(list(RAW.items())))).save()
+        make_log(raw={"name": "Natal"}).save()
+
+        self.assertEqual(WeatherLog.objects.count(), 3)
+        self.assertEqual(RawPayload.objects.count(), 2)
+
+    def test_bulk_create_grava_payloads_em_lote(self):
+        logs = [make_log(raw={"name": "Recife", "i": i % 3}) for i in range(9)]
+        logs.append(make_log(raw=None))
+
+        # busca + insert + nova busca dos payloads e o insert dos logs
+        with self.assertNumQueries(4):
+            WeatherLog.objects.bulk_create(logs)
+
+        self.assertEqual(RawPayload.objects.count(), 3)
+        self.assertEqual(
+            WeatherLog.objects.filter(raw_payload__isnull=True).count(), 1
+        )
+        self.assertEqual(
+            sorted(log.raw["i"] for log in WeatherLog.objects.exclude(raw_payload=None)), # noqa E501
+            [0, 0, 0, 1, 1, 1, 2, 2, 2],
+        )
+
+    def test_update_fields_raw(self):
+        log = make_log()
+        log.save()
+
+        log.raw = {"name": "Recife", "main": {"temp": 30}}
+        log.save(update_fields=["raw"])
+
+        self.assertEqual(
+            WeatherLog.objects.get(pk=log.pk).raw["main"], {"temp": 30}
+        )
+
+    def test_ingestao_em_lote(self):
+        rows = [
+            {
+                "timestamp": "2025-11-20T12:00:00-03:00",
+                "city": "Belém",
+                "temperature": 31.5,
+                "humidity": 80,
+                "pressure": 1009,
+                "wind_speed": 2.1,
+                "condition": "chuva leve",
+                "raw": {"name": "Belém"},
+            }
+        ] * 4
+
+        result = ingest_rows(rows)
+
+        self.assertEqual(result["created"], 4)
+        self.assertEqual(RawPayload.objects.count(), 1)
+
+
+class RawPayloadApiTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_superuser(
+            username="admin",
+            email="admin@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=user)
+        self.url = reverse("weather-logs-list")
+
+    def test_cria_e_lista_com_raw(self):
+        response = self.client.post(
+            self.url,
+            {
+                "timestamp": "2025-11-20T12:00:00-03:00",
+                "city": "Recife",
+                "temperature": 28.4,
+                "humidity": 70,
+                "pressure": 1012,
+                "wind_speed": 4.1,
+                "condition": "céu limpo",
+                "raw": RAW,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["raw"], RAW)
+        self.assertNotIn("raw_payload", response.data)
+
+        make_log().save()
+        # um único SELECT com JOIN no RawPayload
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, {"include": "raw", "count": "false"}
+            )
+        results = response.data["results"]
+        self.assertEqual([row["raw"] for row in results], [RAW, RAW])
+        self.assertEqual(RawPayload.objects.count(), 1)
+
+    def test_raw_vazio_e_rejeitado(self):
+        response = self.client.post(
+            self.url,
+            {
+                "timestamp": "2025-11-20T12:00:00-03:00",
+                "city": "Recife",
+                "temperature": 28.4,
+                "humidity": 70,
+                "pressure": 1012,
+                "wind_speed": 4.1,
+                "condition": "céu limpo",
+                "raw": {},
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("raw", response.data)
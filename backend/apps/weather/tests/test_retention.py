@@ -0,0 +1,442 @@
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipIf, skipUnless
+from django.core.files.storage import default_storage
+import threading
+from django.db import OperationalError, connection, connections
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+import pyarrow.parquet as pq
+from apps.weather.models import RawPayload, WeatherLog, WeatherRollup
+from apps.weather.services import retention
+from apps.weather.services.rollups import record_rollups
+from apps.weather.tasks import apply_retention_task
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class FakeCursor:
+    """Cursor do PostgreSQL simulado: registra o SQL e devolve `results`."""
+
+    def __init__(self, partitions=(), results=()):
+        self.partitions = list(partitions)
+        self.results = list(results)
+        self.sql = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.sql.append(" ".join(sql.split()))
+
+    def fetchall(self):
+        return [(name,) for name in self.partitions]
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+
+class RetentionHelpersTest(TestCase):
+
+    def test_meses_e_nomes_de_particao(self):
+        start = retention.month_start(
+            datetime(2025, 11, 20, 2, tzinfo=dt_timezone(timedelta(hours=-3))) # noqa E501
+        )
+
+        self.assertEqual(start, datetime(2025, 11, 1, tzinfo=dt_timezone.utc)) # noqa E501
+        self.assertEqual(retention.add_months(start, 2).date().isoformat(), "2026-01-01") # noqa E501
+        self.assertEqual(retention.add_months(start, -11).date().isoformat(), "2024-12-01") # noqa E501
+        self.assertEqual(
+            retention.partition_name(start), "weather_weatherlog_p2025_11"
+        )
+
+    @skipIf(connection.vendor == "postgresql", "PostgreSQL é particionado.")
+    def test_sqlite_sem_particoes(self):
+        self.assertFalse(retention.is_partitioned())
+        self.assertEqual(retention.ensure_partitions(), [])
+
+    def test_particao_nova_recebe_linhas_da_default(self):
+        current = retention.month_start(timezone.now())
+        names = [
+            retention.partition_name(retention.add_months(current, i))
+            for i in range(3)
+        ]
+        # mês atual já existe; o próximo tem linhas na DEFAULT, o outro não
+        cursor = FakeCursor(partitions=names[:1], results=[(True,), (False,)]) # noqa E501
+        connection = mock.Mock()
+        connection.cursor.return_value = cursor
+
+        with mock.patch.object(retention, "is_partitioned", return_value=True), \
+                mock.patch.object(retention, "connection", connection): # noqa E501
+            created = retention.ensure_partitions(months_ahead=2)
+
+        self.assertEqual(created, names[1:])
+        statements = [sql.split(" (")[0] for sql in cursor.sql[1:]]
+        self.assertEqual(
+            statements,
+            [
+                "SELECT EXISTS",
+                f'CREATE TABLE "{names[1]}"',
+                'WITH moved AS',
+                f'ALTER TABLE "weather_weatherlog" ATTACH PARTITION "{names[1]}" FOR VALUES FROM', # noqa E501
+                "SELECT EXISTS",
+                f'CREATE TABLE "{names[2]}" PARTITION OF "weather_weatherlog" FOR VALUES FROM', # noqa E501
+            ],
+        )
+        self.assertIn(
+            'DELETE FROM "weather_weatherlog_default"', cursor.sql[3]
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RetentionTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.now = timezone.now()
+        current = retention.month_start(self.now)
+        self.months = [retention.add_months(current, -i) for i in (3, 2, 0)]
+        logs = []
+        for start in self.months:
+            for day in range(3):
+                logs.append(
+                    WeatherLog.objects.create(
+                        timestamp=start + timedelta(days=day, hours=1),
+                        city="Recife",
+                        temperature=20 + day,
+                        humidity=60,
+                        pressure=1010,
+                        wind_speed=3.0,
+                        condition="nublado",
+                        raw={"main": {"temp": 20 + day}},
+                    )
+                )
+        record_rollups(logs)
+
+    def test_remove_raw_antigo_em_lotes(self):
+        cutoff = self.months[2]
+        with mock.patch.object(retention, "RAW_STRIP_BATCH_SIZE", 2):
+            stripped = retention.strip_raw(cutoff)
+
+        self.assertEqual(stripped, 6)
+        self.assertEqual(
+            WeatherLog.objects.filter(timestamp__lt=cutoff, raw_payload__isnull=True).count(), # noqa E501
+            6,
+        )
+        self.assertEqual(WeatherLog.objects.filter(raw_payload__isnull=False).count(), 3) # noqa E501
+        # payloads iguais entre os meses: continuam em uso pelo mês atual
+        self.assertEqual(RawPayload.objects.count(), 3)
+        self.assertEqual(
+            sorted(WeatherLog.objects.values_list("temperature", flat=True)),
+            [20, 20, 20, 21, 21, 21, 22, 22, 22],
+        )
+
+    def test_arquiva_meses_antigos(self):
+        rollups = WeatherRollup.objects.count()
+
+        archived = retention.archive_before(retention.add_months(self.months[2], -1)) # noqa E501
+
+        self.assertEqual(
+            [item["month"] for item in archived],
+            [f"{self.months[0]:%Y-%m}", f"{self.months[1]:%Y-%m}"],
+        )
+        self.assertEqual(WeatherLog.objects.count(), 3)
+        self.assertEqual(WeatherRollup.objects.count(), rollups)
+
+        with default_storage.open(archived[0]["path"]) as fh:
+            lines = gzip.decompress(fh.read()).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(archived[0]["rows"], 3)
+        self.assertEqual([row["temperature"] for row in rows], [20, 21, 22])
+        self.assertEqual(rows[0]["raw"], {"main": {"temp": 20}})
+        self.assertEqual(rows[0]["city_key"], "recife")
+
+    def test_orfaos_respeitam_a_janela_de_uso(self):
+        retention.strip_raw(self.now + timedelta(days=1))
+        # recém-usados: ficam mesmo sem nenhum log
+        self.assertEqual(RawPayload.objects.count(), 3)
+
+        RawPayload.objects.update(used_at=self.now - timedelta(hours=2))
+        # um único DELETE, sem carregar os blobs
+        with self.assertNumQueries(1):
+            deleted = retention.delete_orphan_payloads()
+
+        self.assertEqual(deleted, 3)
+        self.assertFalse(RawPayload.objects.exists())
+
+    def test_payload_reaproveitado_nao_e_apagado(self):
+        retention.strip_raw(self.now + timedelta(days=1))
+        RawPayload.objects.update(used_at=self.now - timedelta(hours=2))
+
+        # ingestão concorrente reaproveita o digest antes de gravar o log
+        payload, = RawPayload.objects.resolve([{"main": {"temp": 20}}])
+        retention.delete_orphan_payloads()
+
+        self.assertEqual(list(RawPayload.objects.all()), [payload])
+
+    def test_payload_apagado_durante_o_resolve_e_recriado(self):
+        retention.strip_raw(self.now + timedelta(days=1))
+        RawPayload.objects.update(used_at=self.now - timedelta(hours=2))
+        old = RawPayload.objects.get(digest=RawPayload.encode({"main": {"temp": 20}})[0]) # noqa E501
+        update = QuerySet.update
+        calls = []
+
+        def delete_then_update(qs, **kwargs):
+            # a limpeza apaga o payload entre a leitura e a renovação
+            if not calls:
+                calls.append(qs)
+                retention.delete_orphan_payloads()
+            return update(qs, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", delete_then_update):
+            payload, = RawPayload.objects.resolve([{"main": {"temp": 20}}])
+
+        self.assertNotEqual(payload.pk, old.pk)
+        self.assertEqual(payload.decode(), {"main": {"temp": 20}})
+
+    @override_settings(RETENTION_CONFIG={"archive_format": "parquet"})
+    def test_arquivo_parquet(self):
+        archived = retention.archive_month(self.months[0])
+
+        self.assertTrue(archived["path"].endswith(".parquet"))
+        with default_storage.open(archived["path"]) as fh:
+            table = pq.read_table(fh)
+        self.assertEqual(archived["rows"], 3)
+        self.assertEqual(table.num_rows, 3)
+        self.assertIn("created_at", table.schema.names)
+        self.assertEqual(json.loads(table.column("raw")[0].as_py()), {"main": {"temp": 20}}) # noqa E501
+
+    def test_log_gravado_durante_o_arquivamento_fica(self):
+        write_archive = retention._write_archive
+
+        def write_and_insert(start, rows):
+            result = write_archive(start, rows)
+            WeatherLog.objects.create(
+                timestamp=start + timedelta(days=10),
+                city="Natal",
+                temperature=30,
+                humidity=60,
+                pressure=1010,
+                wind_speed=3.0,
+                condition="sol",
+            )
+            return result
+
+        with mock.patch.object(retention, "_write_archive", write_and_insert): # noqa E501
+            archived = retention.archive_month(self.months[0])
+
+        self.assertEqual(archived["rows"], 3)
+        remaining = WeatherLog.objects.filter(
+            timestamp__lt=retention.add_months(self.months[0], 1)
+        )
+        self.assertEqual([log.city for log in remaining], ["Natal"])
+
+    def test_delete_diferente_do_arquivo_desfaz(self):
+        end = retention.add_months(self.months[0], 1)
+        month = WeatherLog.objects.filter(timestamp__lt=end).order_by("id")
+        # id menor que o último do mês, confirmado depois da leitura
+        late = month[1]
+        late_id = late.id
+        late.delete()
+        write_archive = retention._write_archive
+        paths = []
+
+        def write_and_insert(start, rows):
+            path, count = write_archive(start, rows)
+            paths.append(path)
+            WeatherLog.objects.create(id=late_id, **{
+                field: getattr(late, field)
+                for field in ("timestamp", "city", "temperature", "humidity", "pressure", "wind_speed", "condition") # noqa E501
+            })
+            return path, count
+
+        with mock.patch.object(retention, "_write_archive", write_and_insert), \
+                self.assertLogs(retention.logger, "WARNING"): # noqa E501
+            archived = retention.archive_month(self.months[0])
+
+        self.assertEqual(archived, {"month": f"{self.months[0]:%Y-%m}", "path": None, "rows": 0}) # noqa E501
+        # o insert simulado roda na mesma transação e também é desfeito
+        self.assertEqual(month.count(), 2)
+        self.assertFalse(default_storage.exists(paths[0]))
+
+    @override_settings(
+        RETENTION_CONFIG={"raw_days": 0, "archive_months": 1}
+    )
+    def test_task_aplica_a_politica(self):
+        result = apply_retention_task.apply().result
+
+        self.assertEqual(result["raw_stripped"], 0)
+        self.assertEqual(len(result["archived"]), 2)
+        self.assertEqual(WeatherLog.objects.filter(raw_payload__isnull=False).count(), 3) # noqa E501
+
+    @override_settings(RETENTION_CONFIG={"raw_days": 30})
+    def test_padrao_nao_arquiva(self):
+        result = retention.apply_retention(now=self.now)
+
+        self.assertEqual(result["archived"], [])
+        self.assertEqual(result["raw_stripped"], 6)
+        self.assertEqual(WeatherLog.objects.count(), 9)
+
+
+@skipUnless(connection.vendor == "postgresql", "Particionamento só no PostgreSQL.") # noqa E501
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PostgresPartitionTest(TestCase):
+    """
+    Caminho particionado de verdade (migração 0010, DETACH, DEFAULT).
+    Roda com DB_ENGINE=postgresql, como no CI.
+    """
+
+    def setUp(self):
+        self.current = retention.month_start(timezone.now())
+
+    def _log(self, timestamp, **overrides):
+        data = {
+            "timestamp": timestamp,
+            "city": "Recife",
+            "temperature": 25,
+            "humidity": 60,
+            "pressure": 1010,
+            "wind_speed": 3.0,
+            "condition": "nublado",
+            "raw": {"name": "Recife"},
+        }
+        data.update(overrides)
+        return WeatherLog.objects.create(**data)
+
+    def _partition_of(self, log) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT tableoid::regclass::text FROM "weather_weatherlog" WHERE id = %s', # noqa E501
+                [log.id],
+            )
+            return cursor.fetchone()[0]
+
+    def _partitions(self) -> set[str]:
+        with connection.cursor() as cursor:
+            return retention._partitions(cursor)
+
+    def test_migracao_particiona_a_tabela(self):
+        self.assertTrue(retention.is_partitioned())
+        self.assertIn("weather_weatherlog_default", self._partitions())
+
+        log = self._log(self.current + timedelta(days=1))
+        self.assertEqual(
+            self._partition_of(log), retention.partition_name(self.current)
+        )
+        # id continua vindo da sequence, único entre as partições
+        other = self._log(retention.add_months(self.current, -24))
+        self.assertEqual(self._partition_of(other), "weather_weatherlog_default") # noqa E501
+        self.assertGreater(other.id, log.id)
+
+        # consulta com período só lê as partições do intervalo
+        plan = WeatherLog.objects.filter(
+            timestamp__gte=self.current + timedelta(days=1)
+        ).explain()
+        previous = retention.partition_name(retention.add_months(self.current, -1)) # noqa E501
+        self.assertIn(retention.partition_name(self.current), plan)
+        self.assertNotIn(previous, plan)
+
+    def test_particao_nova_recebe_linhas_da_default(self):
+        start = retention.add_months(self.current, 6)
+        log = self._log(start + timedelta(days=2))
+        self.assertEqual(self._partition_of(log), "weather_weatherlog_default") # noqa E501
+
+        created = retention.ensure_partitions(months_ahead=6)
+
+        self.assertIn(retention.partition_name(start), created)
+        self.assertEqual(self._partition_of(log), retention.partition_name(start)) # noqa E501
+        moved = WeatherLog.objects.get(pk=log.pk)
+        self.assertEqual(moved.raw, {"name": "Recife"})
+        # idempotente
+        self.assertEqual(retention.ensure_partitions(months_ahead=6), [])
+
+    def test_arquiva_mes_particionado_com_detach(self):
+        start = retention.add_months(self.current, -2)
+        end = retention.add_months(start, 1)
+        with connection.cursor() as cursor:
+            retention._create_partition(
+                cursor, retention.partition_name(start), start, end
+            )
+        logs = [self._log(start + timedelta(days=d)) for d in range(3)]
+        self.assertEqual(self._partition_of(logs[0]), retention.partition_name(start)) # noqa E501
+
+        archived = retention.archive_month(start)
+
+        self.assertEqual(archived["rows"], 3)
+        self.assertNotIn(retention.partition_name(start), self._partitions())
+        self.assertFalse(WeatherLog.objects.filter(timestamp__lt=end, timestamp__gte=start).exists()) # noqa E501
+        with default_storage.open(archived["path"]) as fh:
+            lines = gzip.decompress(fh.read()).decode().splitlines()
+        self.assertEqual(sorted(json.loads(line)["id"] for line in lines), [log.id for log in logs]) # noqa E501
+
+    def test_arquiva_mes_na_default_com_delete(self):
+        start = retention.add_months(self.current, -30)
+        self._log(start + timedelta(days=1))
+        self._log(start + timedelta(days=2))
+        kept = self._log(retention.add_months(start, 1) + timedelta(days=1))
+
+        archived = retention.archive_month(start)
+
+        self.assertEqual(archived["rows"], 2)
+        self.assertEqual(list(WeatherLog.objects.values_list("id", flat=True)), [kept.id]) # noqa E501
+
+
+@skipUnless(connection.vendor == "postgresql", "Particionamento só no PostgreSQL.") # noqa E501
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PostgresArchiveLockTest(TransactionTestCase):
+    """Gravação concorrente no mês em arquivamento espera o DETACH."""
+
+    def test_gravacao_concorrente_espera_o_arquivamento(self):
+        start = retention.add_months(retention.month_start(timezone.now()), -5) # noqa E501
+        name = retention.partition_name(start)
+        with connection.cursor() as cursor:
+            retention._create_partition(
+                cursor, name, start, retention.add_months(start, 1)
+            )
+        fields = {
+            "city": "Recife",
+            "temperature": 25,
+            "humidity": 60,
+            "pressure": 1010,
+            "wind_speed": 3.0,
+            "condition": "nublado",
+        }
+        WeatherLog.objects.create(timestamp=start + timedelta(days=1), **fields) # noqa E501
+        write_archive = retention._write_archive
+        errors = []
+
+        def insert_from_other_connection():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET lock_timeout = '300ms'")
+                WeatherLog.objects.create(timestamp=start + timedelta(days=2), **fields) # noqa E501
+            except OperationalError as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        def write_with_concurrent_insert(start_, rows):
+            thread = threading.Thread(target=insert_from_other_connection)
+            thread.start()
+            thread.join()
+            return write_archive(start_, rows)
+
+        with mock.patch.object(retention, "_write_archive", write_with_concurrent_insert): # noqa E501
+            archived = retention.archive_month(start)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("lock timeout", str(errors[0]))
+        self.assertEqual(archived["rows"], 1)
+        with connection.cursor() as cursor:
+            self.assertNotIn(name, retention._partitions(cursor))
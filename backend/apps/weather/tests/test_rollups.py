@@ -0,0 +1,144 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.weather.models import WeatherLog, WeatherRollup
+from apps.weather.services.rollups import (
+    bucket_start,
+    rebuild_rollups,
+    record_rollups,
+)
+
+User = get_user_model()
+
+
+class WeatherRollupTest(TestCase):
+
+    def setUp(self):
+        self.base = bucket_start(
+            timezone.now() - timedelta(days=1), WeatherRollup.Granularity.DAY # noqa E501
+        )
+        self.logs = []
+        for i, temp in enumerate([18.0, 22.0, 26.0, 30.0]):
+            self.logs.append(
+                WeatherLog.objects.create(
+                    timestamp=self.base + timedelta(minutes=20 * i),
+                    city="Curitiba",
+                    temperature=temp,
+                    humidity=80 - i,
+                    pressure=1015,
+                    wind_speed=i,
+                    condition="garoa",
+                    raw={"name": "Curitiba"},
+                )
+            )
+
+    def _snapshot(self):
+        return list(
+            WeatherRollup.objects.order_by("granularity", "bucket_start")
+            .values_list(
+                "granularity",
+                "bucket_start",
+                "count",
+                "temperature_min",
+                "temperature_max",
+                "temperature_sum",
+            )
+        )
+
+    def test_incremental_igual_ao_rebuild(self):
+        record_rollups(self.logs[:1])
+        record_rollups(self.logs[1:])
+        incremental = self._snapshot()
+
+        rebuild_rollups()
+        self.assertEqual(self._snapshot(), incremental)
+
+        day = WeatherRollup.objects.get(granularity="day")
+        self.assertEqual(day.count, 4)
+        self.assertEqual(day.temperature_min, 18.0)
+        self.assertEqual(day.temperature_max, 30.0)
+        self.assertEqual(day.temperature_avg, 24.0)
+        # 00:00, 00:20, 00:40 na primeira hora e 01:00 na segunda
+        hours = WeatherRollup.objects.filter(granularity="hour")
+        self.assertEqual([r.count for r in hours], [3, 1])
+
+    def test_upsert_em_um_comando(self):
+        record_rollups(self.logs[1:3])
+
+        # buckets novos e existentes no mesmo INSERT ... ON CONFLICT
+        with self.assertNumQueries(1):
+            self.assertEqual(record_rollups([self.logs[0], self.logs[3]]), 3)
+
+        day = WeatherRollup.objects.get(granularity="day")
+        self.assertEqual(
+            (day.count, day.temperature_min, day.temperature_max, day.humidity_min), # noqa E501
+            (4, 18.0, 30.0, 77),
+        )
+        self.assertEqual(day.city, "Curitiba")
+
+    def test_endpoint_rollups(self):
+        record_rollups(self.logs)
+        user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+        )
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.get(
+            reverse("weather-logs-rollups"),
+            {"city": "curitiba", "granularity": "day"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        row = response.data["results"][0]
+        self.assertEqual(row["count"], 4)
+        self.assertEqual(row["temperature_avg"], 24.0)
+
+        invalid = client.get(
+            reverse("weather-logs-rollups"), {"granularity": "week"}
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_endpoint_rollups_pagina_grande_sem_count(self):
+        for hour in range(1, 30):
+            self.logs.append(
+                WeatherLog.objects.create(
+                    timestamp=self.base + timedelta(hours=hour),
+                    city="Curitiba",
+                    temperature=20,
+                    humidity=70,
+                    pressure=1015,
+                    wind_speed=1,
+                    condition="garoa",
+                )
+            )
+        record_rollups(self.logs)
+        client = APIClient()
+        client.force_authenticate(
+            user=User.objects.create_user(username="rollups", password="x")
+        )
+        url = reverse("weather-logs-rollups")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {"granularity": "hour"})
+
+        self.assertEqual(len(response.data["results"]), 30)
+        self.assertIsNone(response.data["count"])
+        self.assertIsNone(response.data["next"])
+        self.assertFalse(
+            any("COUNT(" in q["sql"].upper() for q in queries.captured_queries) # noqa E501
+        )
+
+        page = client.get(url, {"granularity": "hour", "limit": 20})
+        self.assertEqual(len(page.data["results"]), 20)
+        rest = client.get(page.data["next"])
+        self.assertEqual(len(rest.data["results"]), 10)
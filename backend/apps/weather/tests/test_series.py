@@ -0,0 +1,147 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.weather.models import WeatherLog, WeatherRollup, normalize_city
+from apps.weather.services.rollups import bucket_start, record_rollups
+from apps.weather.services.series import lttb
+
+User = get_user_model()
+
+
+class LttbTest(TestCase):
+
+    def test_mantem_extremos_e_picos(self):
+        x = list(range(100))
+        y = [0.0] * 100
+        y[37] = 50.0
+        y[71] = -40.0
+
+        selected = list(lttb(x, y, 10))
+
+        self.assertEqual(len(selected), 10)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 99)
+        self.assertIn(37, selected)
+        self.assertIn(71, selected)
+        self.assertEqual(selected, sorted(selected))
+
+    def test_poucos_pontos_nao_reduz(self):
+        self.assertEqual(list(lttb([1, 2, 3], [1, 2, 3], 10)), [0, 1, 2])
+
+
+class WeatherSeriesTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="Django13$",
+        )
+        self.client.force_authenticate(user=user)
+        self.url = reverse("weather-logs-series")
+        self.base = bucket_start(
+            timezone.now() - timedelta(days=40), WeatherRollup.Granularity.DAY # noqa E501
+        )
+
+    def _create_logs(self, count: int, step: timedelta, city: str = "Recife"): # noqa E501
+        logs = WeatherLog.objects.bulk_create(
+            [
+                WeatherLog(
+                    timestamp=self.base + i * step,
+                    city=city,
+                    city_key=normalize_city(city),
+                    temperature=20 + (i % 12),
+                    humidity=60,
+                    pressure=1010,
+                    wind_speed=3.0,
+                    condition="nublado",
+                    raw={},
+                )
+                for i in range(count)
+            ]
+        )
+        record_rollups(logs)
+        return logs
+
+    def test_poucos_logs_devolve_medicoes_brutas(self):
+        self._create_logs(5, timedelta(hours=1))
+        self._create_logs(3, timedelta(hours=1), city="Natal")
+
+        response = self.client.get(self.url, {"city": "recife", "points": 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["granularity"], "raw")
+        self.assertFalse(response.data["downsampled"])
+        self.assertEqual(
+            [p["value"] for p in response.data["points"]],
+            [20, 21, 22, 23, 24],
+        )
+
+    def test_agrupa_por_hora_no_banco(self):
+        # 2 dias com uma medição a cada 10 minutos
+        self._create_logs(288, timedelta(minutes=10))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.url, {"city": "Recife", "points": 100}
+            )
+
+        data = response.data
+        self.assertEqual(data["source_count"], 288)
+        self.assertEqual(data["granularity"], "hour")
+        self.assertTrue(data["downsampled"])
+        self.assertEqual(len(data["points"]), 48)
+        first = data["points"][0]
+        self.assertAlmostEqual(first["value"], 22.5)
+        self.assertEqual(first["min"], 20)
+        self.assertEqual(first["max"], 25)
+
+    def test_periodo_longo_usa_lttb(self):
+        # 30 dias de medições horárias em duas cidades
+        self._create_logs(720, timedelta(hours=1))
+        self._create_logs(720, timedelta(hours=1), city="Natal")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.url, {"metric": "temperature", "points": 10}
+            )
+
+        # sem filtro de cidade: só os rollups, nenhuma varredura dos logs
+        self.assertFalse(
+            [q for q in queries if '"weather_weatherlog"' in q["sql"]]
+        )
+        data = response.data
+        self.assertEqual(data["source_count"], 1440)
+        self.assertEqual(data["granularity"], "day")
+        self.assertEqual(len(data["points"]), 10)
+        timestamps = [p["timestamp"] for p in data["points"]]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_periodo_arquivado_usa_rollups(self):
+        # retenção apagou os logs, os rollups continuam
+        self._create_logs(5, timedelta(hours=1))
+        WeatherLog.objects.all().delete()
+
+        response = self.client.get(self.url, {"city": "Recife", "points": 10})
+
+        data = response.data
+        self.assertEqual(data["source_count"], 5)
+        self.assertEqual(data["granularity"], "hour")
+        self.assertEqual(
+            [p["value"] for p in data["points"]], [20, 21, 22, 23, 24]
+        )
+        self.assertEqual(data["points"][0]["timestamp"], self.base)
+
+    def test_parametros_invalidos(self):
+        for params in ({"metric": "raw"}, {"points": "x"}, {"points": 1}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, params
+            )
@@ -19,6 +19,12 @@ app.conf.beat_schedule = {
         "schedule": crontab(minute=0, hour="*"),
     },
 
+    # Coleta em paralelo as cidades cadastradas em TrackedCity
+    "collect-tracked-cities-every-hour": {
+        "task": "apps.weather.tasks.collect_tracked_cities_task",
+        "schedule": crontab(minute=0, hour="*"),
+    },
+
     # Gera insight a cada 2 horas
     "generate-weather-insights-every-2-hours": {
         "task": "apps.weather.tasks.generate_insights_task",
@@ -28,4 +34,30 @@ app.conf.beat_schedule = {
             "force_collect": True,
         },
     },
+
+    # Um insight por cidade cadastrada em TrackedCity, em lote
+    "generate-city-insights-every-2-hours": {
+        "task": "apps.weather.tasks.generate_city_insights_task",
+        "schedule": crontab(minute=15, hour="*/2"),
+        "kwargs": {"hours": 24},
+    },
+
+    # Recompacta os rollups dos últimos 2 dias a partir dos logs brutos
+    "rebuild-weather-rollups-daily": {
+        "task": "apps.weather.tasks.rebuild_rollups_task",
+        "schedule": crontab(minute=30, hour=3),
+        "kwargs": {"days": 2},
+    },
+
+    # Retenção: partições futuras, limpeza do `raw` e arquivamento mensal
+    "apply-weather-retention-daily": {
+        "task": "apps.weather.tasks.apply_retention_task",
+        "schedule": crontab(minute=0, hour=4),
+    },
+
+    # Apaga as exportações XLSX (e arquivos) fora do prazo de download
+    "purge-weather-exports-daily": {
+        "task": "apps.weather.tasks.purge_exports_task",
+        "schedule": crontab(minute=30, hour=4),
+    },
 }
@@ -0,0 +1,384 @@
+"""
+Instrumentação opcional das requisições (PROFILING_ENABLED=True).
+
+Para cada requisição registra o número de queries, o tempo gasto em SQL,
+o tempo de serialização e o tempo total. Os valores saem no header
+`Server-Timing`, em log estruturado (logger `core.profiling`) e em
+histogramas por endpoint expostos no formato Prometheus em `/metrics`.
+
+Respostas em streaming (exportações, SSE) continuam medidas enquanto o
+corpo é gerado: o header leva os valores até o primeiro byte e o log e
+os histogramas, os finais, registrados quando o stream é encerrado.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # noqa E501
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_NUMBERS = re.compile(r"\b\d+(\.\d+)?\b")
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+
+_current = ContextVar("request_profile", default=None)
+
+
+def profiling_enabled() -> bool:
+    return getattr(settings, "PROFILING_ENABLED", False)
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL sem literais: agrupa a mesma query executada em um laço (N+1)."""
+    return _NUMBERS.sub("?", _STRINGS.sub("?", sql))
+
+
+class QueryCounter:
+    """
+    Conta e cronometra as queries executadas enquanto ativo, via
+    `execute_wrapper` em todas as conexões (funciona com DEBUG=False).
+    """
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in self.aliases:
+            self._stack.enter_context(connections[alias].execute_wrapper(self)) # noqa E501
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        return sum(elapsed for _, elapsed in self.queries)
+
+    def duplicates(self, threshold: int = 2) -> dict:
+        """Queries (normalizadas) repetidas ao menos `threshold` vezes."""
+        seen = {}
+        for sql, _ in self.queries:
+            key = normalize_sql(sql)
+            seen[key] = seen.get(key, 0) + 1
+        return {sql: n for sql, n in seen.items() if n >= threshold}
+
+
+@contextmanager
+def span(name: str):
+    """
+    Cronometra um trecho da requisição atual (ex.: serialização). Sem
+    profiling ativo não faz nada além de executar o bloco.
+    """
+    spans = _current.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + time.perf_counter() - started
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Histogramas por (método, rota), em memória do processo, e métricas
+    de outros módulos via `register_collector`.
+    """
+
+    metrics = {
+        "http_request_duration_seconds": (
+            "Tempo total da requisição em segundos.",
+            DURATION_BUCKETS,
+        ),
+        "http_request_db_seconds": (
+            "Tempo gasto em SQL por requisição em segundos.",
+            DURATION_BUCKETS,
+        ),
+        "http_request_db_queries": (
+            "Número de queries por requisição.",
+            QUERY_BUCKETS,
+        ),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._collectors = []
+
+    def register_collector(self, collect):
+        """
+        `collect()` devolve `[(nome, tipo, ajuda, valor)]` (tipo `counter`
+        ou `gauge`), lido a cada renderização de `/metrics`.
+        """
+        with self._lock:
+            if collect not in self._collectors:
+                self._collectors.append(collect)
+
+    def observe(self, method: str, route: str, values: dict):
+        with self._lock:
+            for name, value in values.items():
+                key = (name, method, route)
+                hist = self._data.get(key)
+                if hist is None:
+                    hist = self._data[key] = Histogram(self.metrics[name][1])
+                hist.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.metrics.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, method, route), hist in sorted(self._data.items()): # noqa E501
+                    if metric != name:
+                        continue
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}') # noqa E501
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}') # noqa E501
+                    lines.append(f"{name}_sum{{{labels}}} {hist.sum:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+            collectors = list(self._collectors)
+        for collect in collectors:
+            for name, kind, help_text, value in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def _route(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.route or match.view_name
+
+
+class _RequestProfile:
+    """Queries, spans e relógio de uma requisição (inclusive do stream)."""
+
+    def __init__(self):
+        self.spans = {}
+        self.queries = QueryCounter()
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def active(self):
+        token = _current.set(self.spans)
+        try:
+            with self.queries:
+                yield
+        finally:
+            _current.reset(token)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class _ProfiledStream:
+    """
+    Repassa o `streaming_content` com o profiling ativo a cada bloco e
+    chama `on_close` uma única vez, ao esgotar ou ao fechar a resposta.
+    """
+
+    def __init__(self, content, profile, on_close):
+        self.content = content
+        self.profile = profile
+        self.on_close = on_close
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+
+
+# o StreamingHttpResponse decide sync/async por `iter()`: cada variante
+# expõe só um dos protocolos
+class _SyncProfiledStream(_ProfiledStream):
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            with self.profile.active():
+                return next(self.content)
+        except StopIteration:
+            self.close()
+            raise
+
+
+class _AsyncProfiledStream(_ProfiledStream):
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            with self.profile.active():
+                return await anext(self.content)
+        except StopAsyncIteration:
+            self.close()
+            raise
+
+
+class ProfilingMiddleware:
+    """
+    Mede queries, SQL, serialização e tempo total de cada requisição.
+    Desligado por padrão: só é carregado com PROFILING_ENABLED=True.
+    Funciona em WSGI e ASGI (não força a cadeia de middlewares a
+    rodar em modo síncrono).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = _RequestProfile()
+        with profile.active():
+            response = self.get_response(request)
+        return self._finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = _RequestProfile()
+        with profile.active():
+            response = await self.get_response(request)
+        return self._finish(request, response, profile)
+
+    def _finish(self, request, response, profile):
+        queries, spans = profile.queries, profile.spans
+        timings = [
+            f'db;dur={queries.duration * 1000:.2f};desc="{queries.count} queries"', # noqa E501
+            *(f"{name};dur={value * 1000:.2f}" for name, value in spans.items()), # noqa E501
+            f"total;dur={profile.elapsed * 1000:.2f}",
+        ]
+        response["Server-Timing"] = ", ".join(timings)
+
+        if not response.streaming:
+            self._record(request, response, profile)
+            return response
+
+        stream = _AsyncProfiledStream if response.is_async else _SyncProfiledStream # noqa E501
+        response.streaming_content = stream(
+            response.streaming_content,
+            profile,
+            lambda: self._record(request, response, profile),
+        )
+        return response
+
+    def _record(self, request, response, profile):
+        queries, spans = profile.queries, profile.spans
+        total = profile.elapsed
+        route = _route(request)
+        registry.observe(
+            request.method,
+            route,
+            {
+                "http_request_duration_seconds": total,
+                "http_request_db_seconds": queries.duration,
+                "http_request_db_queries": queries.count,
+            },
+        )
+        logger.info(
+            "request_profile %s",
+            json.dumps(
+                {
+                    "method": request.method,
+                    "route": route,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "streaming": response.streaming,
+                    "queries": queries.count,
+                    "db_ms": round(queries.duration * 1000, 2),
+                    **{
+                        f"{name}_ms": round(value * 1000, 2)
+                        for name, value in spans.items()
+                    },
+                    "total_ms": round(total * 1000, 2),
+                },
+                ensure_ascii=False,
+            ),
+        )
+
+    def process_template_response(self, request, response):
+        # Response do DRF é renderizada (JSON) depois da view
+        spans = _current.get()
+        if spans is not None:
+            started = time.perf_counter()
+
+            def rendered(_response):
+                spans["render"] = time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """Histogramas no formato texto do Prometheus (404 sem profiling)."""
+    if not profiling_enabled():
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -59,6 +59,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # opt-in: PROFILING_ENABLED=True (queries, SQL, Server-Timing, /metrics)
+    'core.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -69,6 +71,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=False)
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -93,24 +97,43 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# SQLite por padrão; DB_ENGINE=postgresql usa as variáveis POSTGRES_*
+# (necessário para o particionamento de WeatherLog, ver migração 0010)
+if env("DB_ENGINE", default="sqlite") == "postgresql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('POSTGRES_DB', default='dbproducts'),
+            'USER': env('POSTGRES_USER', default='postgres'),
+            'PASSWORD': env('POSTGRES_PASSWORD', default=''),
+            'HOST': env('POSTGRES_HOST', default='localhost'),
+            'PORT': env('POSTGRES_PORT', default='5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+
+# Cache
+# Em produção use um backend compartilhado entre os workers (ex.: Redis:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache e
+# CACHE_LOCATION=redis://redis:6379/1).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': env(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': env('CACHE_LOCATION', default='weather-cache'),
     }
 }
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': os.environ.get('POSTGRES_DB', 'dbproducts'),
-#         'USER': os.environ.get('POSTGRES_USER', 'postgres'),
-#         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'admin13$'),
-#         'HOST': os.environ.get('POSTGRES_HOST', '172.18.0.3'),
-#         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
-#     }
-# }
-
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -202,10 +225,70 @@ OPENWEATHER_CONFIG = {
     "lang": env("OPENWEATHER_LANG"),
     "base_url": "https://api.openweathermap.org/data/2.5/weather",
     "geocode_url": "https://api.openweathermap.org/geo/1.0/direct",
+    "timeout": float(env("OPENWEATHER_TIMEOUT", default=10)),
+    # threads/conexões simultâneas da coleta em lote (TrackedCity)
+    "max_workers": int(env("OPENWEATHER_MAX_WORKERS", default=16)),
+    # cache de geocoding: TTL de acertos (dias) e de "não encontrada" (s)
+    "geocode_ttl_days": float(env("OPENWEATHER_GEOCODE_TTL_DAYS", default=30)), # noqa E501
+    "geocode_negative_ttl": float(env("OPENWEATHER_GEOCODE_NEGATIVE_TTL", default=3600)), # noqa E501
+    # cache do clima atual por (lat, lon) arredondados; 0 desativa
+    "cache_ttl": float(env("OPENWEATHER_CACHE_TTL", default=300)),
+    "cache_precision": int(env("OPENWEATHER_CACHE_PRECISION", default=2)),
+}
+
+# Cache da última medição por cidade (`logs/latest-by-city/`), atualizado
+# a cada gravação: LRU em memória + tier compartilhado no cache do Django
+LATEST_CACHE_CONFIG = {
+    # TTL (s) do tier em memória; outros processos também gravam logs
+    "memory_ttl": float(env("LATEST_CACHE_MEMORY_TTL", default=5)),
+    # usa o cache do Django (Redis em produção) como tier compartilhado
+    "shared": env.bool("LATEST_CACHE_SHARED", default=True),
+    "shared_ttl": float(env("LATEST_CACHE_SHARED_TTL", default=86400)),
 }
 
 # OpenAI API
 OPENAI_CONFIG = {
     "api_key": env("OPENAI_API_KEY", default=""),
     "model": env("OPENAI_MODEL", default="gpt-4.1-mini"),
+    # timeouts (s) do cliente compartilhado e retries com backoff exponencial
+    "timeout": float(env("OPENAI_TIMEOUT", default=30)),
+    "connect_timeout": float(env("OPENAI_CONNECT_TIMEOUT", default=5)),
+    "max_retries": int(env("OPENAI_MAX_RETRIES", default=2)),
+    "backoff": float(env("OPENAI_BACKOFF", default=0.5)),
+    # chamadas simultâneas por processo e espera máxima por uma vaga (s)
+    "max_concurrency": int(env("OPENAI_MAX_CONCURRENCY", default=4)),
+    "queue_timeout": float(env("OPENAI_QUEUE_TIMEOUT", default=10)),
+    # circuit breaker: falhas seguidas para abrir e tempo aberto (s)
+    "breaker_threshold": int(env("OPENAI_BREAKER_THRESHOLD", default=5)),
+    "breaker_reset": float(env("OPENAI_BREAKER_RESET", default=60)),
+}
+
+# Geração de insights: pedidos iguais (hours, city) dentro da janela de
+# frescor reaproveitam o último insight em vez de chamar a OpenAI de novo
+INSIGHTS_CONFIG = {
+    "freshness_seconds": float(env("INSIGHTS_FRESHNESS_SECONDS", default=300)), # noqa E501
+    # validade máxima do registro de task enfileirada/em execução
+    "lock_timeout": float(env("INSIGHTS_LOCK_TIMEOUT", default=600)),
+}
+
+# Retenção dos WeatherLogs (task diária `apply_retention_task`): remove o
+# `raw` dos logs antigos e arquiva (JSONL.gz no storage) os meses antigos
+RETENTION_CONFIG = {
+    # dias com o payload `raw` completo (0 = nunca remover)
+    "raw_days": int(env("RETENTION_RAW_DAYS", default=30)),
+    # meses mantidos no banco antes de arquivar (0 = nunca arquivar)
+    "archive_months": int(env("RETENTION_ARCHIVE_MONTHS", default=0)),
+    # formato do arquivo: "jsonl" (JSONL.gz) ou "parquet" (colunar, zstd)
+    "archive_format": env("RETENTION_ARCHIVE_FORMAT", default="jsonl"),
+    # PostgreSQL: partições mensais criadas com antecedência
+    "partition_months_ahead": int(env("RETENTION_PARTITION_MONTHS_AHEAD", default=3)), # noqa E501
+    # RawPayloads usados há menos de N minutos nunca são apagados como órfãos
+    "orphan_grace_minutes": int(env("RETENTION_ORPHAN_GRACE_MINUTES", default=60)), # noqa E501
+}
+
+# Exportações assíncronas (WeatherExport): a task diária
+# `purge_exports_task` apaga os registros e arquivos mais antigos
+EXPORTS_CONFIG = {
+    # dias que o arquivo fica disponível para download (0 = nunca apagar)
+    "ttl_days": int(env("EXPORTS_TTL_DAYS", default=7)),
 }
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+from core.profiling import QueryCounter
+
+
+class QueryAssertionsMixin:
+    """
+    Asserções de quantidade de queries para TestCase: falham o CI quando
+    um endpoint passa a fazer mais queries ou repete a mesma query (N+1).
+    """
+
+    @contextmanager
+    def assertMaxQueries(self, limit: int, using=None):
+        with QueryCounter(using=using) as counter:
+            yield counter
+        if counter.count > limit:
+            queries = "\n".join(
+                f"{i}. {sql}" for i, (sql, _) in enumerate(counter.queries, 1) # noqa E501
+            )
+            self.fail(
+                f"{counter.count} queries executadas, máximo {limit}:\n{queries}" # noqa E501
+            )
+
+    @contextmanager
+    def assertNoDuplicateQueries(self, threshold: int = 2, using=None):
+        with QueryCounter(using=using) as counter:
+            yield counter
+        duplicates = counter.duplicates(threshold)
+        if duplicates:
+            detail = "\n".join(
+                f"{n}x {sql}" for sql, n in duplicates.items()
+            )
+            self.fail(f"Queries repetidas (possível N+1):\n{detail}")
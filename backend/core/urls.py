@@ -2,8 +2,14 @@ from django.contrib import admin
 from django.urls import path
 from django.conf.urls.static import static
 from drf_yasg.views import get_schema_view
-from apps.weather.api.viewsets import WeatherInsightViewSet, WeatherLogViewSet
+from apps.weather.api.async_views import fetch_city_async
+from apps.weather.api.viewsets import (
+    WeatherInsightViewSet,
+    WeatherLogViewSet,
+    WeatherRollupViewSet,
+)
 from core import settings
+from core.profiling import metrics_view
 from drf_yasg import openapi
 from rest_framework import permissions
 from rest_framework.authtoken.views import obtain_auth_token
@@ -33,6 +39,8 @@ urlpatterns = [
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'), # noqa E501
 
     path('admin/', admin.site.urls),
+    # métricas (Prometheus), só com PROFILING_ENABLED=True
+    path('metrics', metrics_view, name='metrics'),
     # accounts
     path('api/v1/api-token-auth/', obtain_auth_token, name='api_token_auth'),
     path('api/v1/register/', RegisterAPIView.as_view(), name='register'),
@@ -42,12 +50,23 @@ urlpatterns = [
     path('api/v1/users/<int:id>/', UserDeleteAPIView.as_view(), name='user-delete'), # noqa E501
     # Weather logs
     path("api/v1/weather/logs/", WeatherLogViewSet.as_view({"get": "list", "post": "create"}), name="weather-logs-list"), # noqa E501
+    path("api/v1/weather/logs/bulk/", WeatherLogViewSet.as_view({"post": "bulk"}), name="weather-logs-bulk"), # noqa E501
+    path("api/v1/weather/logs/latest-by-city/", WeatherLogViewSet.as_view({"get": "latest_by_city"}), name="weather-logs-latest-by-city"), # noqa E501
+    path("api/v1/weather/logs/series/", WeatherLogViewSet.as_view({"get": "series"}), name="weather-logs-series"), # noqa E501
     path("api/v1/weather/logs/export.csv/", WeatherLogViewSet.as_view({"get": "export_csv"}), name="weather-logs-export-csv"), # noqa E501
     path("api/v1/weather/logs/export.xlsx/", WeatherLogViewSet.as_view({"get": "export_xlsx"}), name="weather-logs-export-xlsx"), # noqa E501
+    path("api/v1/weather/logs/export.parquet/", WeatherLogViewSet.as_view({"get": "export_parquet"}), name="weather-logs-export-parquet"), # noqa E501
+    path("api/v1/weather/logs/export.arrow/", WeatherLogViewSet.as_view({"get": "export_arrow"}), name="weather-logs-export-arrow"), # noqa E501
+    path("api/v1/weather/logs/exports/<uuid:export_id>/", WeatherLogViewSet.as_view({"get": "export_download"}), name="weather-logs-export-download"), # noqa E501
     path("api/v1/weather/logs/fetch-city/", WeatherLogViewSet.as_view({"post": "fetch_city"}), name="weather-logs-fetch-city"), # noqa E501
+    path("api/v1/weather/logs/fetch-city/async/", fetch_city_async, name="weather-logs-fetch-city-async"), # noqa E501
+    # Weather rollups
+    path("api/v1/weather/logs/rollups/", WeatherRollupViewSet.as_view({"get": "list"}), name="weather-logs-rollups"), # noqa E501
     # Weather insights
     path("api/v1/weather/logs/insights/", WeatherInsightViewSet.as_view({"get": "list", "post": "generate"}), name="weather-logs-insights"), # noqa E501
     path("api/v1/weather/logs/insights/latest/", WeatherInsightViewSet.as_view({"get": "latest"}), name="weather-logs-insights-latest"), # noqa E501
+    path("api/v1/weather/logs/insights/stream/", WeatherInsightViewSet.as_view({"post": "stream"}), name="weather-logs-insights-stream"), # noqa E501
+    path("api/v1/weather/logs/insights/tasks/<str:task_id>/events/", WeatherInsightViewSet.as_view({"get": "task_events"}), name="weather-logs-insights-task-events"), # noqa E501
 ]
 
 if settings.DEBUG:
@@ -1,29 +1,13 @@
 from io import BytesIO
-from openpyxl import Workbook
+from apps.weather.services.exports import write_xlsx
 
 
 def generate_xlsx_bytes(logs_queryset):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Weather Logs"
-
-    headers = [
-        'collected_at', 'temperature', 'humidity',
-        'wind_speed', 'condition', 'rain_probability', 'source',
-    ]
-    ws.append(headers)
-
-    for log in logs_queryset:
-        ws.append([
-            log.collected_at.isoformat(),
-            log.temperature,
-            log.humidity,
-            log.wind_speed,
-            log.condition,
-            log.rain_probability,
-            log.source,
-        ])
-
+    """
+    Atalho que devolve o XLSX dos logs em bytes, usando o mesmo motor
+    write-only das exportações da API. Para arquivos grandes prefira
+    `build_xlsx_file`, que não mantém tudo em memória.
+    """
     output = BytesIO()
-    wb.save(output)
+    write_xlsx(logs_queryset, output)
     return output.getvalue()
@@ -28,6 +28,7 @@ export function WeatherTable({
   page,
   pageSize,
   totalCount,
+  hasNextPage,
   onPrevPage,
   onNextPage,
   selectedId,
@@ -93,7 +94,11 @@ export function WeatherTable({
 
         <div className="mt-4 flex flex-wrap gap-3 items-center justify-between text-sm text-slate-400">
           <span>
-            {totalCount > 0
+            {totalCount === null
+              ? logs.length > 0
+                ? `Página ${page}`
+                : "Nenhum registro"
+              : totalCount > 0
               ? `Mostrando ${(page - 1) * pageSize + 1}–${Math.min(
                   page * pageSize,
                   totalCount
@@ -114,7 +119,11 @@ export function WeatherTable({
             <Button
               variant="outline"
               size="sm"
-              disabled={page * pageSize >= totalCount || isLoading}
+              disabled={
+                (totalCount === null
+                  ? !hasNextPage
+                  : page * pageSize >= totalCount) || isLoading
+              }
               onClick={onNextPage}
               className="cursor-pointer"
             >
@@ -7,11 +7,12 @@ export interface WeatherLog {
   pressure: number;
   wind_speed: number;
   condition: string;
-  raw: any;
+  raw?: any; // só vem com `?include=raw`
   created_at: string;
 }
 export interface WeatherListResponse {
-  count: number;
+  // ausente na paginação por cursor e nulo com `count=false`
+  count?: number | null;
   next: string | null;
   previous: string | null;  
   results: WeatherLog[];
@@ -22,6 +23,16 @@ export interface WeatherInsight {
   text: string;
   city?: string;
 }
+// 202: task enfileirada (ou reaproveitada); 200: insight recente em cache
+export interface GenerateInsightResponse {
+  detail: string;
+  city: string | null;
+  hours: number;
+  task_id?: string;
+  deduplicated?: boolean;
+  cached?: boolean;
+  insight?: WeatherInsight;
+}
 export interface WeatherInsightsResponse {
   days: number;
   city: string | null;
@@ -31,6 +42,27 @@ export interface WeatherInsightsResponse {
   previous: string | null;
   data: WeatherInsight[];
 }
+// última medição por cidade (cache do backend, atualizado na gravação)
+export interface LatestByCityResponse {
+  count: number;
+  results: WeatherLog[];
+  missing: string[];
+}
+// série reduzida de `/weather/logs/series/` (min/max só nos buckets)
+export interface WeatherSeriesPoint {
+  timestamp: string;
+  value: number;
+  min?: number;
+  max?: number;
+}
+export interface WeatherSeriesResponse {
+  metric: string;
+  city: string | null;
+  source_count: number;
+  granularity: "raw" | "hour" | "day";
+  downsampled: boolean;
+  points: WeatherSeriesPoint[];
+}
 export interface WeatherTemperatureChartProps {
   data: {
     time: string;
@@ -44,7 +76,9 @@ export interface WeatherTableProps {
   isLoading: boolean;
   page: number;
   pageSize: number;
-  totalCount: number;
+  // null quando a listagem usa cursor (sem COUNT no backend)
+  totalCount: number | null;
+  hasNextPage?: boolean;
   onPrevPage: () => void;
   onNextPage: () => void;
   selectedId?: number | null;
@@ -1,7 +1,11 @@
 import { useEffect, useMemo, useState } from "react";
 import AppHeader from "@/components/layout/AppHeader";
-import { weatherService } from "@/services/weatherService";
-import type { WeatherLog, WeatherInsight } from "@/interfaces/weather";
+import { extractCursor, weatherService } from "@/services/weatherService";
+import type {
+  WeatherLog,
+  WeatherInsight,
+  WeatherSeriesPoint,
+} from "@/interfaces/weather";
 import { toast } from "sonner";
 import { WeatherFilterBar } from "@/components/layout/weather/WeatherFilterBar";
 import { WeatherSummaryCards } from "@/components/layout/weather/WeatherSummaryCards";
@@ -9,23 +13,12 @@ import { WeatherTemperatureChart } from "@/components/layout/weather/WeatherTemp
 import { WeatherTable } from "@/components/layout/weather/WeatherTable";
 import { WeatherInsightsCard } from "@/components/layout/weather/WeatherInsightsCard";
 
-function normalize(str: string): string {
-  return str
-    .normalize("NFD")
-    .replace(/[\u0300-\u036f]/g, "")
-    .toLowerCase()
-    .trim();
-}
-
-function extractCityFromInsight(text: string): string | null {
-  const match = text.match(/^Em\s+([^,]+),/);
-  return match ? match[1].trim() : null;
-}
-
 function HomePage() {
   const [logs, setLogs] = useState<WeatherLog[]>([]);
+  const [series, setSeries] = useState<WeatherSeriesPoint[]>([]);
+  const [isSeriesLoading, setIsSeriesLoading] = useState<boolean>(false);
   const [insights, setInsights] = useState<string>("");
-  const [latestInsightId, setLatestInsightId] = useState<number | null>(null);
+  const [, setLatestInsightId] = useState<number | null>(null);
   const [days, setDays] = useState<number>(3);
 
   const [isLoading, setIsLoading] = useState<boolean>(false);
@@ -34,9 +27,13 @@ function HomePage() {
 
   const [page, setPage] = useState<number>(1);
   const pageSize = 10;
-  const [totalCount, setTotalCount] = useState<number>(0);
+  // paginação por cursor: cursors[i] abre a página i + 1
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
+  const [hasNextPage, setHasNextPage] = useState<boolean>(false);
 
   const [selectedLog, setSelectedLog] = useState<WeatherLog | null>(null);
+  // leitura atual da cidade, independente da página da tabela
+  const [cityLatest, setCityLatest] = useState<WeatherLog | null>(null);
 
   const [selectedCity, setSelectedCity] = useState<string>("Brasília");
   const [isGeneratingWeather, setIsGeneratingWeather] = useState(false);
@@ -50,41 +47,72 @@ function HomePage() {
   }, [logs]);
 
   const currentLog = useMemo(
-    () => selectedLog ?? latestLog,
-    [selectedLog, latestLog]
+    () => selectedLog ?? cityLatest ?? latestLog,
+    [selectedLog, cityLatest, latestLog]
   );
 
   const chartData = useMemo(
     () =>
-      logs
-        .slice()
-        .sort(
-          (a, b) =>
-            new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime()
-        )
-        .map((log) => ({
-          time: new Date(log.timestamp).toLocaleString("pt-BR", {
-            day: "2-digit",
-            month: "2-digit",
-            hour: "2-digit",
-            minute: "2-digit",
-          }),
-          temperature: log.temperature,
-          rain_probability: 0,
-        })),
-    [logs]
+      series.map((point) => ({
+        time: new Date(point.timestamp).toLocaleString("pt-BR", {
+          day: "2-digit",
+          month: "2-digit",
+          hour: "2-digit",
+          minute: "2-digit",
+        }),
+        temperature: Number(point.value.toFixed(1)),
+        rain_probability: 0,
+      })),
+    [series]
   );
 
+  // gráfico: série já reduzida pelo backend (uma requisição por período)
+  const loadSeries = async (city: string) => {
+    try {
+      setIsSeriesLoading(true);
+      const start = new Date(Date.now() - days * 24 * 60 * 60 * 1000);
+      const response = await weatherService.getWeatherSeries({
+        city,
+        start: start.toISOString(),
+        metric: "temperature",
+        points: 300,
+      });
+      setSeries(response.points);
+    } catch (error) {
+      console.error("Erro ao carregar série de temperatura:", error);
+      setSeries([]);
+    } finally {
+      setIsSeriesLoading(false);
+    }
+  };
+
+  const loadCityLatest = async (city: string) => {
+    try {
+      const response = await weatherService.getLatestByCity([city]);
+      setCityLatest(response.results[0] ?? null);
+    } catch (error) {
+      console.error("Erro ao carregar a última medição da cidade:", error);
+      setCityLatest(null);
+    }
+  };
+
   const loadLogs = async () => {
     try {
       setIsLoading(true);
       const logsResponse = await weatherService.listWeatherLogs({
         limit: pageSize,
-        offset: (page - 1) * pageSize,
+        pagination: "cursor",
+        cursor: cursors[page - 1] ?? null,
       });
 
+      const nextCursor = extractCursor(logsResponse.next);
       setLogs(logsResponse.results);
-      setTotalCount(logsResponse.count);
+      setHasNextPage(nextCursor !== null);
+      setCursors((prev) => {
+        const updated = prev.slice(0, page);
+        updated[page] = nextCursor;
+        return updated;
+      });
     } catch (error) {
       toast.error("Erro ao carregar dados de clima", {
         description:
@@ -121,6 +149,16 @@ function HomePage() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [days, page]);
 
+  useEffect(() => {
+    loadSeries(selectedCity);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [days, selectedCity]);
+
+  useEffect(() => {
+    loadCityLatest(selectedCity);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [selectedCity]);
+
   useEffect(() => {
     if (selectedLog && !logs.some((l) => l.id === selectedLog.id)) {
       setSelectedLog(null);
@@ -137,28 +175,10 @@ function HomePage() {
       try {
         setIsInsightsLoading(true);
 
-        const response = await weatherService.getWeatherInsights({
-          limit: 50,
-          offset: 0,
-        });
-
-        const raw: any = response;
-        const list: WeatherInsight[] = Array.isArray(raw)
-          ? raw
-          : Array.isArray(raw?.results)
-          ? raw.results
-          : [];
-
-        const selectedCityNorm = normalize(selectedLog.city);
-
-        const matched = list.find((insight) => {
-          if (!insight?.text) return false;
-          const cityFromText = extractCityFromInsight(insight.text);
-          return (
-            cityFromText &&
-            normalize(cityFromText) === selectedCityNorm
-          );
-        });
+        // busca indexada pelo insight mais recente da cidade selecionada
+        const matched = await weatherService.getLatestWeatherInsight(
+          selectedLog.city
+        );
 
         if (matched) {
           setInsights(matched.text);
@@ -207,39 +227,35 @@ function HomePage() {
     }
   };
 
-  const waitForNewInsight = async (
-    previousId: number | null,
-    attempts = 5,
-    delayMs = 2000
-  ) => {
-    for (let i = 0; i < attempts; i++) {
-      const latest = await weatherService.getLatestWeatherInsight();
-      if (latest && latest.id !== previousId) {
-        setInsights(latest.text);
-        setLatestInsightId(latest.id);
-        return;
-      }
-      await new Promise((resolve) => setTimeout(resolve, delayMs));
-    }
-  };
-
   const handleGenerateWeatherForCity = async (city: string) => {
     try {
       setIsGeneratingWeather(true);
       setIsInsightsLoading(true);
       setSelectedCity(city);
       setPage(1);
+      setCursors([null]);
       setSelectedLog(null);
 
-      const previousInsightId = latestInsightId;
-
       await weatherService.fetchCityWeather(city);
-      await loadLogs();
+      await Promise.all([loadLogs(), loadSeries(city), loadCityLatest(city)]);
 
+      // o texto aparece no card conforme a IA responde
       const hours = days * 24;
-      await weatherService.generateWeatherInsightForCity({ hours, city });
-
-      await waitForNewInsight(previousInsightId);
+      let started = false;
+      const insight = await weatherService.streamWeatherInsightForCity(
+        { hours, city },
+        (text, replace) => {
+          if (!started) {
+            started = true;
+            setIsInsightsLoading(false);
+            setInsights(text);
+            return;
+          }
+          setInsights((current) => (replace ? text : current + text));
+        }
+      );
+      setInsights(insight.text);
+      setLatestInsightId(insight.id);
 
       toast.success(`Clima e insight de IA atualizados para ${city}.`);
     } catch (error) {
@@ -274,7 +290,10 @@ function HomePage() {
         <WeatherSummaryCards log={currentLog} />
 
         <div className="grid grid-cols-1 lg:grid-cols-3 gap-4">
-          <WeatherTemperatureChart data={chartData} isLoading={isLoading} />
+          <WeatherTemperatureChart
+            data={chartData}
+            isLoading={isSeriesLoading}
+          />
           <WeatherInsightsCard
             insights={insights}
             isLoading={isInsightsLoading}
@@ -286,12 +305,11 @@ function HomePage() {
           isLoading={isLoading}
           page={page}
           pageSize={pageSize}
-          totalCount={totalCount}
+          totalCount={null}
+          hasNextPage={hasNextPage}
           onPrevPage={() => setPage((prev) => Math.max(1, prev - 1))}
           onNextPage={() =>
-            setPage((prev) =>
-              prev * pageSize >= totalCount ? prev : prev + 1
-            )
+            setPage((prev) => (hasNextPage ? prev + 1 : prev))
           }
           selectedId={currentLog?.id ?? null}
           onSelectLog={setSelectedLog}
@@ -4,6 +4,9 @@ import type {
   WeatherListResponse,
   WeatherInsightsResponse,
   WeatherInsight,
+  GenerateInsightResponse,
+  WeatherSeriesResponse,
+  LatestByCityResponse,
 } from "@/interfaces/weather";
 
 const AUTH_TOKEN_KEY = "authToken";
@@ -58,7 +61,10 @@ function downloadBlob(blob: Blob, filename: string) {
 export async function listWeatherLogs(params?: {
   limit?: number;
   offset?: number;
-  city?: string; 
+  city?: string;
+  pagination?: "cursor";
+  cursor?: string | null;
+  count?: boolean;
 }): Promise<WeatherListResponse> {
   try {
     const { data } = await weatherApi.get<WeatherListResponse>("/weather/logs/", {
@@ -70,6 +76,44 @@ export async function listWeatherLogs(params?: {
   }
 }
 
+export async function getWeatherSeries(params: {
+  city?: string;
+  start?: string;
+  end?: string;
+  metric?: "temperature" | "humidity" | "pressure" | "wind_speed";
+  points?: number;
+}): Promise<WeatherSeriesResponse> {
+  try {
+    const { data } = await weatherApi.get<WeatherSeriesResponse>(
+      "/weather/logs/series/",
+      { params }
+    );
+    return data;
+  } catch (error) {
+    throw new Error(extractErrorMessage(error));
+  }
+}
+
+// sem `cities`: todas as cidades acompanhadas (TrackedCity)
+export async function getLatestByCity(
+  cities?: string[]
+): Promise<LatestByCityResponse> {
+  try {
+    const { data } = await weatherApi.get<LatestByCityResponse>(
+      "/weather/logs/latest-by-city/",
+      { params: cities?.length ? { city: cities.join(",") } : undefined }
+    );
+    return data;
+  } catch (error) {
+    throw new Error(extractErrorMessage(error));
+  }
+}
+
+export function extractCursor(url: string | null): string | null {
+  if (!url) return null;
+  return new URL(url).searchParams.get("cursor");
+}
+
 export async function getWeatherInsights(params?: {
   days?: number;
   limit?: number;
@@ -133,11 +177,15 @@ export async function exportWeatherXlsx(params?: {
   }
 }
 
-export async function getLatestWeatherInsight(): Promise<WeatherInsight | null> {
-  const { data } = await weatherApi.get<WeatherInsight>(
-    "/weather/logs/insights/latest/"
+// sem `city`: o insight geral (todas as cidades), não o da última cidade
+export async function getLatestWeatherInsight(
+  city?: string
+): Promise<WeatherInsight | null> {
+  const { data, status } = await weatherApi.get<WeatherInsight>(
+    "/weather/logs/insights/latest/",
+    { params: city ? { city } : undefined }
   );
-  return data;
+  return status === 204 ? null : data;
 }
 
 export async function generateWeatherInsight(hours = 24): Promise<WeatherInsight> {
@@ -151,18 +199,77 @@ export async function generateWeatherInsight(hours = 24): Promise<WeatherInsight
 export async function generateWeatherInsightForCity(params: {
   hours: number;
   city: string;
-}) {
+}): Promise<GenerateInsightResponse> {
   try {
-    const { data } = await weatherApi.post("/weather/logs/insights/", {
-      hours: params.hours,
-      city: params.city,
-    });
+    const { data } = await weatherApi.post<GenerateInsightResponse>(
+      "/weather/logs/insights/",
+      { hours: params.hours, city: params.city }
+    );
     return data;
   } catch (error) {
     throw new Error(extractErrorMessage(error));
   }
 }
 
+// Gera o insight em streaming (Server-Sent Events). Usa fetch em vez de
+// EventSource porque o endpoint é POST e precisa do header Authorization.
+export async function streamWeatherInsightForCity(
+  params: { hours: number; city: string },
+  onToken: (text: string, replace: boolean) => void
+): Promise<WeatherInsight> {
+  const token = localStorage.getItem(AUTH_TOKEN_KEY);
+  const response = await fetch(
+    `${VITE_API_BASE_URL}/api/v1/weather/logs/insights/stream/`,
+    {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+        ...(token ? { Authorization: `Token ${token}` } : {}),
+      },
+      body: JSON.stringify({ hours: params.hours, city: params.city }),
+    }
+  );
+
+  if (!response.ok || !response.body) {
+    const data = await response.json().catch(() => null);
+    throw new Error(data?.detail ?? "Erro ao gerar insight.");
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let end: number;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (!data) continue;
+      const payload = JSON.parse(data);
+
+      if (event === "token") onToken(payload.text, false);
+      else if (event === "fallback") onToken(payload.text, true);
+      else if (event === "done") return payload.insight as WeatherInsight;
+      else if (event === "error") {
+        throw new Error(payload?.detail ?? "Erro ao gerar insight.");
+      }
+    }
+  }
+
+  throw new Error("Stream de insight encerrado antes do fim.");
+}
 
 export async function fetchCityWeather(city: string) {
   try {
@@ -177,11 +284,14 @@ export async function fetchCityWeather(city: string) {
 
 export const weatherService = {
   listWeatherLogs,
+  getWeatherSeries,
+  getLatestByCity,
   getWeatherInsights,
   exportWeatherCsv,
   exportWeatherXlsx,
   getLatestWeatherInsight,
   generateWeatherInsight,
   generateWeatherInsightForCity,
+  streamWeatherInsightForCity,
   fetchCityWeather
 };